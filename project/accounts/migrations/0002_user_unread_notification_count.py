@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:25
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_unread_counts(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    Notification = apps.get_model('dashboard', 'Notification')
+    unread = (
+        Notification.objects.filter(recipient=OuterRef('pk'), is_read=False)
+        .order_by().values('recipient').annotate(n=Count('id')).values('n')
+    )
+    User.objects.update(unread_notification_count=Coalesce(Subquery(unread), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='unread_notification_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_unread_counts, migrations.RunPython.noop),
+    ]
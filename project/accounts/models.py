@@ -1,8 +1,24 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
 from django.db import models
 from PIL import Image
 
 
+class UserQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Admins see everyone, managers the students they manage, others themselves"""
+        if not user.is_authenticated:
+            return self.none()
+        if user.is_admin:
+            return self
+        if user.is_manager:
+            return self.filter(student_profile__manager=user)
+        return self.filter(pk=user.pk)
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    pass
+
+
 class User(AbstractUser):
     """Custom user model with role-based access"""
     
@@ -17,13 +33,24 @@ class User(AbstractUser):
     phone_number = models.CharField(max_length=15, blank=True)
     date_of_birth = models.DateField(blank=True, null=True)
     bio = models.TextField(max_length=500, blank=True)
+    # Denormalized count of unread notifications, maintained by dashboard.models
+    unread_notification_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = UserManager()
+    
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
     
     def save(self, *args, **kwargs):
+        # The unread counter is only ever changed with F() updates; never write
+        # back the possibly stale copy held by this instance
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'unread_notification_count'
+            ]
         super().save(*args, **kwargs)
         
         # Resize profile picture if it exists
@@ -45,6 +72,12 @@ class User(AbstractUser):
     @property
     def is_student(self):
         return self.role == 'student'
+    
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Registration charts (dashboard.timeseries)
+            models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ]
 
 
 class StudentProfile(models.Model):
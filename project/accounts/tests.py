@@ -1,3 +1,29 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .models import User
+
+
+class ProfileViewQueryTests(TestCase):
+    """Profile views work on request.user, loaded once by the auth middleware"""
+
+    def setUp(self):
+        self.manager = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+        self.client.force_login(self.manager)
+
+    def test_profile(self):
+        # Session, user and the "assignments created" count
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('accounts:profile'))
+        self.assertEqual(response.context['profile_user'], self.manager)
+
+    def test_profile_update(self):
+        url = reverse('accounts:profile_update')
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        # Session, user, the pre-save role snapshot and the update itself
+        with self.assertNumQueries(4):
+            response = self.client.post(url, {'first_name': 'Maria', 'last_name': 'Lopez', 'email': 'maria@example.com'})
+        self.assertRedirects(response, reverse('accounts:profile'), fetch_redirect_response=False)
+        self.manager.refresh_from_db()
+        self.assertEqual(self.manager.first_name, 'Maria')
@@ -142,14 +142,6 @@ def user_list_view(request):
         messages.error(request, 'You do not have permission to view this page.')
         return redirect('dashboard:home')
     
-    user = request.user
-    
-    if user.is_admin:
-        users = User.objects.all().order_by('username')
-    elif user.is_manager:
-        # Managers can only see their assigned students
-        users = User.objects.filter(
-            student_profile__manager=user
-        ).order_by('username')
+    users = User.objects.visible_to(request.user).order_by('username')
     
     return render(request, 'accounts/user_list.html', {'users': users})
@@ -23,16 +23,9 @@ class AssignmentForm(forms.ModelForm):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
         
-        if user:
-            if user.is_admin:
-                # Admin can assign to any student
-                self.fields['assigned_to'].queryset = User.objects.filter(role='student')
-            elif user.is_manager:
-                # Manager can only assign to their students
-                self.fields['assigned_to'].queryset = User.objects.filter(
-                    role='student',
-                    student_profile__manager=user
-                )
+        if user and (user.is_admin or user.is_manager):
+            # Admins can assign any student, managers only their own
+            self.fields['assigned_to'].queryset = User.objects.visible_to(user).filter(role='student')
     
     def clean_due_date(self):
         due_date = self.cleaned_data.get('due_date')
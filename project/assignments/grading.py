@@ -0,0 +1,129 @@
+"""
+Bulk grading.
+
+``grade_many()`` grades a batch of submissions in one transaction: new grades
+go in with one ``bulk_create``, regrades with one ``bulk_update`` and the
+submissions are marked graded with one ``UPDATE``. Bulk writes send no model
+signals, so the upkeep the ``Grade`` and ``Submission`` receivers would have
+done per row (dashboard stats, daily rollups, generations) is done here for
+the whole batch, and the "grade posted" notifications are fanned out in the
+background after commit.
+"""
+from collections import Counter, defaultdict
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from dashboard import generations, rollups
+from dashboard.notifications import fan_out_grades_posted
+from dashboard.stats import StatsDelta
+from dashboard.tasks import run_after_commit
+from .models import Grade, Submission
+
+# Rejects non-integral numbers (90.5, "90.5") the way GradeForm does instead
+# of truncating them
+_whole_number = forms.IntegerField()
+
+
+def _whole(value):
+    """``value`` as an int, or ``None`` when it is not a whole number"""
+    try:
+        return _whole_number.clean(value)
+    except ValidationError:
+        return None
+
+
+def _clean(rows, submissions):
+    """``[(submission, score, feedback)]`` for ``rows``; raises ``ValidationError`` keyed by row index"""
+    score_field = Grade._meta.get_field('score')
+    cleaned, errors, seen = [], {}, set()
+    for index, row in enumerate(rows):
+        submission = submissions.get(_whole(row.get('submission')))
+        if submission is None:
+            errors[str(index)] = ['Submission not found.']
+            continue
+        if submission.pk in seen:
+            errors[str(index)] = ['Submission is graded twice in this batch.']
+            continue
+        seen.add(submission.pk)
+        try:
+            score = score_field.clean(_whole_number.clean(row.get('score')), None)
+        except ValidationError as error:
+            errors[str(index)] = error.messages
+            continue
+        max_score = submission.assignment.max_score
+        if score > max_score:
+            errors[str(index)] = [f'Score cannot exceed maximum score of {max_score}.']
+            continue
+        cleaned.append((submission, score, str(row.get('feedback') or '')))
+    if errors:
+        raise ValidationError(errors)
+    return cleaned
+
+
+def grade_many(grader, rows):
+    """
+    Grade ``rows`` of ``{'submission': id, 'score': n, 'feedback': text}`` as ``grader``.
+
+    Only submissions ``grader`` manages can be graded; an already graded
+    submission is regraded. All or nothing: a bad row raises
+    ``ValidationError`` mapping its index to its errors and nothing is written.
+    Returns the number of grades created and updated.
+    """
+    ids = [pk for pk in (_whole(row.get('submission')) for row in rows) if pk is not None]
+
+    with transaction.atomic():
+        submissions = Submission.objects.managed_by(grader).select_related('assignment', 'grade').in_bulk(ids)
+        cleaned = _clean(rows, submissions)
+
+        created, updated, old_scores = [], [], {}
+        for submission, score, feedback in cleaned:
+            grade = getattr(submission, 'grade', None)
+            if grade is None:
+                created.append(Grade(submission=submission, score=score, feedback=feedback, graded_by=grader))
+            else:
+                old_scores[submission.pk] = grade.score
+                grade.score, grade.feedback, grade.graded_by = score, feedback, grader
+                updated.append(grade)
+
+        Grade.objects.bulk_create(created)
+        Grade.objects.bulk_update(updated, ['score', 'feedback', 'graded_by'])
+        Submission.objects.filter(pk__in=[submission.pk for submission, _, _ in cleaned]).exclude(
+            status='graded'
+        ).update(status='graded', updated_at=timezone.now())
+
+        _graded(cleaned, created + updated, old_scores)
+        run_after_commit(fan_out_grades_posted, [grade.pk for grade in created + updated])
+    return len(created), len(updated)
+
+
+def _graded(cleaned, grades, old_scores):
+    """What the ``Grade``/``Submission`` save receivers do, for the whole batch"""
+    delta = StatsDelta()
+    days = defaultdict(Counter)
+    scopes = [generations.site_submissions(), generations.site_grades()]
+    graded_at = {grade.submission_id: grade.graded_at for grade in grades}
+
+    for submission, score, _ in cleaned:
+        owner_id = submission.assignment.created_by_id
+        pending = -int(submission.status == 'submitted')
+        delta.add(None, pending_submissions=pending)
+        delta.add(owner_id, pending_submissions=pending)
+        delta.add(submission.student_id, completed_submissions=int(submission.status != 'graded'))
+
+        old_score = old_scores.get(submission.pk)
+        delta.add(submission.student_id, grade_total=score - (old_score or 0), grade_count=int(old_score is None))
+        key = (rollups.local_day(graded_at[submission.pk]), submission.assignment_id, owner_id)
+        days[key].update(graded=int(old_score is None), score_sum=score - (old_score or 0))
+
+        scopes += [
+            generations.owner_submissions(owner_id), generations.owner_grades(owner_id),
+            generations.student_submissions(submission.student_id), generations.student_grades(submission.student_id),
+        ]
+
+    delta.apply()
+    for (day, assignment_id, manager_id), deltas in days.items():
+        rollups.apply(day, assignment_id, manager_id, **deltas)
+    generations.bump_on_commit(*set(scopes))
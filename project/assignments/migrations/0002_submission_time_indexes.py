@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['submitted_at'], name='submission_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['student', 'submitted_at'], name='submission_student_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['assignment', 'submitted_at'], name='submission_assign_time_idx'),
+        ),
+    ]
@@ -0,0 +1,129 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+# FTS5 shadow table over assignments, submissions and comments, kept in sync
+# by triggers. The rowid encodes the source row (id * 4 + kind code) so
+# triggers update and delete entries by rowid instead of scanning the index.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE assignments_search USING fts5(
+        kind UNINDEXED,
+        object_id UNINDEXED,
+        assignment_id UNINDEXED,
+        student_id UNINDEXED,
+        title,
+        body,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER assignments_search_assignment_insert AFTER INSERT ON assignments_assignment BEGIN
+        INSERT INTO assignments_search (rowid, kind, object_id, assignment_id, student_id, title, body)
+        VALUES (new.id * 4 + 1, 'assignment', new.id, new.id, NULL, new.title,
+                new.description || ' ' || new.instructions);
+    END
+    """,
+    """
+    CREATE TRIGGER assignments_search_assignment_update
+    AFTER UPDATE OF title, description, instructions ON assignments_assignment BEGIN
+        UPDATE assignments_search SET title = new.title, body = new.description || ' ' || new.instructions
+        WHERE rowid = new.id * 4 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER assignments_search_assignment_delete AFTER DELETE ON assignments_assignment BEGIN
+        DELETE FROM assignments_search WHERE rowid = old.id * 4 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER assignments_search_submission_insert AFTER INSERT ON assignments_submission BEGIN
+        INSERT INTO assignments_search (rowid, kind, object_id, assignment_id, student_id, title, body)
+        VALUES (new.id * 4 + 2, 'submission', new.id, new.assignment_id, new.student_id, '', new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER assignments_search_submission_update AFTER UPDATE OF content ON assignments_submission BEGIN
+        UPDATE assignments_search SET body = new.content WHERE rowid = new.id * 4 + 2;
+    END
+    """,
+    """
+    CREATE TRIGGER assignments_search_submission_delete AFTER DELETE ON assignments_submission BEGIN
+        DELETE FROM assignments_search WHERE rowid = old.id * 4 + 2;
+    END
+    """,
+    """
+    CREATE TRIGGER assignments_search_comment_insert AFTER INSERT ON assignments_comment BEGIN
+        INSERT INTO assignments_search (rowid, kind, object_id, assignment_id, student_id, title, body)
+        SELECT new.id * 4 + 3, 'comment', new.id, s.assignment_id, s.student_id, '', new.content
+        FROM assignments_submission s WHERE s.id = new.submission_id;
+    END
+    """,
+    """
+    CREATE TRIGGER assignments_search_comment_update AFTER UPDATE OF content ON assignments_comment BEGIN
+        UPDATE assignments_search SET body = new.content WHERE rowid = new.id * 4 + 3;
+    END
+    """,
+    """
+    CREATE TRIGGER assignments_search_comment_delete AFTER DELETE ON assignments_comment BEGIN
+        DELETE FROM assignments_search WHERE rowid = old.id * 4 + 3;
+    END
+    """,
+]
+
+POPULATE_SQL = [
+    """
+    INSERT INTO assignments_search (rowid, kind, object_id, assignment_id, student_id, title, body)
+    SELECT id * 4 + 1, 'assignment', id, id, NULL, title, description || ' ' || instructions
+    FROM assignments_assignment
+    """,
+    """
+    INSERT INTO assignments_search (rowid, kind, object_id, assignment_id, student_id, title, body)
+    SELECT id * 4 + 2, 'submission', id, assignment_id, student_id, '', content
+    FROM assignments_submission
+    """,
+    """
+    INSERT INTO assignments_search (rowid, kind, object_id, assignment_id, student_id, title, body)
+    SELECT c.id * 4 + 3, 'comment', c.id, s.assignment_id, s.student_id, '', c.content
+    FROM assignments_comment c JOIN assignments_submission s ON s.id = c.submission_id
+    """,
+]
+
+DROP_SQL = [
+    f'DROP TRIGGER IF EXISTS assignments_search_{model}_{event}'
+    for model in ('assignment', 'submission', 'comment')
+    for event in ('insert', 'update', 'delete')
+] + ['DROP TABLE IF EXISTS assignments_search']
+
+
+def create_search_index(apps, schema_editor):
+    # Other backends search with the ORM fallback in assignments.search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(CREATE_SQL[0])
+        except OperationalError:
+            # SQLite built without FTS5
+            return
+        for statement in CREATE_SQL[1:] + POPULATE_SQL:
+            cursor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for statement in DROP_SQL:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0002_submission_time_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0003_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['-created_at', '-id'], name='assignment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='assignment_owner_created_idx'),
+        ),
+    ]
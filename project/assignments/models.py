@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Avg, Case, Count, ExpressionWrapper, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
@@ -6,6 +8,60 @@ from django.utils import timezone
 User = get_user_model()
 
 
+class AssignmentQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Admins see every assignment, managers their own, students those assigned to them"""
+        if not user.is_authenticated:
+            return self.none()
+        if user.is_admin:
+            return self
+        if user.is_manager:
+            return self.filter(created_by=user)
+        if user.is_student:
+            return self.filter(assigned_to=user)
+        return self.none()
+    
+    def managed_by(self, user):
+        """Assignments ``user`` may edit, grade and export: all for admins, their own otherwise"""
+        if not user.is_authenticated:
+            return self.none()
+        if user.is_admin:
+            return self
+        return self.filter(created_by=user)
+    
+    def with_submission_counts(self):
+        """
+        Annotate ``submissions_count`` and ``graded_submissions_count``.
+
+        Correlated subqueries rather than a join and GROUP BY, so a page of
+        assignments read in index order counts only its own rows.
+        """
+        submissions = (
+            Submission.objects.filter(assignment=OuterRef('pk'))
+            .order_by().values('assignment').annotate(n=Count('id')).values('n')
+        )
+        return self.annotate(
+            submissions_count=Coalesce(Subquery(submissions), 0),
+            graded_submissions_count=Coalesce(Subquery(submissions.filter(grade__isnull=False)), 0),
+        )
+    
+    def with_totals(self):
+        """
+        Annotate the submission counts plus ``assigned_count`` and ``average_grade``.
+
+        The assigned students are counted in a subquery so that joining them
+        does not multiply the submission rows being counted and averaged.
+        """
+        assigned = (
+            self.model.assigned_to.through.objects.filter(assignment=OuterRef('pk'))
+            .order_by().values('assignment').annotate(n=Count('id')).values('n')
+        )
+        return self.with_submission_counts().annotate(
+            assigned_count=Coalesce(Subquery(assigned), 0),
+            average_grade=Avg('submissions__grade__score'),
+        )
+
+
 class Assignment(models.Model):
     """Assignment model for tasks given to students"""
     
@@ -38,6 +94,8 @@ class Assignment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = AssignmentQuerySet.as_manager()
+    
     def __str__(self):
         return self.title
     
@@ -55,6 +113,29 @@ class Assignment(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Cursor pagination of the assignment list
+            models.Index(fields=['-created_at', '-id'], name='assignment_created_idx'),
+            models.Index(fields=['created_by', '-created_at', '-id'], name='assignment_owner_created_idx'),
+        ]
+
+
+class SubmissionQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Submissions to assignments ``user`` manages, plus a student's own"""
+        if not user.is_authenticated:
+            return self.none()
+        if user.is_student:
+            return self.filter(student=user)
+        return self.managed_by(user)
+    
+    def managed_by(self, user):
+        """Submissions ``user`` may grade: all for admins, to their own assignments otherwise"""
+        if not user.is_authenticated:
+            return self.none()
+        if user.is_admin:
+            return self
+        return self.filter(assignment__created_by=user)
 
 
 class Submission(models.Model):
@@ -81,6 +162,8 @@ class Submission(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = SubmissionQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.student.username} - {self.assignment.title}"
     
@@ -98,6 +181,49 @@ class Submission(models.Model):
     class Meta:
         unique_together = ['assignment', 'student']
         ordering = ['-updated_at']
+        indexes = [
+            # Time-bucketed chart queries (dashboard.timeseries)
+            models.Index(fields=['submitted_at'], name='submission_submitted_idx'),
+            models.Index(fields=['student', 'submitted_at'], name='submission_student_time_idx'),
+            models.Index(fields=['assignment', 'submitted_at'], name='submission_assign_time_idx'),
+        ]
+
+
+LETTER_GRADE_THRESHOLDS = [
+    (90, 'A'),
+    (80, 'B'),
+    (70, 'C'),
+    (60, 'D'),
+]
+
+
+def letter_for(percentage):
+    """Letter grade for a percentage score"""
+    for threshold, letter in LETTER_GRADE_THRESHOLDS:
+        if percentage >= threshold:
+            return letter
+    return 'F'
+
+
+class GradeQuerySet(models.QuerySet):
+    def with_percentage(self):
+        return self.annotate(
+            grade_percentage=ExpressionWrapper(
+                F('score') * 100.0 / F('submission__assignment__max_score'),
+                output_field=models.FloatField(),
+            )
+        )
+    
+    def with_letter_grade(self):
+        """Annotate ``grade_letter``, the SQL twin of ``Grade.letter_grade``"""
+        return self.with_percentage().annotate(
+            grade_letter=Case(
+                *[When(grade_percentage__gte=threshold, then=Value(letter))
+                  for threshold, letter in LETTER_GRADE_THRESHOLDS],
+                default=Value('F'),
+                output_field=models.CharField(max_length=1),
+            )
+        )
 
 
 class Grade(models.Model):
@@ -115,6 +241,8 @@ class Grade(models.Model):
     )
     graded_at = models.DateTimeField(auto_now_add=True)
     
+    objects = GradeQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.submission} - {self.score}/{self.submission.assignment.max_score}"
     
@@ -124,17 +252,19 @@ class Grade(models.Model):
     
     @property
     def letter_grade(self):
-        percentage = self.percentage
-        if percentage >= 90:
-            return 'A'
-        elif percentage >= 80:
-            return 'B'
-        elif percentage >= 70:
-            return 'C'
-        elif percentage >= 60:
-            return 'D'
-        else:
-            return 'F'
+        return letter_for(self.percentage)
+
+
+class CommentQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Comments on the submissions ``user`` can see"""
+        if not user.is_authenticated:
+            return self.none()
+        if user.is_admin:
+            return self
+        if user.is_student:
+            return self.filter(submission__student=user)
+        return self.filter(submission__assignment__created_by=user)
 
 
 class Comment(models.Model):
@@ -145,6 +275,8 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = CommentQuerySet.as_manager()
+    
     def __str__(self):
         return f"Comment by {self.author.username} on {self.submission}"
     
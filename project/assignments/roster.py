@@ -0,0 +1,68 @@
+"""
+Submission roster of one assignment.
+
+One row per assigned student, whether or not they have submitted, plus any
+student who submitted and was later unassigned, so the roster agrees with the
+submission counts beside it. Each row carries the submission's status, score,
+comment count and lateness computed in SQL. The submission is LEFT JOINed through a ``FilteredRelation`` and the
+comments are counted in a correlated subquery, so a page of the roster costs
+a single query however large the class is.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import BooleanField, Count, ExpressionWrapper, F, FilteredRelation, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+
+from .models import Assignment, Comment
+
+User = get_user_model()
+
+# ``pending`` students have not started; ``late`` is any submission past the due date
+STATUSES = ['pending', 'draft', 'submitted', 'graded', 'returned', 'late']
+
+ORDERING = ('last_name', 'first_name', 'id')
+
+
+def roster(assignment, status=None):
+    """Students assigned or submitting ``assignment``, annotated with their submission; optionally one ``status`` only"""
+    comments = (
+        Comment.objects.filter(submission__assignment=assignment, submission__student=OuterRef('pk'))
+        .order_by().values('submission').annotate(n=Count('id')).values('n')
+    )
+    members = Q(pk__in=Assignment.assigned_to.through.objects.filter(assignment=assignment).values('user_id')) | Q(
+        pk__in=assignment.submissions.values('student_id')
+    )
+    students = User.objects.filter(members).only('username', 'first_name', 'last_name').annotate(
+        entry=FilteredRelation('submissions', condition=Q(submissions__assignment=assignment)),
+    ).annotate(
+        submission_id=F('entry__id'),
+        submission_status=F('entry__status'),
+        submission_submitted_at=F('entry__submitted_at'),
+        score=F('entry__grade__score'),
+        comment_count=Coalesce(Subquery(comments), 0),
+        is_late=ExpressionWrapper(Q(entry__submitted_at__gt=assignment.due_date), output_field=BooleanField()),
+    )
+
+    if status == 'pending':
+        students = students.filter(submission_id__isnull=True)
+    elif status == 'late':
+        students = students.filter(submission_submitted_at__gt=assignment.due_date)
+    elif status in STATUSES:
+        students = students.filter(submission_status=status)
+    return students
+
+
+def as_dict(student):
+    """JSON form of a roster row"""
+    return {
+        'student_id': student.pk,
+        'username': student.username,
+        'name': student.get_full_name() or student.username,
+        'submission_id': student.submission_id,
+        'status': student.submission_status or 'pending',
+        'submitted_at': student.submission_submitted_at.isoformat() if student.submission_submitted_at else None,
+        'late': bool(student.is_late),
+        'score': student.score,
+        'comment_count': student.comment_count,
+        'url': reverse('assignments:submission_detail', args=[student.submission_id]) if student.submission_id else None,
+    }
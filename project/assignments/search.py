@@ -0,0 +1,191 @@
+"""
+Full-text search over assignments, submissions and comments.
+
+On SQLite the ``assignments_search`` FTS5 table (migration 0003) indexes
+assignment titles, descriptions and instructions, submission content and
+comment content; triggers keep it in step with every write, including bulk
+updates and cascades that bypass model signals. Queries are ranked with
+BM25 (title matches weigh more) and the last word is prefix-matched, so
+results narrow as the user types. Other backends, or SQLite builds without FTS5,
+fall back to ``icontains`` filters through the ORM, unranked.
+
+Results are restricted to what the user may see: everything for admins,
+their own assignments for managers, and for students the assignments they
+are assigned plus their own submissions and the comments on them.
+"""
+import html
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+
+from .models import Assignment, Comment, Submission
+
+TABLE = 'assignments_search'
+
+# BM25 weights per column: kind, object_id, assignment_id, student_id, title, body
+WEIGHTS = '0, 0, 0, 0, 10.0, 1.0'
+
+# Shortest final word that is prefix-matched
+PREFIX_MIN_LENGTH = 3
+
+# Snippet highlight markers, replaced by <mark> after the text is escaped
+MARK_START, MARK_END = '\x02', '\x03'
+
+_available = {}
+
+
+def available():
+    """Whether the FTS5 index exists on the default database"""
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.settings_dict['NAME'] not in _available:
+        _available[connection.settings_dict['NAME']] = TABLE in connection.introspection.table_names()
+    return _available[connection.settings_dict['NAME']]
+
+
+def terms(query):
+    """The words of ``query``, ignoring FTS5 operators and punctuation"""
+    return re.findall(r'\w+', query or '')
+
+
+def match_expression(query):
+    """
+    FTS5 query matching documents that contain every word; the last word,
+    still being typed, also matches as a prefix once it is long enough not
+    to match half the index
+    """
+    words = [f'"{term}"' for term in terms(query)]
+    if words and len(words[-1]) - 2 >= PREFIX_MIN_LENGTH:
+        words[-1] += '*'
+    return ' '.join(words)
+
+
+def _visibility(user):
+    """SQL condition and params limiting index rows to what ``user`` may see"""
+    if user.is_admin:
+        return '1', []
+    if user.is_manager:
+        return (
+            'assignment_id IN (SELECT id FROM assignments_assignment WHERE created_by_id = %s)',
+            [user.pk],
+        )
+    if user.is_student:
+        return (
+            "(kind = 'assignment' AND assignment_id IN ("
+            "SELECT assignment_id FROM assignments_assignment_assigned_to WHERE user_id = %s"
+            ")) OR student_id = %s",
+            [user.pk, user.pk],
+        )
+    return '0', []
+
+
+def matching_assignments(assignments, query):
+    """Narrow ``assignments`` to those whose own text matches ``query``"""
+    expression = match_expression(query)
+    if not expression:
+        return assignments
+    if available():
+        return assignments.filter(pk__in=RawSQL(
+            f"SELECT object_id FROM {TABLE} WHERE {TABLE} MATCH %s AND kind = 'assignment'",
+            [expression],
+        ))
+    condition = Q()
+    for term in terms(query):
+        condition &= Q(title__icontains=term) | Q(description__icontains=term) | Q(instructions__icontains=term)
+    return assignments.filter(condition)
+
+
+def search(user, query, limit=20):
+    """
+    Ranked results for ``query`` visible to ``user``:
+    ``[{'kind', 'id', 'assignment_id', 'submission_id', 'title', 'snippet', 'url'}]``
+    """
+    expression = match_expression(query)
+    if not expression:
+        return []
+    hits = _search_index(user, expression, limit) if available() else _search_orm(user, query, limit)
+
+    titles = dict(
+        Assignment.objects.filter(pk__in={hit['assignment_id'] for hit in hits}).values_list('pk', 'title')
+    )
+    for hit in hits:
+        hit['title'] = titles.get(hit['assignment_id'], '')
+        hit['url'] = (
+            reverse('assignments:detail', args=[hit['assignment_id']]) if hit['kind'] == 'assignment'
+            else reverse('assignments:submission_detail', args=[hit['submission_id']])
+        )
+    return hits
+
+
+def _search_index(user, expression, limit):
+    condition, params = _visibility(user)
+    sql = f"""
+        SELECT kind, object_id, assignment_id,
+               snippet({TABLE}, -1, %s, %s, '…', 12)
+        FROM {TABLE}
+        WHERE {TABLE} MATCH %s AND ({condition})
+        ORDER BY bm25({TABLE}, {WEIGHTS})
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [MARK_START, MARK_END, expression, *params, limit])
+        rows = cursor.fetchall()
+
+    comment_submissions = dict(
+        Comment.objects.filter(pk__in=[pk for kind, pk, _, _ in rows if kind == 'comment'])
+        .values_list('pk', 'submission_id')
+    )
+    return [
+        {
+            'kind': kind,
+            'id': pk,
+            'assignment_id': assignment_id,
+            'submission_id': pk if kind == 'submission' else comment_submissions.get(pk),
+            'snippet': _highlight(snippet),
+        }
+        for kind, pk, assignment_id, snippet in rows
+    ]
+
+
+def _highlight(snippet):
+    escaped = html.escape(snippet)
+    return escaped.replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def _search_orm(user, query, limit):
+    """Unranked ``icontains`` fallback, newest first"""
+    words = terms(query)
+
+    def matching(queryset, *fields):
+        for word in words:
+            condition = Q()
+            for field in fields:
+                condition |= Q(**{f'{field}__icontains': word})
+            queryset = queryset.filter(condition)
+        return queryset
+
+    assignments = Assignment.objects.visible_to(user)
+    submissions = Submission.objects.visible_to(user)
+    comments = Comment.objects.visible_to(user)
+
+    hits = [
+        {'kind': 'assignment', 'id': pk, 'assignment_id': pk, 'submission_id': None, 'snippet': html.escape(text[:200])}
+        for pk, text in matching(assignments, 'title', 'description', 'instructions')
+        .order_by('-created_at').values_list('pk', 'description')[:limit]
+    ]
+    hits += [
+        {'kind': 'submission', 'id': pk, 'assignment_id': assignment_id, 'submission_id': pk,
+         'snippet': html.escape(text[:200])}
+        for pk, assignment_id, text in matching(submissions, 'content')
+        .order_by('-created_at').values_list('pk', 'assignment_id', 'content')[:limit]
+    ]
+    hits += [
+        {'kind': 'comment', 'id': pk, 'assignment_id': assignment_id, 'submission_id': submission_id,
+         'snippet': html.escape(text[:200])}
+        for pk, submission_id, assignment_id, text in matching(comments, 'content')
+        .order_by('-created_at').values_list('pk', 'submission_id', 'submission__assignment_id', 'content')[:limit]
+    ]
+    return hits[:limit]
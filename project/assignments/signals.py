@@ -1,172 +1,94 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.conf import settings
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
 from django.contrib.auth import get_user_model
 
 from .models import Assignment, Submission, Grade, Comment
-from dashboard.models import Notification
+from dashboard.notifications import fan_out_assignment_created, notify, notify_grade_posted
+from dashboard.tasks import run_after_commit
 
 User = get_user_model()
 
 
-@receiver(post_save, sender=Assignment)
-def assignment_created_notification(sender, instance, created, **kwargs):
-    """Send notification when a new assignment is created"""
-    if created:
-        # Create notifications for all students
-        students = User.objects.filter(role='student')
-        
-        for student in students:
-            # Create in-app notification
-            Notification.objects.create(
-                recipient=student,
-                title=f'New Assignment: {instance.title}',
-                message=f'A new assignment "{instance.title}" has been created. Due date: {instance.due_date.strftime("%B %d, %Y at %I:%M %p")}',
-                notification_type='assignment_created'
-            )
-            
-            # Send email notification
-            try:
-                subject = f'New Assignment: {instance.title}'
-                html_message = render_to_string('emails/assignment_created.html', {
-                    'student': student,
-                    'assignment': instance,
-                })
-                plain_message = strip_tags(html_message)
-                
-                send_mail(
-                    subject=subject,
-                    message=plain_message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[student.email],
-                    html_message=html_message,
-                    fail_silently=True,
-                )
-            except Exception as e:
-                print(f"Failed to send email to {student.email}: {e}")
+@receiver(m2m_changed, sender=Assignment.assigned_to.through)
+def assignment_created_notification(sender, instance, action, reverse, pk_set, **kwargs):
+    """Notify students when they are assigned to an assignment"""
+    if action != 'post_add' or not pk_set:
+        return
+    
+    # The fan-out runs after commit on the background pool so the request
+    # returns immediately regardless of class size
+    if reverse:
+        # student.assignments.add(...): instance is the student
+        for assignment_id in pk_set:
+            run_after_commit(fan_out_assignment_created, assignment_id, [instance.pk])
+    else:
+        run_after_commit(fan_out_assignment_created, instance.pk, list(pk_set))
 
 
 @receiver(post_save, sender=Submission)
 def submission_created_notification(sender, instance, created, **kwargs):
-    """Send notification when a submission is created"""
+    """Notify the assignment creator when a submission is created"""
     if created:
-        # Notify assignment creator (manager/admin)
-        assignment_creator = instance.assignment.created_by
+        assignment = instance.assignment
+        student_name = instance.student.get_full_name() or instance.student.username
         
-        # Create in-app notification
-        Notification.objects.create(
-            recipient=assignment_creator,
-            title=f'New Submission: {instance.assignment.title}',
-            message=f'{instance.student.get_full_name() or instance.student.username} has submitted "{instance.assignment.title}"',
-            notification_type='assignment'
-        )
-        
-        # Send email notification
-        try:
-            subject = f'New Submission: {instance.assignment.title}'
-            html_message = render_to_string('emails/submission_created.html', {
-                'manager': assignment_creator,
+        notify(
+            ('submission_created', instance.pk),
+            [assignment.created_by],
+            title=f'New Submission: {assignment.title}',
+            message=f'{student_name} has submitted "{assignment.title}"',
+            notification_type='submission_created',
+            email_template='emails/submission_created.html',
+            email_context={
                 'submission': instance,
-                'assignment': instance.assignment,
+                'assignment': assignment,
                 'student': instance.student,
-            })
-            plain_message = strip_tags(html_message)
-            
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[assignment_creator.email],
-                html_message=html_message,
-                fail_silently=True,
-            )
-        except Exception as e:
-            print(f"Failed to send email to {assignment_creator.email}: {e}")
+            },
+            recipient_var='manager',
+        )
 
 
 @receiver(post_save, sender=Grade)
 def grade_created_notification(sender, instance, created, **kwargs):
-    """Send notification when a grade is created or updated"""
+    """Notify the student when a grade is created or updated"""
     if created or kwargs.get('update_fields'):
-        student = instance.submission.student
-        
-        # Create in-app notification
-        Notification.objects.create(
-            recipient=student,
-            title=f'Grade Posted: {instance.submission.assignment.title}',
-            message=f'Your submission for "{instance.submission.assignment.title}" has been graded. Score: {instance.score}/{instance.submission.assignment.max_score} ({instance.letter_grade})',
-            notification_type='grade'
-        )
-        
-        # Send email notification
-        try:
-            subject = f'Grade Posted: {instance.submission.assignment.title}'
-            html_message = render_to_string('emails/grade_posted.html', {
-                'student': student,
-                'grade': instance,
-                'submission': instance.submission,
-                'assignment': instance.submission.assignment,
-            })
-            plain_message = strip_tags(html_message)
-            
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[student.email],
-                html_message=html_message,
-                fail_silently=True,
-            )
-        except Exception as e:
-            print(f"Failed to send email to {student.email}: {e}")
+        notify_grade_posted(instance)
 
 
 @receiver(post_save, sender=Comment)
 def comment_created_notification(sender, instance, created, **kwargs):
-    """Send notification when a comment is created"""
+    """Notify the other participants of a submission when a comment is added"""
     if created:
-        # Determine who to notify based on who made the comment
-        if instance.author.role == 'student':
-            # Student commented, notify the assignment creator
-            recipient = instance.submission.assignment.created_by
-            title = f'New Comment: {instance.submission.assignment.title}'
-            message = f'{instance.author.get_full_name() or instance.author.username} commented on their submission for "{instance.submission.assignment.title}"'
-        else:
-            # Manager/Admin commented, notify the student
-            recipient = instance.submission.student
-            title = f'New Feedback: {instance.submission.assignment.title}'
-            message = f'{instance.author.get_full_name() or instance.author.username} left feedback on your submission for "{instance.submission.assignment.title}"'
+        submission = instance.submission
+        assignment = submission.assignment
+        author_name = instance.author.get_full_name() or instance.author.username
+        email_context = {
+            'comment': instance,
+            'submission': submission,
+            'assignment': assignment,
+            'author': instance.author,
+        }
         
-        # Create in-app notification
-        Notification.objects.create(
-            recipient=recipient,
-            title=title,
-            message=message,
-            notification_type='comment'
-        )
+        # The student hears about feedback on their submission
+        if instance.author_id != submission.student_id:
+            notify(
+                ('comment_added', instance.pk),
+                [submission.student],
+                title=f'New Feedback: {assignment.title}',
+                message=f'{author_name} left feedback on your submission for "{assignment.title}"',
+                notification_type='comment_added',
+                email_template='emails/comment_added.html',
+                email_context=email_context,
+            )
         
-        # Send email notification
-        try:
-            subject = title
-            html_message = render_to_string('emails/comment_added.html', {
-                'recipient': recipient,
-                'comment': instance,
-                'submission': instance.submission,
-                'assignment': instance.submission.assignment,
-                'author': instance.author,
-            })
-            plain_message = strip_tags(html_message)
-            
-            send_mail(
-                subject=subject,
-                message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[recipient.email],
-                html_message=html_message,
-                fail_silently=True,
+        # The assignment creator hears about every other comment
+        if instance.author_id != assignment.created_by_id:
+            notify(
+                ('comment_added', instance.pk),
+                [assignment.created_by],
+                title=f'New Comment: {assignment.title}',
+                message=f'{author_name} commented on the submission by {submission.student.get_full_name() or submission.student.username} for "{assignment.title}"',
+                notification_type='comment_added',
+                email_template='emails/comment_added.html',
+                email_context=email_context,
             )
-        except Exception as e:
-            print(f"Failed to send email to {recipient.email}: {e}")
\ No newline at end of file
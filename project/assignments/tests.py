@@ -1,3 +1,663 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from dashboard import stats
+from dashboard.models import DailySubmissionRollup, EmailOutbox, Notification
+from dashboard.notifications import notify
+from . import search
+from .models import Assignment, Comment, Grade, Submission
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, NOTIFICATION_FANOUT_CHUNK_SIZE=2)
+class AssignmentFanOutTests(TestCase):
+    """Assignment notifications are fanned out after commit to assigned students only"""
+
+    def setUp(self):
+        self.manager = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+        self.students = [
+            User.objects.create_user(f'student{i}', f'student{i}@example.com', None, role='student')
+            for i in range(5)
+        ]
+        self.bystander = User.objects.create_user('bystander', 'bystander@example.com', None, role='student')
+
+    def create_assignment(self):
+        return Assignment.objects.create(
+            title='Essay',
+            description='Write an essay',
+            created_by=self.manager,
+            due_date=timezone.now() + timedelta(days=7),
+        )
+
+    def test_only_assigned_students_are_notified(self):
+        assignment = self.create_assignment()
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.assigned_to.set(self.students)
+
+        notified = set(Notification.objects.values_list('recipient_id', flat=True))
+        self.assertEqual(notified, {s.pk for s in self.students})
+        queued = EmailOutbox.objects.order_by('id')
+        self.assertEqual(queued.count(), len(self.students))
+        self.assertEqual(queued[0].subject, 'New Assignment: Essay')
+
+    def test_nothing_happens_before_commit(self):
+        assignment = self.create_assignment()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            assignment.assigned_to.set(self.students)
+
+        # The fan-out, and the dashboard fragment cache invalidation
+        self.assertEqual(len(callbacks), 2)
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    def test_reverse_add_notifies_student(self):
+        assignment = self.create_assignment()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bystander.assignments.add(assignment)
+
+        self.assertEqual(
+            list(Notification.objects.values_list('recipient_id', flat=True)),
+            [self.bystander.pk],
+        )
+
+
+class NotificationDispatchTests(TestCase):
+    """Each action writes exactly one notification per recipient, batched after commit"""
+
+    def setUp(self):
+        self.manager = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+        self.admin = User.objects.create_user('admin', 'admin@example.com', None, role='admin')
+        self.student = User.objects.create_user('student', 'student@example.com', None, role='student')
+        self.assignment = Assignment.objects.create(
+            title='Essay',
+            description='Write an essay',
+            created_by=self.manager,
+            due_date=timezone.now() + timedelta(days=7),
+        )
+        self.assignment.assigned_to.add(self.student)
+
+    def make_submission(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Submission.objects.create(
+                assignment=self.assignment, student=self.student, content='Done', status='submitted'
+            )
+
+    def assertDelivered(self, recipients, notification_type):
+        notifications = Notification.objects.filter(notification_type=notification_type)
+        self.assertEqual(sorted(n.recipient_id for n in notifications), sorted(r.pk for r in recipients))
+        self.assertEqual(
+            sorted(EmailOutbox.objects.values_list('to_email', flat=True)),
+            sorted(r.email for r in recipients),
+        )
+
+    def test_submit_assignment(self):
+        self.client.force_login(self.student)
+        with self.assertNumQueries(23), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('assignments:submit', args=[self.assignment.pk]), {'content': 'Done'})
+        self.assertEqual(response.status_code, 302)
+        self.assertDelivered([self.manager], 'submission_created')
+
+    def test_grade_submission(self):
+        submission = self.make_submission()
+        Notification.objects.all().delete()
+        EmailOutbox.objects.all().delete()
+        self.client.force_login(self.manager)
+        with self.assertNumQueries(20), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('assignments:grade_submission', args=[submission.pk]),
+                {'score': 90, 'feedback': 'Good'},
+            )
+        self.assertEqual(response.status_code, 302)
+        self.assertDelivered([self.student], 'submission_graded')
+
+    def test_comment_by_admin_notifies_student_and_creator_once(self):
+        submission = self.make_submission()
+        Notification.objects.all().delete()
+        EmailOutbox.objects.all().delete()
+        self.client.force_login(self.admin)
+        with self.assertNumQueries(14), self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('assignments:add_comment', args=[submission.pk]), {'content': 'Nice'})
+        self.assertDelivered([self.student, self.manager], 'comment_added')
+
+    def test_dispatcher_deduplicates_within_a_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for _ in range(3):
+                    notify(('general', 1), [self.student, self.manager], title='Hi', message='Hello')
+        self.assertEqual(Notification.objects.filter(title='Hi').count(), 2)
+
+    def test_rolled_back_notifications_are_discarded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    notify(('general', 1), [self.student], title='Lost', message='Hello')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            with transaction.atomic():
+                notify(('general', 2), [self.student], title='Kept', message='Hello')
+        self.assertEqual(list(Notification.objects.values_list('title', flat=True)), ['Kept'])
+
+
+class AssignmentListTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.manager = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+        self.student = User.objects.create_user('student', 'student@example.com', None, role='student')
+        self.assignment = Assignment.objects.create(
+            title='Essay',
+            description='Write an essay',
+            created_by=self.manager,
+            due_date=timezone.now() + timedelta(days=7),
+        )
+        self.assignment.assigned_to.add(self.student)
+
+    def test_unchanged_list_is_not_modified(self):
+        self.client.force_login(self.student)
+        url = reverse('assignments:list')
+        response = self.client.get(url)
+        self.assertContains(response, 'Essay')
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # A new notification changes the badge in the page header
+        with self.captureOnCommitCallbacks(execute=True):
+            notify(('general', 1), [self.student], title='Hi', message='Hello')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_passing_due_date_revalidates(self):
+        self.client.force_login(self.student)
+        url = reverse('assignments:list')
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Overdue</span>')
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # No write happens; only the clock moves past the due date
+        later = timezone.now() + timedelta(days=8)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Overdue</span>')
+
+    def test_pending_flash_message_bypasses_revalidation(self):
+        self.client.force_login(self.student)
+        url = reverse('assignments:list')
+        etag = self.client.get(url)['ETag']
+        # Students may not create assignments: redirected to the list with an error
+        self.client.get(reverse('assignments:create'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'You do not have permission')
+
+    def add_class(self, size, name):
+        """``size`` more assignments, each submitted and graded by ``size`` new students"""
+        classmates = [
+            User.objects.create_user(f'{name}{i}', f'{name}{i}@example.com', None, role='student')
+            for i in range(size)
+        ]
+        for i in range(size):
+            assignment = Assignment.objects.create(
+                title=f'{name} {i}', description='x', created_by=self.manager, due_date=timezone.now(),
+            )
+            assignment.assigned_to.add(self.student, *classmates)
+            for student in [self.student, *classmates]:
+                submission = Submission.objects.create(assignment=assignment, student=student, status='submitted')
+                Grade.objects.create(submission=submission, score=85, graded_by=self.manager)
+
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_query_count_does_not_grow_with_the_class(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_class(3, 'first')
+        url = reverse('assignments:list')
+        # Session, user, next due date and total (both cached until the data
+        # changes), page rows and (students) their own submissions
+        for user, budget in [(self.student, 6), (self.manager, 5)]:
+            self.client.force_login(user)
+            with self.assertNumQueries(budget):
+                response = self.client.get(url)
+            self.assertContains(response, '4 assignments available')
+        self.assertContains(response, '4 graded')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_class(3, 'second')
+        for user, budget in [(self.student, 6), (self.manager, 5)]:
+            self.client.force_login(user)
+            with self.assertNumQueries(budget):
+                self.client.get(url)
+            with self.assertNumQueries(budget - 2):
+                response = self.client.get(url)
+            self.assertContains(response, '7 assignments available')
+
+    def test_students_see_only_their_own_submission(self):
+        classmate = User.objects.create_user('classmate', 'classmate@example.com', None, role='student')
+        self.assignment.assigned_to.add(classmate)
+        Submission.objects.create(assignment=self.assignment, student=classmate, status='submitted')
+
+        submission = Submission.objects.create(assignment=self.assignment, student=self.student, status='submitted')
+        Grade.objects.create(submission=submission, score=85, graded_by=self.manager)
+
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('assignments:list'))
+        self.assertContains(response, '85/100')
+        self.assertContains(response, '(B)')
+        self.assertEqual(response.context['page_obj'][0].my_submissions, [submission])
+
+        self.client.force_login(self.manager)
+        self.assertContains(self.client.get(reverse('assignments:list')), '2 submitted')
+
+    def test_cursor_pages_keep_filters_and_skip_offset(self):
+        now = timezone.now()
+        for i in range(14):
+            Assignment.objects.create(
+                title=f'Lab {i}', description='x', created_by=self.manager, due_date=now, priority='high',
+            )
+        # Identical timestamps force the id tiebreaker
+        Assignment.objects.update(created_at=now)
+        self.client.force_login(self.manager)
+        url = reverse('assignments:list')
+
+        first = self.client.get(url, {'priority': 'high'})
+        page = first.context['page_obj']
+        self.assertEqual(len(page), 10)
+        self.assertContains(first, '14 assignments available')
+        self.assertContains(first, f'?priority=high&amp;cursor={page.next_cursor}')
+
+        # Session, user and the page rows; the total comes from the cache
+        with self.assertNumQueries(3) as queries:
+            second = self.client.get(url, {'priority': 'high', 'cursor': page.next_cursor})
+        self.assertFalse(any('OFFSET' in query['sql'] for query in queries.captured_queries))
+        seen = [a.pk for a in page] + [a.pk for a in second.context['page_obj']]
+        self.assertEqual(
+            seen, list(Assignment.objects.filter(priority='high').order_by('-created_at', '-id').values_list('pk', flat=True))
+        )
+        self.assertFalse(second.context['page_obj'].has_next())
+
+    def test_my_submissions_pages_list_drafts_last(self):
+        now = timezone.now()
+        for i in range(12):
+            assignment = Assignment.objects.create(title=f'Lab {i}', description='x', created_by=self.manager, due_date=now)
+            Submission.objects.create(
+                assignment=assignment, student=self.student,
+                status='draft' if i % 3 == 0 else 'submitted',
+            )
+        Submission.objects.filter(status='submitted').update(submitted_at=now)
+        self.client.force_login(self.student)
+
+        seen = []
+        cursor = None
+        while True:
+            response = self.client.get(reverse('assignments:my_submissions'), {'cursor': cursor} if cursor else {})
+            self.assertContains(response, '12 submissions')
+            page = response.context['page_obj']
+            seen.extend(page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(len({submission.pk for submission in seen}), 12)
+        self.assertEqual([submission.status for submission in seen], ['submitted'] * 8 + ['draft'] * 4)
+
+
+class VisibilityTests(TestCase):
+    """Role rules are applied in SQL, so objects out of reach are simply not found"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', 'admin@example.com', None, role='admin')
+        self.manager = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+        self.other_manager = User.objects.create_user('other', 'other@example.com', None, role='manager')
+        self.student = User.objects.create_user('student', 'student@example.com', None, role='student')
+        self.classmate = User.objects.create_user('classmate', 'classmate@example.com', None, role='student')
+        self.assignment = Assignment.objects.create(
+            title='Essay', description='x', created_by=self.manager, due_date=timezone.now() + timedelta(days=7),
+        )
+        self.assignment.assigned_to.add(self.student, self.classmate)
+        self.unassigned = Assignment.objects.create(
+            title='Lab', description='x', created_by=self.other_manager, due_date=timezone.now() + timedelta(days=7),
+        )
+        self.submission = Submission.objects.create(assignment=self.assignment, student=self.student, status='submitted')
+        self.other_submission = Submission.objects.create(
+            assignment=self.assignment, student=self.classmate, status='submitted',
+        )
+
+    def test_querysets(self):
+        self.assertCountEqual(Assignment.objects.visible_to(self.admin), [self.assignment, self.unassigned])
+        self.assertCountEqual(Assignment.objects.visible_to(self.manager), [self.assignment])
+        self.assertCountEqual(Assignment.objects.visible_to(self.student), [self.assignment])
+        self.assertCountEqual(Assignment.objects.managed_by(self.student), [])
+        self.assertCountEqual(Submission.objects.visible_to(self.student), [self.submission])
+        self.assertCountEqual(Submission.objects.visible_to(self.other_manager), [])
+        self.assertCountEqual(Submission.objects.managed_by(self.manager), [self.submission, self.other_submission])
+        self.assertCountEqual(Submission.objects.managed_by(self.student), [])
+
+    def test_detail_views_authorize_and_load_in_one_query(self):
+        self.client.force_login(self.student)
+        url = reverse('assignments:submission_detail', args=[self.other_submission.pk])
+        # Session, user, then the scoped lookup finds nothing
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(reverse('assignments:detail', args=[self.unassigned.pk])).status_code, 404)
+        self.assertEqual(
+            self.client.get(reverse('assignments:submit', args=[self.unassigned.pk])).status_code, 404
+        )
+
+        self.client.force_login(self.other_manager)
+        self.assertEqual(
+            self.client.get(reverse('assignments:grade_submission', args=[self.submission.pk])).status_code, 404
+        )
+        self.assertEqual(
+            self.client.post(reverse('assignments:add_comment', args=[self.submission.pk]), {'content': 'Hi'}).status_code,
+            404,
+        )
+        self.assertEqual(self.client.get(reverse('assignments:update', args=[self.assignment.pk])).status_code, 404)
+        self.assertFalse(Comment.objects.exists())
+
+        self.client.force_login(self.manager)
+        self.assertContains(self.client.get(reverse('assignments:submission_detail', args=[self.submission.pk])), 'Essay')
+
+
+class ObjectViewQueryTests(TestCase):
+    """Single-object views fetch their object, and its relations, once per request"""
+
+    def setUp(self):
+        self.manager = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+        self.student = User.objects.create_user('student', 'student@example.com', None, role='student')
+        self.assignment = Assignment.objects.create(
+            title='Essay', description='x', created_by=self.manager, due_date=timezone.now() + timedelta(days=7),
+        )
+        self.assignment.assigned_to.add(self.student)
+        self.submission = Submission.objects.create(assignment=self.assignment, student=self.student, status='submitted')
+        for author in [self.student, self.manager, self.student]:
+            Comment.objects.create(submission=self.submission, author=author, content='Noted')
+        self.client.force_login(self.manager)
+
+    def assignment_loads(self, queries):
+        """How many queries loaded whole assignment rows"""
+        return sum(
+            query['sql'].startswith('SELECT "assignments_assignment"."id", "assignments_assignment"."title"')
+            for query in queries.captured_queries
+        )
+
+    def test_submission_detail(self):
+        # Session, user, the submission with its assignment, student and
+        # grade, and the comments with their authors
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('assignments:submission_detail', args=[self.submission.pk]))
+        self.assertContains(response, 'Noted', count=3)
+
+    def test_assignment_detail(self):
+        # Session, user, assignment with creator, the submission stats and one roster page
+        with self.assertNumQueries(5):
+            self.client.get(reverse('assignments:detail', args=[self.assignment.pk]))
+
+    def test_update(self):
+        url = reverse('assignments:update', args=[self.assignment.pk])
+        # Session, user, assignment, the form's student choices and current selection
+        with self.assertNumQueries(5):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        data = {
+            'title': 'Essay 2', 'description': 'x', 'max_score': 100, 'priority': 'low', 'is_active': 'on',
+            'due_date': (timezone.now() + timedelta(days=7)).strftime('%Y-%m-%dT%H:%M'),
+        }
+        # One lookup of the assignment; the rest is the save and the stats upkeep
+        with self.assertNumQueries(20) as queries:
+            response = self.client.post(url, data)
+        self.assertEqual(self.assignment_loads(queries), 1)
+        self.assertRedirects(response, reverse('assignments:detail', args=[self.assignment.pk]), fetch_redirect_response=False)
+
+    def test_delete(self):
+        with self.assertNumQueries(23) as queries:
+            response = self.client.post(reverse('assignments:delete', args=[self.assignment.pk]))
+        self.assertEqual(self.assignment_loads(queries), 1)
+        self.assertRedirects(response, reverse('assignments:list'), fetch_redirect_response=False)
+        self.assertFalse(Assignment.objects.exists())
+        self.assertContains(self.client.get(reverse('assignments:list')), 'Assignment deleted successfully!')
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class RosterTests(TestCase):
+    """The detail page shows the class one annotated page at a time"""
+
+    def setUp(self):
+        self.manager = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+        self.assignment = Assignment.objects.create(
+            title='Essay', description='x', created_by=self.manager, due_date=timezone.now(),
+        )
+        self.students = User.objects.bulk_create(
+            User(username=f'student{i}', role='student', last_name=f'Student {i:02d}') for i in range(60)
+        )
+        self.assignment.assigned_to.add(*self.students)
+        # student00 on time and graded with a comment, student01 late, the rest pending
+        self.on_time = Submission.objects.create(
+            assignment=self.assignment, student=self.students[0], status='submitted',
+            submitted_at=timezone.now() - timedelta(hours=1),
+        )
+        Grade.objects.create(submission=self.on_time, score=80, graded_by=self.manager)
+        Comment.objects.create(submission=self.on_time, author=self.manager, content='Good')
+        Submission.objects.create(
+            assignment=self.assignment, student=self.students[1], status='submitted',
+            submitted_at=timezone.now() + timedelta(hours=1),
+        )
+        self.client.force_login(self.manager)
+
+    def test_page(self):
+        url = reverse('assignments:detail', args=[self.assignment.pk])
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        page = response.context['roster']
+        self.assertEqual(len(page), 50)
+        first, second = page[0], page[1]
+        self.assertEqual((first.submission_status, first.score, first.comment_count, first.is_late), ('submitted', 80, 1, False))
+        self.assertTrue(second.is_late)
+        self.assertIsNone(page[2].submission_id)
+        self.assertEqual((response.context['submission_count'], response.context['graded_count']), (2, 1))
+
+        with self.assertNumQueries(5):
+            response = self.client.get(url, {'cursor': page.next_cursor})
+        self.assertEqual([s.username for s in response.context['roster']], [f'student{i}' for i in range(50, 60)])
+
+    def test_status_filter(self):
+        url = reverse('assignments:detail', args=[self.assignment.pk])
+        self.assertEqual(self.client.get(url, {'status': 'pending'}).context['roster'][0].username, 'student2')
+        self.assertEqual([s.username for s in self.client.get(url, {'status': 'late'}).context['roster']], ['student1'])
+
+    def test_unassigned_submitter_stays_on_the_roster(self):
+        self.assignment.assigned_to.remove(self.students[1])
+        url = reverse('assignments:detail', args=[self.assignment.pk])
+        response = self.client.get(url, {'status': 'late'})
+        self.assertEqual([s.username for s in response.context['roster']], ['student1'])
+        self.assertEqual(response.context['submission_count'], 2)
+
+        self.assignment.assigned_to.remove(self.students[2])
+        self.assertNotIn('student2', [s.username for s in self.client.get(url, {'status': 'pending'}).context['roster']])
+
+    def test_json(self):
+        url = reverse('assignments:roster', args=[self.assignment.pk])
+        data = self.client.get(url, {'status': 'submitted'}).json()
+        self.assertEqual([row['username'] for row in data['results']], ['student0', 'student1'])
+        self.assertEqual(data['results'][0]['score'], 80)
+        self.assertIsNone(data['next_cursor'])
+
+        other = User.objects.create_user('other', 'other@example.com', None, role='manager')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class BulkGradingTests(TestCase):
+    """Batches of grades are written in bulk and keep the derived data in step"""
+
+    def setUp(self):
+        self.manager = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+        self.assignment = Assignment.objects.create(
+            title='Essay', description='x', created_by=self.manager, due_date=timezone.now() + timedelta(days=7),
+            max_score=50,
+        )
+        self.students = [
+            User.objects.create_user(f'student{i}', f'student{i}@example.com', None, role='student')
+            for i in range(3)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assignment.assigned_to.add(*self.students)
+            self.submissions = [
+                Submission.objects.create(assignment=self.assignment, student=student, status='submitted')
+                for student in self.students
+            ]
+        # Build the stats rows so the bulk write has something to adjust
+        stats.global_stats()
+        for user in [self.manager, *self.students]:
+            stats.user_stats(user)
+        self.client.force_login(self.manager)
+
+    def post(self, grades):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse('assignments:bulk_grade_api'), {'grades': grades}, content_type='application/json'
+            )
+
+    def test_api(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Grade.objects.create(submission=self.submissions[2], score=10, graded_by=self.manager)
+        Notification.objects.all().delete()
+        response = self.post([
+            {'submission': self.submissions[0].pk, 'score': 45, 'feedback': 'Great'},
+            {'submission': self.submissions[1].pk, 'score': '30'},
+            {'submission': self.submissions[2].pk, 'score': 20},
+        ])
+        self.assertEqual(response.json(), {'created': 2, 'updated': 1})
+        self.assertEqual(
+            dict(Grade.objects.values_list('submission__student__username', 'score')),
+            {'student0': 45, 'student1': 30, 'student2': 20},
+        )
+        self.assertFalse(Submission.objects.exclude(status='graded').exists())
+        self.assertEqual(stats.drifted(), [])
+        incremental = list(DailySubmissionRollup.objects.values('assignment_id', 'graded', 'score_sum'))
+        self.assertEqual(incremental, [{'assignment_id': self.assignment.pk, 'graded': 3, 'score_sum': 95}])
+        self.assertEqual(
+            sorted(Notification.objects.values_list('recipient__username', flat=True)),
+            ['student0', 'student1', 'student2'],
+        )
+
+    def test_invalid_rows_write_nothing(self):
+        other = User.objects.create_user('other', 'other@example.com', None, role='manager')
+        theirs = Assignment.objects.create(title='Other', description='x', created_by=other, due_date=timezone.now())
+        stranger = Submission.objects.create(assignment=theirs, student=self.students[0], status='submitted')
+        response = self.post([
+            {'submission': self.submissions[0].pk, 'score': 40},
+            {'submission': self.submissions[1].pk, 'score': 51},
+            {'submission': stranger.pk, 'score': 1},
+            {'submission': self.submissions[0].pk, 'score': 40},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'1', '2', '3'})
+        self.assertIn('maximum score of 50', response.json()['errors']['1'][0])
+        self.assertFalse(Grade.objects.exists())
+        self.assertEqual(self.client.post(reverse('assignments:bulk_grade_api'), 'x', content_type='application/json').status_code, 400)
+
+    def test_fractional_numbers_are_rejected(self):
+        response = self.post([
+            {'submission': self.submissions[0].pk, 'score': 40.5},
+            {'submission': self.submissions[1].pk, 'score': '30.5'},
+            {'submission': self.submissions[2].pk + 0.5, 'score': 30},
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual(errors['0'], ['Enter a whole number.'])
+        self.assertEqual(errors['1'], ['Enter a whole number.'])
+        self.assertEqual(errors['2'], ['Submission not found.'])
+        self.assertFalse(Grade.objects.exists())
+
+    def test_form(self):
+        url = reverse('assignments:bulk_grade', args=[self.assignment.pk])
+        self.assertContains(self.client.get(url), 'name="score_', count=3)
+        data = {f'score_{self.submissions[0].pk}': '40', f'feedback_{self.submissions[0].pk}': 'Good'}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data)
+        self.assertRedirects(response, reverse('assignments:detail', args=[self.assignment.pk]), fetch_redirect_response=False)
+        self.assertEqual(Grade.objects.get(submission=self.submissions[0]).feedback, 'Good')
+        # Graded work leaves the sheet; a bad score is shown next to its row
+        response = self.client.post(url, {f'score_{self.submissions[1].pk}': '99'})
+        self.assertContains(response, 'Score cannot exceed maximum score of 50.')
+        self.assertContains(response, 'name="score_', count=2)
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.manager = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+        self.other_manager = User.objects.create_user('other', 'other@example.com', None, role='manager')
+        self.student = User.objects.create_user('student', 'student@example.com', None, role='student')
+        self.classmate = User.objects.create_user('classmate', 'classmate@example.com', None, role='student')
+        self.photo = Assignment.objects.create(
+            title='Photosynthesis report', description='Explain how plants make food',
+            created_by=self.manager, due_date=timezone.now(),
+        )
+        self.photo.assigned_to.add(self.student, self.classmate)
+        self.cells = Assignment.objects.create(
+            title='Cell biology', description='Label the parts, including where photosynthesis happens',
+            created_by=self.other_manager, due_date=timezone.now(),
+        )
+        self.mine = Submission.objects.create(
+            assignment=self.photo, student=self.student, content='Chlorophyll absorbs light',
+        )
+        self.theirs = Submission.objects.create(
+            assignment=self.photo, student=self.classmate, content='Chlorophyll is green',
+        )
+        Comment.objects.create(submission=self.mine, author=self.manager, content='Mention chloroplasts')
+
+    def results(self, user, query):
+        return [(hit['kind'], hit['id']) for hit in search.search(user, query)]
+
+    def test_index_follows_writes(self):
+        self.assertTrue(search.available())
+        self.assertEqual(self.results(self.manager, 'absorbs'), [('submission', self.mine.pk)])
+
+        Assignment.objects.filter(pk=self.photo.pk).update(title='Respiration report')
+        self.assertEqual(self.results(self.manager, 'respiration'), [('assignment', self.photo.pk)])
+
+        self.mine.delete()
+        self.assertEqual(self.results(self.manager, 'absorbs'), [])
+        self.assertEqual(self.results(self.manager, 'chloroplasts'), [])
+
+    def test_prefix_matching_and_title_ranking(self):
+        admin = User.objects.create_user('admin', 'admin@example.com', None, role='admin')
+        self.assertEqual(
+            self.results(admin, 'photosyn'),
+            [('assignment', self.photo.pk), ('assignment', self.cells.pk)],
+        )
+        hit = search.search(admin, 'chloro')[0]
+        self.assertIn('<mark>', hit['snippet'])
+        self.assertEqual(hit['title'], 'Photosynthesis report')
+
+    def test_results_respect_visibility(self):
+        self.assertEqual(self.results(self.student, 'chlorophyll'), [('submission', self.mine.pk)])
+        self.assertEqual(self.results(self.student, 'chloroplasts'), [('comment', Comment.objects.get().pk)])
+        self.assertEqual(self.results(self.student, 'photosynthesis'), [('assignment', self.photo.pk)])
+        self.assertEqual(self.results(self.other_manager, 'photosynthesis'), [('assignment', self.cells.pk)])
+        self.assertEqual(self.results(self.other_manager, 'chlorophyll'), [])
+
+    def test_orm_fallback(self):
+        with mock.patch.object(search, 'available', return_value=False):
+            self.assertEqual(
+                sorted(self.results(self.student, 'chloro')),
+                [('comment', Comment.objects.get().pk), ('submission', self.mine.pk)],
+            )
+            self.assertEqual(self.results(self.student, 'photosynthesis'), [('assignment', self.photo.pk)])
+
+    def test_assignment_list_and_endpoint(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('assignments:list'), {'search': 'photo'})
+        self.assertEqual([a.pk for a in response.context['page_obj']], [self.photo.pk])
+
+        response = self.client.get(reverse('assignments:search'), {'q': 'light'})
+        self.assertEqual(
+            response.json()['results'][0]['url'],
+            reverse('assignments:submission_detail', args=[self.mine.pk]),
+        )
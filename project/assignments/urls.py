@@ -9,9 +9,13 @@ urlpatterns = [
     path('<int:pk>/', views.AssignmentDetailView.as_view(), name='detail'),
     path('<int:pk>/update/', views.AssignmentUpdateView.as_view(), name='update'),
     path('<int:pk>/delete/', views.AssignmentDeleteView.as_view(), name='delete'),
+    path('<int:pk>/roster/', views.assignment_roster, name='roster'),
+    path('<int:pk>/grade/', views.bulk_grade, name='bulk_grade'),
     path('<int:assignment_id>/submit/', views.submit_assignment, name='submit'),
     path('submission/<int:pk>/', views.SubmissionDetailView.as_view(), name='submission_detail'),
     path('submission/<int:pk>/grade/', views.grade_submission, name='grade_submission'),
     path('submission/<int:pk>/comment/', views.add_comment, name='add_comment'),
+    path('grades/bulk/', views.bulk_grade_api, name='bulk_grade_api'),
     path('my-submissions/', views.my_submissions, name='my_submissions'),
+    path('search/', views.search, name='search'),
 ]
\ No newline at end of file
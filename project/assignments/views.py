@@ -1,33 +1,84 @@
+import json
+
+from django.core.exceptions import ValidationError
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
+from django.views.decorators.http import require_POST
 from django.views.generic import CreateView, UpdateView, DeleteView, DetailView
 from django.urls import reverse_lazy
-from django.db.models import Q, Avg
+from django.core.cache import cache
+from django.db.models import Avg, Count, Min, Prefetch
 from django.utils import timezone
-from django.core.paginator import Paginator
+from django.db import transaction
 
+from dashboard import generations
+from dashboard.conditional import versioned
+from dashboard.mixins import CachedObjectMixin
+from dashboard.pagination import KeysetPaginator
 from .models import Assignment, Submission, Grade, Comment
+from . import grading, roster as rosters, search as full_text
 from .forms import AssignmentForm, SubmissionForm, GradeForm, CommentForm, AssignmentFilterForm
-from dashboard.models import Notification
+
+ROSTER_PER_PAGE = 50
+
+
+def _assignment_list_scopes(request):
+    user = request.user
+    if user.is_admin:
+        scopes = [
+            generations.site_assignments(), generations.site_submissions(), generations.site_grades(),
+        ]
+    elif user.is_manager:
+        scopes = [
+            generations.owner_assignments(user.pk), generations.owner_submissions(user.pk),
+            generations.owner_grades(user.pk),
+        ]
+    elif user.is_student:
+        scopes = [
+            generations.student_assignments(user.pk), generations.student_submissions(user.pk),
+            generations.student_grades(user.pk),
+        ]
+    else:
+        return None
+    # Creator names and the "created by" filter choices
+    return scopes + [generations.site_users()]
+
+
+def _assignment_list_clock(request):
+    # "Overdue" badges flip as due dates pass without any write to bump a
+    # generation; the next due date in scope joins the ETag instead. It is
+    # cached per data generation and only looked up again once it has passed
+    now = timezone.now()
+    key = 'assignment_list_next_due:' + ':'.join(map(str, [
+        request.user.pk, *generations.generations(_assignment_list_scopes(request)),
+    ]))
+    upcoming = cache.get(key)
+    if upcoming is None or (upcoming and upcoming <= now):
+        upcoming = Assignment.objects.visible_to(request.user).filter(due_date__gt=now).aggregate(
+            next=Min('due_date')
+        )['next'] or ''
+        cache.set(key, upcoming)
+    return [upcoming.isoformat() if upcoming else '']
+
+
+def _count_key(request, scopes):
+    """Cache key for the total of a cursor-paginated list: the filters and data generations"""
+    query = request.GET.copy()
+    query.pop('cursor', None)
+    return (request.path, request.user.pk, query.urlencode(), *generations.generations(scopes))
 
 
 @login_required
+@versioned(_assignment_list_scopes, page=True, extra=_assignment_list_clock)
 def assignment_list(request):
     """List assignments based on user role"""
     user = request.user
     form = AssignmentFilterForm(request.GET)
     
-    # Base queryset based on user role
-    if user.is_admin:
-        assignments = Assignment.objects.all()
-    elif user.is_manager:
-        assignments = Assignment.objects.filter(created_by=user)
-    elif user.is_student:
-        assignments = Assignment.objects.filter(assigned_to=user)
-    else:
-        assignments = Assignment.objects.none()
+    assignments = Assignment.objects.visible_to(user)
     
     # Apply filters
     if form.is_valid():
@@ -37,9 +88,7 @@ def assignment_list(request):
         created_by = form.cleaned_data.get('created_by')
         
         if search:
-            assignments = assignments.filter(
-                Q(title__icontains=search) | Q(description__icontains=search)
-            )
+            assignments = full_text.matching_assignments(assignments, search)
         
         if status == 'active':
             assignments = assignments.filter(is_active=True)
@@ -52,15 +101,32 @@ def assignment_list(request):
         if created_by:
             assignments = assignments.filter(created_by=created_by)
     
-    assignments = assignments.select_related('created_by').order_by('-created_at')
-    
-    # Pagination
-    paginator = Paginator(assignments, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    assignments = (
+        assignments.with_submission_counts()
+        .select_related('created_by')
+        .order_by('-created_at')
+    )
+    if user.is_student:
+        # Only the student's own submission, not the whole class's
+        assignments = assignments.prefetch_related(Prefetch(
+            'submissions',
+            queryset=Submission.objects.filter(student=user).select_related('grade'),
+            to_attr='my_submissions',
+        ))
+    
+    # Cursor pagination: deep pages cost the same as the first
+    scopes = _assignment_list_scopes(request)
+    paginator = KeysetPaginator(
+        assignments,
+        ordering=('-created_at', '-id'),
+        per_page=10,
+        count_key=scopes and _count_key(request, scopes),
+    )
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     return render(request, 'assignments/list.html', {
         'page_obj': page_obj,
+        'paginator': paginator,
         'form': form,
         'user': user,
     })
@@ -86,33 +152,23 @@ class AssignmentCreateView(LoginRequiredMixin, CreateView):
     
     def form_valid(self, form):
         form.instance.created_by = self.request.user
-        response = super().form_valid(form)
-        
-        # Create notifications for assigned students
-        for student in form.instance.assigned_to.all():
-            Notification.objects.create(
-                recipient=student,
-                title=f"New Assignment: {form.instance.title}",
-                message=f"You have been assigned a new assignment '{form.instance.title}' due on {form.instance.due_date}.",
-                notification_type='assignment_created'
-            )
+        # Assigned students are notified by the m2m_changed receiver after commit
+        with transaction.atomic():
+            response = super().form_valid(form)
         
         messages.success(self.request, 'Assignment created successfully!')
         return response
 
 
-class AssignmentUpdateView(LoginRequiredMixin, UpdateView):
+class AssignmentUpdateView(LoginRequiredMixin, CachedObjectMixin, UpdateView):
     """Update assignment (creator only)"""
     model = Assignment
     form_class = AssignmentForm
     template_name = 'assignments/update.html'
     
-    def dispatch(self, request, *args, **kwargs):
-        assignment = self.get_object()
-        if not (request.user == assignment.created_by or request.user.is_admin):
-            messages.error(request, 'You do not have permission to edit this assignment.')
-            return redirect('assignments:detail', pk=assignment.pk)
-        return super().dispatch(request, *args, **kwargs)
+    def get_queryset(self):
+        # Anyone else's assignment is a 404
+        return Assignment.objects.managed_by(self.request.user)
     
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
@@ -127,34 +183,37 @@ class AssignmentUpdateView(LoginRequiredMixin, UpdateView):
         return super().form_valid(form)
 
 
-class AssignmentDeleteView(LoginRequiredMixin, DeleteView):
+class AssignmentDeleteView(LoginRequiredMixin, CachedObjectMixin, DeleteView):
     """Delete assignment (creator only)"""
     model = Assignment
     template_name = 'assignments/delete.html'
     success_url = reverse_lazy('assignments:list')
     
-    def dispatch(self, request, *args, **kwargs):
-        assignment = self.get_object()
-        if not (request.user == assignment.created_by or request.user.is_admin):
-            messages.error(request, 'You do not have permission to delete this assignment.')
-            return redirect('assignments:detail', pk=assignment.pk)
-        return super().dispatch(request, *args, **kwargs)
+    def get_queryset(self):
+        # Anyone else's assignment is a 404
+        return Assignment.objects.managed_by(self.request.user)
     
-    def delete(self, request, *args, **kwargs):
-        messages.success(request, 'Assignment deleted successfully!')
-        return super().delete(request, *args, **kwargs)
+    def form_valid(self, form):
+        # DeleteView deletes in form_valid(); delete() is no longer called on POST
+        messages.success(self.request, 'Assignment deleted successfully!')
+        return super().form_valid(form)
 
 
-class AssignmentDetailView(LoginRequiredMixin, DetailView):
+class AssignmentDetailView(LoginRequiredMixin, CachedObjectMixin, DetailView):
     """View assignment details"""
     model = Assignment
     template_name = 'assignments/detail.html'
     context_object_name = 'assignment'
+    select_related = ('created_by',)
+    
+    def get_queryset(self):
+        return Assignment.objects.visible_to(self.request.user)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         assignment = self.object
         user = self.request.user
+        manages = user.is_admin or assignment.created_by_id == user.pk
         
         # Check if user has submitted
         user_submission = None
@@ -167,17 +226,50 @@ class AssignmentDetailView(LoginRequiredMixin, DetailView):
         context.update({
             'user_submission': user_submission,
             'can_submit': user.is_student and assignment.is_active and not user_submission,
-            'can_edit': user == assignment.created_by or user.is_admin,
-            'submissions': assignment.submissions.select_related('student').order_by('-submitted_at') if user.is_admin or user == assignment.created_by else None,
+            'can_edit': manages,
         })
+        # The stats panel, for everyone who can see the assignment
+        context.update(assignment.submissions.aggregate(
+            submission_count=Count('id'),
+            graded_count=Count('grade'),
+            average_grade=Avg('grade__score'),
+        ))
+        context['pending_count'] = context['submission_count'] - context['graded_count']
+        if manages:
+            # One page of the class, never the whole submission list
+            context['roster'] = _roster_page(self.request, assignment)
+            context['roster_status'] = self.request.GET.get('status', '')
+            context['roster_statuses'] = rosters.STATUSES
         
         return context
 
 
+def _roster_page(request, assignment):
+    """The page of ``assignment``'s roster after ``?cursor=``, filtered by ``?status=``"""
+    paginator = KeysetPaginator(
+        rosters.roster(assignment, request.GET.get('status')),
+        ordering=rosters.ORDERING,
+        per_page=ROSTER_PER_PAGE,
+    )
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+@login_required
+def assignment_roster(request, pk):
+    """One page of the submission roster (JSON, creator/admin only)"""
+    assignment = get_object_or_404(Assignment.objects.managed_by(request.user), pk=pk)
+    page = _roster_page(request, assignment)
+    return JsonResponse({
+        'results': [rosters.as_dict(student) for student in page],
+        'next_cursor': page.next_cursor,
+    })
+
+
 @login_required
+@transaction.atomic
 def submit_assignment(request, assignment_id):
     """Submit assignment (students only)"""
-    assignment = get_object_or_404(Assignment, id=assignment_id)
+    assignment = get_object_or_404(Assignment.objects.visible_to(request.user), id=assignment_id)
     
     if not request.user.is_student:
         messages.error(request, 'Only students can submit assignments.')
@@ -198,22 +290,11 @@ def submit_assignment(request, assignment_id):
             submission = form.save(commit=False)
             submission.assignment = assignment
             submission.student = request.user
+            submission.status = 'submitted'
             submission.submitted_at = timezone.now()
-            
-            # Check if late
-            if assignment.due_date and submission.submitted_at > assignment.due_date:
-                submission.is_late = True
-            
+            # Lateness is derived from submitted_at (Submission.is_late)
             submission.save()
             
-            # Create notification for assignment creator
-            Notification.objects.create(
-                recipient=assignment.created_by,
-                title=f"New Submission: {assignment.title}",
-                message=f"{request.user.get_full_name()} has submitted '{assignment.title}'.",
-                notification_type='general'
-            )
-            
             messages.success(request, 'Assignment submitted successfully!')
             return redirect('assignments:detail', pk=assignment_id)
     else:
@@ -225,24 +306,20 @@ def submit_assignment(request, assignment_id):
     })
 
 
-class SubmissionDetailView(LoginRequiredMixin, DetailView):
+class SubmissionDetailView(LoginRequiredMixin, CachedObjectMixin, DetailView):
     """View submission details"""
     model = Submission
     template_name = 'assignments/submission_detail.html'
     context_object_name = 'submission'
+    select_related = ('assignment', 'student', 'grade')
+    # The template lists submission.comments.all with each author
+    prefetch_related = (
+        Prefetch('comments', queryset=Comment.objects.select_related('author').order_by('created_at')),
+    )
     
-    def dispatch(self, request, *args, **kwargs):
-        submission = self.get_object()
-        user = request.user
-        
-        # Check permissions
-        if not (user == submission.student or 
-                user == submission.assignment.created_by or 
-                user.is_admin):
-            messages.error(request, 'You do not have permission to view this submission.')
-            return redirect('assignments:list')
-        
-        return super().dispatch(request, *args, **kwargs)
+    def get_queryset(self):
+        # Authorized and loaded in one query; anyone else's submission is a 404
+        return Submission.objects.visible_to(self.request.user)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -250,8 +327,8 @@ class SubmissionDetailView(LoginRequiredMixin, DetailView):
         user = self.request.user
         
         context.update({
-            'can_grade': (user == submission.assignment.created_by or user.is_admin) and not hasattr(submission, 'grade'),
-            'comments': submission.comments.select_related('author').order_by('created_at'),
+            'can_grade': (submission.assignment.created_by_id == user.pk or user.is_admin) and not hasattr(submission, 'grade'),
+            'comments': submission.comments.all(),
             'comment_form': CommentForm(),
         })
         
@@ -259,13 +336,12 @@ class SubmissionDetailView(LoginRequiredMixin, DetailView):
 
 
 @login_required
+@transaction.atomic
 def grade_submission(request, pk):
     """Grade a submission (manager/admin only)"""
-    submission = get_object_or_404(Submission, pk=pk)
-    
-    if not (request.user == submission.assignment.created_by or request.user.is_admin):
-        messages.error(request, 'You do not have permission to grade this submission.')
-        return redirect('assignments:submission_detail', pk=pk)
+    submission = get_object_or_404(
+        Submission.objects.managed_by(request.user).select_related('assignment', 'student', 'grade'), pk=pk
+    )
     
     if hasattr(submission, 'grade'):
         messages.error(request, 'This submission has already been graded.')
@@ -284,14 +360,6 @@ def grade_submission(request, pk):
             submission.status = 'graded'
             submission.save()
             
-            # Create notification for student
-            Notification.objects.create(
-                recipient=submission.student,
-                title=f"Assignment Graded: {submission.assignment.title}",
-                message=f"Your submission for '{submission.assignment.title}' has been graded. Score: {grade.score}/{submission.assignment.max_score}",
-                notification_type='submission_graded'
-            )
-            
             messages.success(request, 'Submission graded successfully!')
             return redirect('assignments:submission_detail', pk=pk)
     else:
@@ -304,16 +372,75 @@ def grade_submission(request, pk):
 
 
 @login_required
+def bulk_grade(request, pk):
+    """Grade an assignment's ungraded submissions in one go (creator/admin only)"""
+    assignment = get_object_or_404(Assignment.objects.managed_by(request.user), pk=pk)
+    submissions = list(
+        assignment.submissions.filter(status='submitted', grade__isnull=True)
+        .select_related('assignment', 'student')
+        .order_by('student__last_name', 'student__first_name', 'student_id')
+    )
+    
+    if request.method == 'POST':
+        rows = []
+        for submission in submissions:
+            submission.posted_score = request.POST.get(f'score_{submission.pk}', '').strip()
+            submission.posted_feedback = request.POST.get(f'feedback_{submission.pk}', '')
+            # Rows left without a score are not graded yet
+            if submission.posted_score:
+                rows.append({
+                    'submission': submission.pk,
+                    'score': submission.posted_score,
+                    'feedback': submission.posted_feedback,
+                })
+        try:
+            created, updated = grading.grade_many(request.user, rows)
+        except ValidationError as error:
+            errors = {rows[int(index)]['submission']: problems for index, problems in error.message_dict.items()}
+            for submission in submissions:
+                submission.grading_errors = errors.get(submission.pk)
+            messages.error(request, 'Some grades could not be saved; nothing was graded.')
+        else:
+            messages.success(request, f'Graded {created + updated} submission{"s" if created + updated != 1 else ""}.')
+            return redirect('assignments:detail', pk=pk)
+    
+    return render(request, 'assignments/bulk_grade.html', {
+        'assignment': assignment,
+        'submissions': submissions,
+    })
+
+
+@login_required
+@require_POST
+def bulk_grade_api(request):
+    """
+    Grade many submissions from a JSON body (creator/admin only).
+
+    Expects ``{"grades": [{"submission": id, "score": n, "feedback": "..."}]}``
+    and answers ``{"created": n, "updated": n}``, or 400 with the errors of
+    each bad row by index.
+    """
+    try:
+        rows = json.loads(request.body)['grades']
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected {"grades": [{"submission", "score", "feedback"}, ...]}.'}, status=400)
+    
+    try:
+        created, updated = grading.grade_many(request.user, rows)
+    except ValidationError as error:
+        return JsonResponse({'errors': error.message_dict}, status=400)
+    return JsonResponse({'created': created, 'updated': updated})
+
+
+@login_required
+@transaction.atomic
 def add_comment(request, pk):
     """Add comment to submission"""
-    submission = get_object_or_404(Submission, pk=pk)
-    
-    # Check permissions
-    if not (request.user == submission.student or 
-            request.user == submission.assignment.created_by or 
-            request.user.is_admin):
-        messages.error(request, 'You do not have permission to comment on this submission.')
-        return redirect('assignments:list')
+    submission = get_object_or_404(
+        Submission.objects.visible_to(request.user).select_related('assignment', 'student'), pk=pk
+    )
     
     if request.method == 'POST':
         form = CommentForm(request.POST)
@@ -323,27 +450,24 @@ def add_comment(request, pk):
             comment.author = request.user
             comment.save()
             
-            # Create notification for relevant users
-            recipients = []
-            if request.user != submission.student:
-                recipients.append(submission.student)
-            if request.user != submission.assignment.created_by:
-                recipients.append(submission.assignment.created_by)
-            
-            for recipient in recipients:
-                Notification.objects.create(
-                    recipient=recipient,
-                    title=f"New Comment: {submission.assignment.title}",
-                    message=f"{request.user.get_full_name()} added a comment to the submission.",
-                    notification_type='comment_added'
-                )
-            
             messages.success(request, 'Comment added successfully!')
     
     return redirect('assignments:submission_detail', pk=pk)
 
 
+def _my_submissions_scopes(request):
+    user = request.user
+    if not user.is_student:
+        return None
+    return [
+        generations.student_submissions(user.pk),
+        generations.student_grades(user.pk),
+        generations.student_assignments(user.pk),
+    ]
+
+
 @login_required
+@versioned(_my_submissions_scopes, page=True)
 def my_submissions(request):
     """View student's own submissions"""
     if not request.user.is_student:
@@ -352,13 +476,25 @@ def my_submissions(request):
     
     submissions = Submission.objects.filter(
         student=request.user
-    ).select_related('assignment').order_by('-submitted_at')
+    ).select_related('assignment', 'grade')
     
-    # Pagination
-    paginator = Paginator(submissions, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Cursor pagination; drafts (never submitted) come last
+    paginator = KeysetPaginator(
+        submissions,
+        ordering=('-submitted_at', '-id'),
+        per_page=10,
+        count_key=_count_key(request, _my_submissions_scopes(request)),
+    )
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     return render(request, 'assignments/my_submissions.html', {
         'page_obj': page_obj,
+        'paginator': paginator,
     })
+
+
+@login_required
+def search(request):
+    """Ranked full-text search over what the user can see (JSON)"""
+    query = request.GET.get('q', '')
+    return JsonResponse({'query': query, 'results': full_text.search(request.user, query)})
@@ -1,16 +1,58 @@
 from django.contrib import admin
-from .models import Notification, SystemSettings
+from .models import (
+    ArchivedNotification, DailySubmissionRollup, DashboardStats, EmailOutbox, ExportJob, Notification,
+    SystemSettings,
+)
 
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ('title', 'recipient', 'notification_type', 'is_read', 'created_at')
+    list_display = ('title', 'recipient', 'notification_type', 'is_read', 'digest_count', 'created_at')
     list_filter = ('notification_type', 'is_read', 'created_at')
     search_fields = ('title', 'message', 'recipient__username')
     raw_id_fields = ('recipient',)
     date_hierarchy = 'created_at'
 
 
+@admin.register(ArchivedNotification)
+class ArchivedNotificationAdmin(admin.ModelAdmin):
+    list_display = ('title', 'recipient', 'notification_type', 'created_at', 'archived_at')
+    list_filter = ('notification_type', 'archived_at')
+    search_fields = ('title', 'message', 'recipient__username')
+    raw_id_fields = ('recipient',)
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to_email', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('subject', 'to_email')
+    readonly_fields = ('created_at', 'sent_at', 'claimed_by', 'claimed_at', 'last_error')
+
+
+@admin.register(DashboardStats)
+class DashboardStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'assignments', 'active_assignments', 'pending_submissions', 'pending_assignments', 'updated_at')
+    raw_id_fields = ('user',)
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(DailySubmissionRollup)
+class DailySubmissionRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'assignment', 'manager', 'submitted', 'late', 'graded', 'score_sum')
+    list_filter = ('date',)
+    raw_id_fields = ('assignment', 'manager')
+    date_hierarchy = 'date'
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'scope', 'requested_by', 'status', 'rows_done', 'rows_total', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status', 'created_at')
+    raw_id_fields = ('requested_by',)
+    readonly_fields = ('fingerprint', 'claimed_by', 'error', 'created_at', 'started_at', 'finished_at')
+
+
 @admin.register(SystemSettings)
 class SystemSettingsAdmin(admin.ModelAdmin):
     list_display = ('key', 'value', 'updated_at')
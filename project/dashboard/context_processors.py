@@ -0,0 +1,6 @@
+from django.conf import settings
+
+
+def live_notifications(request):
+    """Whether pages should open the live notification stream"""
+    return {'live_notifications_enabled': settings.LIVE_NOTIFICATIONS_ENABLED}
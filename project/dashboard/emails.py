@@ -0,0 +1,77 @@
+"""
+Render-once email templates.
+
+Notification emails differ between recipients only in the greeting, so a
+template is rendered once per event against a placeholder recipient whose
+fields render as marker tokens. The result (and its ``strip_tags`` plain-text
+version) is split on those markers, and each recipient is produced by joining
+the pre-rendered segments with their own, escaped, values.
+"""
+import re
+
+from django.template.loader import render_to_string
+from django.utils.html import escape, strip_tags
+
+RECIPIENT_FIELDS = ('get_full_name', 'username', 'first_name', 'last_name', 'email')
+
+_TOKEN = '\x1e{}\x1e'
+_TOKEN_RE = re.compile('\x1e(' + '|'.join(RECIPIENT_FIELDS) + ')\x1e')
+
+
+class RecipientPlaceholder:
+    """Stand-in user whose fields render as substitution markers"""
+
+    username = _TOKEN.format('username')
+    first_name = _TOKEN.format('first_name')
+    last_name = _TOKEN.format('last_name')
+    email = _TOKEN.format('email')
+
+    def get_full_name(self):
+        return _TOKEN.format('get_full_name')
+
+
+def recipient_values(recipient, fields=RECIPIENT_FIELDS):
+    """Escaped per-recipient values for ``fields``"""
+    values = {}
+    for field in fields:
+        if field == 'get_full_name':
+            # Templates always write `{{ user.get_full_name|default:user.username }}`
+            value = recipient.get_full_name() or recipient.username
+        else:
+            value = getattr(recipient, field)
+        values[field] = escape(value)
+    return values
+
+
+def _split(rendered):
+    # Even indexes are literal text, odd indexes are field names
+    return _TOKEN_RE.split(rendered)
+
+
+def _join(segments, values):
+    if len(segments) == 1:
+        return segments[0]
+    parts = segments[:]
+    for i in range(1, len(parts), 2):
+        parts[i] = values[parts[i]]
+    return ''.join(parts)
+
+
+class CompiledEmail:
+    """An email template rendered once for an event and personalised per recipient"""
+
+    def __init__(self, template_name, context, recipient_var):
+        html = render_to_string(template_name, {**context, recipient_var: RecipientPlaceholder()})
+        self.template_name = template_name
+        self._html = _split(html)
+        self._text = _split(strip_tags(html))
+        self.fields = tuple(set(self._html[1::2]) | set(self._text[1::2]))
+
+    def render(self, recipient):
+        """Return ``(plain_text, html)`` for ``recipient``"""
+        values = recipient_values(recipient, self.fields)
+        return _join(self._text, values), _join(self._html, values)
+
+
+def compile_email(template_name, context, recipient_var='recipient'):
+    return CompiledEmail(template_name, context, recipient_var)
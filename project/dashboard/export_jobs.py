@@ -0,0 +1,180 @@
+"""
+Background export jobs.
+
+``start(kind, user)`` records an ``ExportJob`` and hands it to the background
+pool (``dashboard.tasks``) once the request commits; ``manage.py
+run_export_jobs`` drains the same queue from a separate worker process. Either
+way a job is claimed with a conditional UPDATE, so it runs exactly once.
+
+Jobs are fingerprinted by kind, scope and the generations of the data they
+read. Starting an export whose fingerprint matches a finished job reuses its
+file, and one matching a pending or running job joins it.
+"""
+import hashlib
+import logging
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import exports, tasks
+from .generations import generations
+from .gradebook import Gradebook
+from .models import ExportJob
+from .outbox import default_worker_id
+
+logger = logging.getLogger(__name__)
+
+
+def _students(user):
+    students = exports.students_for(user)
+    return exports.STUDENT_HEADERS, exports.student_rows(students), students.count()
+
+
+def _assignments(user):
+    assignments = exports.assignments_for(user)
+    return exports.ASSIGNMENT_HEADERS, exports.assignment_rows(assignments), assignments.count()
+
+
+def _gradebook(user):
+    book = Gradebook.build(exports.assignments_for(user))
+    return book.headers(), book.rows(), len(book.students) + 1
+
+
+# Each source returns ``(headers, rows, row_count)`` for the requesting user
+KINDS = {
+    'students': {
+        'source': _students,
+        'write': lambda file, headers, rows: exports.write_xlsx(file, 'Students', headers, rows),
+        'extension': 'xlsx',
+        'content_type': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    },
+    'assignments': {
+        'source': _assignments,
+        'write': exports.write_csv,
+        'extension': 'csv',
+        'content_type': 'text/csv',
+    },
+    'gradebook': {
+        'source': _gradebook,
+        'write': exports.write_csv,
+        'extension': 'csv',
+        'content_type': 'text/csv',
+    },
+}
+
+
+def scope_for(user):
+    """Whose data ``user``'s exports cover: everyone's for admins, their own otherwise"""
+    return 'site' if user.is_admin else f'manager:{user.pk}'
+
+
+def fingerprint(kind, user):
+    current = generations(exports.generation_scopes(kind, user))
+    parts = [kind, scope_for(user), *map(str, current)]
+    return hashlib.sha1('\n'.join(parts).encode()).hexdigest()
+
+
+def visible_to(user):
+    """Jobs whose files ``user`` may download"""
+    return ExportJob.objects.filter(scope=scope_for(user))
+
+
+def start(kind, user):
+    """``(job, created)``: a reusable or in-flight job for this data, or a new one"""
+    key = fingerprint(kind, user)
+    reusable = ExportJob.objects.filter(fingerprint=key, status__in=['pending', 'running', 'done'])
+    for job in reusable.order_by('-created_at'):
+        # A finished job whose file has gone is ignored
+        if job.status != 'done' or job.file.storage.exists(job.file.name):
+            return job, False
+
+    try:
+        with transaction.atomic():
+            job = ExportJob.objects.create(kind=kind, scope=scope_for(user), fingerprint=key, requested_by=user)
+    except IntegrityError:
+        # An identical job was started concurrently
+        return reusable.order_by('-created_at').first(), False
+    tasks.run_after_commit(run, job.pk)
+    return job, True
+
+
+def claim(job_id=None, worker_id=None):
+    """Claim ``job_id``, or the oldest pending job; ``None`` if there is nothing to claim"""
+    pending = ExportJob.objects.filter(status='pending')
+    if job_id is None:
+        job_id = pending.order_by('created_at').values_list('pk', flat=True).first()
+        if job_id is None:
+            return None
+    claimed = pending.filter(pk=job_id).update(
+        status='running', claimed_by=worker_id or default_worker_id(), started_at=timezone.now(),
+    )
+    return ExportJob.objects.get(pk=job_id) if claimed else None
+
+
+def run(job_id=None, worker_id=None):
+    """Claim and generate one job; returns it, or ``None`` if another worker has it"""
+    job = claim(job_id, worker_id)
+    if job is None:
+        return None
+    try:
+        generate(job)
+    except Exception as e:
+        logger.exception('Export job %s failed', job.pk)
+        ExportJob.objects.filter(pk=job.pk).update(status='failed', error=str(e), finished_at=timezone.now())
+        job.refresh_from_db()
+    return job
+
+
+def generate(job):
+    kind = KINDS[job.kind]
+    headers, rows, job.rows_total = kind['source'](job.requested_by)
+    ExportJob.objects.filter(pk=job.pk).update(rows_total=job.rows_total)
+
+    with tempfile.TemporaryFile() as output:
+        kind['write'](output, headers, _tracked(job, rows))
+        output.seek(0)
+        job.file.save(f"{job.kind}-{job.pk}.{kind['extension']}", File(output), save=False)
+
+    job.status = 'done'
+    job.rows_done = job.rows_total
+    job.finished_at = timezone.now()
+    job.save(update_fields=['file', 'status', 'rows_done', 'finished_at'])
+
+
+def _tracked(job, rows):
+    """Pass ``rows`` through, recording progress once per chunk"""
+    step = exports.chunk_size()
+    done = 0
+    for row in rows:
+        yield row
+        done += 1
+        if done % step == 0:
+            ExportJob.objects.filter(pk=job.pk).update(rows_done=done)
+
+
+def release_stale_claims(now=None):
+    """Return jobs claimed by a worker that died mid-export to the queue"""
+    now = now or timezone.now()
+    lease = getattr(settings, 'EXPORT_JOB_LEASE_SECONDS', 1800)
+    return ExportJob.objects.filter(
+        status='running',
+        started_at__lt=now - timedelta(seconds=lease),
+    ).update(status='pending', claimed_by='', started_at=None, rows_done=0)
+
+
+def purge_expired(now=None):
+    """Delete finished and failed jobs past their retention, files included"""
+    now = now or timezone.now()
+    retention = timedelta(hours=getattr(settings, 'EXPORT_JOB_RETENTION_HOURS', 24))
+    expired = ExportJob.objects.filter(status__in=['done', 'failed'], created_at__lt=now - retention)
+    count = 0
+    for job in expired.iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        count += 1
+    return count
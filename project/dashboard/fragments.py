@@ -0,0 +1,58 @@
+"""
+Fragment cache for the dashboard home page.
+
+Each panel is cached per user and role under a key that embeds the current
+generation (``dashboard.generations``) of every scope it depends on, e.g.
+``assignments:student:42`` for a student's upcoming assignments. Saves and
+deletes bump the affected generations after commit, so the next visit misses
+and re-renders; nothing is ever deleted from the cache, stale entries simply
+age out.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .generations import generations
+
+FRAGMENT_PREFIX = 'dashboard:fragment:'
+METRICS_PREFIX = 'dashboard:fragment-metrics:'
+
+FRAGMENTS = ['recent_activity', 'upcoming_assignments']
+
+
+def fragment_key(name, user, scopes):
+    """Cache key for panel ``name`` as shown to ``user``"""
+    stamp = '.'.join(str(generation) for generation in generations(scopes))
+    return f'{FRAGMENT_PREFIX}{name}:{user.pk}:{user.role}:{stamp}'
+
+
+def fragment_timeout():
+    return getattr(settings, 'DASHBOARD_FRAGMENT_TIMEOUT', 300)
+
+
+def record(name, hit):
+    key = f"{METRICS_PREFIX}{name}:{'hits' if hit else 'misses'}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def metrics():
+    """``{fragment: {'hits', 'misses', 'hit_ratio'}}`` since the cache was last cleared"""
+    keys = [
+        f'{METRICS_PREFIX}{name}:{kind}'
+        for name in FRAGMENTS for kind in ('hits', 'misses')
+    ]
+    counts = cache.get_many(keys)
+    result = {}
+    for name in FRAGMENTS:
+        hits = counts.get(f'{METRICS_PREFIX}{name}:hits', 0)
+        misses = counts.get(f'{METRICS_PREFIX}{name}:misses', 0)
+        total = hits + misses
+        result[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 3) if total else None,
+        }
+    return result
@@ -0,0 +1,94 @@
+"""
+Cache-backed generation stamps.
+
+A *scope* names a slice of data, e.g. ``assignments:student:42`` for the
+assignments of one student. Its generation changes whenever that data does
+(the receivers in ``dashboard.signals`` bump it after commit), so anything
+derived from the data can be keyed or validated by the generation alone,
+without touching the database: the dashboard fragment cache
+(``dashboard.fragments``) and HTTP ETags (``dashboard.conditional``).
+
+Generations are nanosecond timestamps of the last change, which also makes
+them usable as ``Last-Modified`` values.
+"""
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import transaction
+
+PREFIX = 'dashboard:gen:'
+
+
+def site_users():
+    return 'users:site'
+
+
+def site_assignments():
+    return 'assignments:site'
+
+
+def owner_assignments(user_id):
+    return f'assignments:owner:{user_id}'
+
+
+def student_assignments(user_id):
+    return f'assignments:student:{user_id}'
+
+
+def site_submissions():
+    return 'submissions:site'
+
+
+def owner_submissions(user_id):
+    return f'submissions:owner:{user_id}'
+
+
+def student_submissions(user_id):
+    return f'submissions:student:{user_id}'
+
+
+def site_grades():
+    return 'grades:site'
+
+
+def owner_grades(user_id):
+    return f'grades:owner:{user_id}'
+
+
+def student_grades(user_id):
+    return f'grades:student:{user_id}'
+
+
+def _now():
+    return time.time_ns()
+
+
+def generations(scopes):
+    """Current generation of each scope, creating missing ones"""
+    keys = [PREFIX + scope for scope in scopes]
+    found = cache.get_many(keys)
+    # A generation evicted from the cache restarts at "now", never at a
+    # value that older keys or ETags were built with
+    missing = {key: _now() for key in keys if key not in found}
+    for key, value in missing.items():
+        if not cache.add(key, value, timeout=None):
+            missing[key] = cache.get(key, value)
+    found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    """Move ``scopes`` to a new generation"""
+    now = _now()
+    cache.set_many({PREFIX + scope: now for scope in set(scopes)}, timeout=None)
+
+
+def bump_on_commit(*scopes, using=None):
+    """Bump ``scopes`` once the current transaction commits"""
+    if scopes:
+        transaction.on_commit(lambda: bump(*scopes), using=using)
+
+
+def as_datetime(generation):
+    return datetime.fromtimestamp(generation / 1e9, tz=dt_timezone.utc)
@@ -0,0 +1,150 @@
+"""
+Gradebook: a dense students x assignments score matrix.
+
+Every grade is read in one streamed query over the ``Grade``/``Submission``
+join and scattered into the matrix, with per-student and per-assignment
+totals accumulated in the same pass. With NumPy installed this is done on
+whole arrays (``np.fromiter`` + fancy indexing + ``np.bincount``); without it
+the same pass runs over flat ``array('d')`` rows. Ungraded cells are NaN.
+"""
+import math
+from array import array
+
+from django.db.models import Q
+
+from accounts.models import User
+from assignments.models import Grade, letter_for
+from . import exports
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NAN = float('nan')
+
+
+class Gradebook:
+    """Scores of ``students`` (rows) on ``assignments`` (columns)"""
+
+    def __init__(self, students, assignments, scores, student_totals, student_possible,
+                 student_graded, assignment_totals, assignment_graded, backend='python'):
+        self.backend = backend
+        self.students = students
+        self.assignments = assignments
+        self.scores = scores
+        self.student_totals = student_totals
+        self.student_graded = student_graded
+        self.assignment_graded = assignment_graded
+        self.student_percentages = [
+            round(total * 100 / possible, 1) if possible else None
+            for total, possible in zip(student_totals, student_possible)
+        ]
+        self.student_letters = [
+            letter_for(percentage) if percentage is not None else ''
+            for percentage in self.student_percentages
+        ]
+        self.assignment_averages = [
+            round(total / graded, 2) if graded else None
+            for total, graded in zip(assignment_totals, assignment_graded)
+        ]
+
+    @classmethod
+    def build(cls, assignments):
+        """Gradebook of the students assigned to or graded on ``assignments``"""
+        assignments = list(
+            assignments.order_by('due_date', 'pk').values_list('pk', 'title', 'max_score')
+        )
+        assignment_ids = [pk for pk, _, _ in assignments]
+        through = User.assignments.through.objects.filter(assignment_id__in=assignment_ids)
+        graded = Grade.objects.filter(submission__assignment_id__in=assignment_ids)
+        students = list(
+            User.objects.filter(
+                Q(pk__in=through.values('user_id')) | Q(pk__in=graded.values('submission__student_id'))
+            ).order_by('last_name', 'first_name', 'username').values_list('pk', 'username', 'first_name', 'last_name')
+        )
+        grades = graded.values_list(
+            'submission__student_id', 'submission__assignment_id', 'score'
+        ).iterator(chunk_size=exports.chunk_size())
+        if np is not None:
+            return cls(students, assignments, *_fill_numpy(grades, students, assignments), backend='numpy')
+        return cls(students, assignments, *_fill_python(grades, students, assignments))
+
+    def score_row(self, index):
+        """Scores of student ``index``, ``None`` where ungraded"""
+        return [None if math.isnan(score) else score for score in self.scores[index].tolist()]
+
+    def headers(self):
+        return [
+            'Username', 'Name',
+            *[f'{title} (/{max_score})' for _, title, max_score in self.assignments],
+            'Graded', 'Total', 'Percentage', 'Letter Grade',
+        ]
+
+    def rows(self):
+        """Export rows: one per student, then the assignment averages"""
+        for index, (_, username, first_name, last_name) in enumerate(self.students):
+            percentage = self.student_percentages[index]
+            yield [
+                username,
+                f'{first_name} {last_name}'.strip(),
+                *['' if score is None else f'{score:g}' for score in self.score_row(index)],
+                self.student_graded[index],
+                f'{self.student_totals[index]:g}',
+                '' if percentage is None else f'{percentage:.1f}',
+                self.student_letters[index],
+            ]
+        yield [
+            'Average', '',
+            *['' if average is None else f'{average:.2f}' for average in self.assignment_averages],
+            '', '', '', '',
+        ]
+
+
+def _fill_numpy(grades, students, assignments):
+    student_ids = np.array([pk for pk, *_ in students], dtype=np.int64)
+    assignment_ids = np.array([pk for pk, *_ in assignments], dtype=np.int64)
+    max_scores = np.array([max_score for *_, max_score in assignments], dtype=np.float64)
+    data = np.fromiter(grades, dtype=[('student', np.int64), ('assignment', np.int64), ('score', np.float64)])
+
+    rows = _positions(student_ids, data['student'])
+    columns = _positions(assignment_ids, data['assignment'])
+    scores = np.full((len(students), len(assignments)), np.nan)
+    scores[rows, columns] = data['score']
+
+    n, m = len(students), len(assignments)
+    return (
+        scores,
+        np.bincount(rows, weights=data['score'], minlength=n).tolist(),
+        np.bincount(rows, weights=max_scores[columns], minlength=n).tolist(),
+        np.bincount(rows, minlength=n).tolist(),
+        np.bincount(columns, weights=data['score'], minlength=m).tolist(),
+        np.bincount(columns, minlength=m).tolist(),
+    )
+
+
+def _positions(ids, values):
+    """Index of each of ``values`` in the unsorted, unique ``ids``"""
+    order = np.argsort(ids)
+    return order[np.searchsorted(ids, values, sorter=order)]
+
+
+def _fill_python(grades, students, assignments):
+    student_index = {pk: index for index, (pk, *_) in enumerate(students)}
+    assignment_index = {pk: index for index, (pk, *_) in enumerate(assignments)}
+    max_scores = [max_score for *_, max_score in assignments]
+    n, m = len(students), len(assignments)
+    scores = [array('d', [NAN]) * m for _ in range(n)]
+    student_totals, student_possible, student_graded = [0.0] * n, [0.0] * n, [0] * n
+    assignment_totals, assignment_graded = [0.0] * m, [0] * m
+
+    for student_id, assignment_id, score in grades:
+        row, column = student_index[student_id], assignment_index[assignment_id]
+        scores[row][column] = score
+        student_totals[row] += score
+        student_possible[row] += max_scores[column]
+        student_graded[row] += 1
+        assignment_totals[column] += score
+        assignment_graded[column] += 1
+
+    return scores, student_totals, student_possible, student_graded, assignment_totals, assignment_graded
@@ -0,0 +1,169 @@
+"""
+Live notification feed for the Server-Sent Events endpoint.
+
+Every open ``/dashboard/notifications/stream/`` connection subscribes to a
+single per-process ``NotificationFeed``. The feed polls the database once per
+``NOTIFICATION_STREAM_POLL_INTERVAL`` for *all* subscribers together (new
+notification rows past a high-water mark, plus the subscribers' unread
+counters) and fans the results out to per-connection queues, so idle
+connections cost no queries of their own.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Max
+
+from accounts.models import User
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+# Bound per-connection backlog; a client that stops reading is dropped
+QUEUE_SIZE = 100
+FETCH_LIMIT = 1000
+
+
+def format_event(event, data):
+    """Encode one SSE message"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def serialize_notification(notification):
+    return {
+        'id': notification['id'],
+        'title': notification['title'],
+        'message': notification['message'],
+        'notification_type': notification['notification_type'],
+        'created_at': notification['created_at'].isoformat(),
+    }
+
+
+class Subscription:
+    """One connection's bounded queue of pending SSE messages"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.closed = False
+
+
+class NotificationFeed:
+    """One shared change feed fanning new notifications out to subscribers"""
+
+    def __init__(self, interval=None):
+        self.interval = interval
+        self.subscribers = defaultdict(set)
+        self.last_id = None
+        self.unread_counts = {}
+        self._task = None
+
+    @property
+    def poll_interval(self):
+        if self.interval is not None:
+            return self.interval
+        return getattr(settings, 'NOTIFICATION_STREAM_POLL_INTERVAL', 2.0)
+
+    def subscribe(self, user_id, unread_count=None):
+        subscription = Subscription(user_id)
+        self.subscribers[user_id].add(subscription)
+        if unread_count is not None:
+            self.unread_counts.setdefault(user_id, unread_count)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscriptions = self.subscribers.get(subscription.user_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self.subscribers[subscription.user_id]
+            self.unread_counts.pop(subscription.user_id, None)
+        if not self.subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+            # The next subscriber starts from "now", not from where we stopped
+            self.last_id = None
+
+    async def _run(self):
+        while self.subscribers:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Notification feed poll failed')
+                # Drop a broken connection so the next poll reconnects
+                await sync_to_async(close_old_connections)()
+            await asyncio.sleep(self.poll_interval)
+
+    async def poll(self):
+        """Fetch changes for every subscriber in one round trip and dispatch them"""
+        user_ids = list(self.subscribers)
+        if not user_ids:
+            return
+        last_id, rows, counts = await sync_to_async(self._fetch)(self.last_id, user_ids)
+        self.last_id = last_id
+
+        for row in rows:
+            self._publish(row['recipient_id'], 'notification', serialize_notification(row))
+        for user_id, count in counts.items():
+            if self.unread_counts.get(user_id) != count:
+                self.unread_counts[user_id] = count
+                self._publish(user_id, 'unread', {'count': count})
+
+    def _fetch(self, last_id, user_ids):
+        high_water = Notification.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        rows = []
+        if last_id is not None and high_water > last_id:
+            rows = list(
+                Notification.objects.filter(
+                    id__gt=last_id, id__lte=high_water, recipient_id__in=user_ids
+                ).order_by('id').values(
+                    'id', 'recipient_id', 'title', 'message', 'notification_type', 'created_at'
+                )[:FETCH_LIMIT]
+            )
+            if len(rows) == FETCH_LIMIT:
+                # Resume after the last row delivered rather than skipping the rest
+                high_water = rows[-1]['id']
+        counts = dict(
+            User.objects.filter(pk__in=user_ids).values_list('pk', 'unread_notification_count')
+        )
+        return high_water, rows, counts
+
+    def _publish(self, user_id, event, data):
+        message = format_event(event, data)
+        for subscription in list(self.subscribers.get(user_id, ())):
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Slow consumer: end its stream so the browser reconnects
+                subscription.closed = True
+                self.unsubscribe(subscription)
+
+
+feed = NotificationFeed()
+
+
+async def event_stream(user_id, unread_count, keepalive=None):
+    """Async generator of SSE messages for one connection"""
+    keepalive = keepalive or getattr(settings, 'NOTIFICATION_STREAM_KEEPALIVE', 15)
+    subscription = feed.subscribe(user_id, unread_count)
+    try:
+        yield 'retry: 5000\n\n'
+        yield format_event('unread', {'count': unread_count})
+        while not subscription.closed:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield message
+    finally:
+        feed.unsubscribe(subscription)
@@ -0,0 +1,386 @@
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from accounts.models import StudentProfile, User
+from assignments import grading, search
+from assignments.views import AssignmentDetailView
+from assignments.models import Assignment, Grade, Submission
+from dashboard import exports, gradebook, notifications
+from dashboard.pagination import KeysetPaginator
+from dashboard.emails import compile_email
+
+
+class Command(BaseCommand):
+    help = 'Run micro-benchmarks for performance-sensitive code paths'
+
+    targets = ['emails', 'exports', 'gradebook', 'grading', 'pagination', 'roster', 'search', 'xlsx']
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'target',
+            choices=self.targets,
+            help='What to benchmark'
+        )
+        parser.add_argument(
+            '--size',
+            type=int,
+            default=5000,
+            help='Number of recipients/rows to benchmark with (default: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        handler = getattr(self, f"bench_{options['target']}", None)
+        if handler is None:
+            raise CommandError(f"Unknown benchmark target: {options['target']}")
+        handler(options['size'])
+
+    def report(self, label, elapsed, count):
+        self.stdout.write(
+            f'{label:<28} {elapsed * 1000:10.1f} ms total '
+            f'{elapsed / count * 1e6:10.1f} us/recipient'
+        )
+
+    def bench_emails(self, size):
+        """Per-recipient cost of a mass assignment email: full render vs render-once"""
+        assignment = Assignment(
+            title='Benchmark Assignment',
+            description='Benchmark description ' * 20,
+            instructions='Step\n' * 20,
+            due_date=timezone.now(),
+            max_score=100,
+            priority='high',
+        )
+        students = [
+            User(username=f'student{i}', first_name='Student', last_name=str(i), email=f's{i}@example.com')
+            for i in range(size)
+        ]
+
+        start = time.perf_counter()
+        for student in students:
+            html_message = render_to_string('emails/assignment_created.html', {
+                'student': student,
+                'assignment': assignment,
+            })
+            strip_tags(html_message)
+        self.report('render per recipient', time.perf_counter() - start, size)
+
+        start = time.perf_counter()
+        template = compile_email(
+            'emails/assignment_created.html', {'assignment': assignment}, recipient_var='student'
+        )
+        for student in students:
+            template.render(student)
+        self.report('render once + substitute', time.perf_counter() - start, size)
+
+    def bench_exports(self, size):
+        """Queries and peak memory of the assignments CSV export as the table grows"""
+        for count in (max(size // 10, 1), size):
+            with transaction.atomic():
+                self.seed_assignments(count)
+                tracemalloc.start()
+                start = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    rows = exports.assignment_rows(Assignment.objects.all())
+                    lines = sum(1 for _ in exports.csv_lines(exports.ASSIGNMENT_HEADERS, rows))
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                transaction.set_rollback(True)
+            self.stdout.write(
+                f'{lines - 1:>8} assignments {len(queries):4} queries '
+                f'{peak / 1024:10.1f} KiB peak {elapsed * 1000:10.1f} ms'
+            )
+
+    def seed_assignments(self, count):
+        """``count`` assignments, each with one assigned student and a graded submission"""
+        manager = User.objects.create(username='bench-manager', role='manager', first_name='Bench')
+        student = User.objects.create(username='bench-student', role='student')
+        now = timezone.now()
+        assignments = Assignment.objects.bulk_create(
+            Assignment(title=f'Assignment {i}', description='Benchmark', created_by=manager, due_date=now)
+            for i in range(count)
+        )
+        Assignment.assigned_to.through.objects.bulk_create(
+            Assignment.assigned_to.through(assignment_id=assignment.pk, user_id=student.pk)
+            for assignment in assignments
+        )
+        submissions = Submission.objects.bulk_create(
+            Submission(assignment=assignment, student=student, status='graded', submitted_at=now)
+            for assignment in assignments
+        )
+        Grade.objects.bulk_create(
+            Grade(submission=submission, score=i % 101, graded_by=manager)
+            for i, submission in enumerate(submissions)
+        )
+
+    def bench_pagination(self, size):
+        """First vs last page of the assignment list: OFFSET pages vs cursor pages"""
+        per_page = 10
+        with transaction.atomic():
+            self.seed_assignments(size)
+            manager = User.objects.get(username='bench-manager')
+            listings = {
+                'admin': Assignment.objects.all(),
+                'manager': Assignment.objects.filter(created_by=manager),
+            }
+            for role, assignments in listings.items():
+                assignments = assignments.with_submission_counts().select_related('created_by')
+
+                offset = Paginator(assignments.order_by('-created_at', '-id'), per_page)
+                last = offset.num_pages
+                keyset = KeysetPaginator(assignments, ordering=('-created_at', '-id'), per_page=per_page)
+                # Cursor of the row just before the last page
+                before_last = assignments.order_by('-created_at', '-id')[(last - 1) * per_page - 1]
+
+                for label, fetch in [
+                    ('offset first', lambda: list(offset.page(1))),
+                    ('offset last', lambda: list(offset.page(last))),
+                    ('cursor first', lambda: list(keyset.get_page())),
+                    ('cursor last', lambda: list(keyset.get_page(keyset.encode_cursor(before_last)))),
+                ]:
+                    timings = []
+                    for _ in range(5):
+                        start = time.perf_counter()
+                        fetch()
+                        timings.append(time.perf_counter() - start)
+                    self.stdout.write(
+                        f'{role:<8} {label:<14} {statistics.median(timings) * 1000:10.2f} ms median'
+                    )
+            transaction.set_rollback(True)
+
+    def bench_xlsx(self, size):
+        """Queries and peak memory of the students XLSX export as the table grows"""
+        for count in (max(size // 10, 1), size):
+            with transaction.atomic():
+                self.seed_students(count)
+                with tempfile.TemporaryFile() as output:
+                    tracemalloc.start()
+                    start = time.perf_counter()
+                    with CaptureQueriesContext(connection) as queries:
+                        rows = exports.student_rows(User.objects.filter(role='student'))
+                        exports.write_xlsx(output, 'Students', exports.STUDENT_HEADERS, rows)
+                    elapsed = time.perf_counter() - start
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                    written = output.tell()
+                transaction.set_rollback(True)
+            self.stdout.write(
+                f'{count:>8} students {len(queries):4} queries {peak / 1024:10.1f} KiB peak '
+                f'{written / 1024:10.1f} KiB file {elapsed * 1000:10.1f} ms'
+            )
+
+    def seed_students(self, count):
+        """``count`` students, each with a profile managed by one manager"""
+        manager = User.objects.create(username='bench-manager', role='manager', first_name='Bench')
+        students = User.objects.bulk_create(
+            User(username=f'bench-student{i}', role='student', email=f's{i}@example.com')
+            for i in range(count)
+        )
+        StudentProfile.objects.bulk_create(
+            StudentProfile(user=student, student_id=f'B{i:07d}', enrollment_date=timezone.localdate(), manager=manager)
+            for i, student in enumerate(students)
+        )
+
+    def bench_gradebook(self, size):
+        """
+        Gradebook of ``size`` students x ``size / 20`` assignments, every cell
+        graded: the in-memory fill for each backend, then a full build from
+        the database at a tenth of the size.
+        """
+        students, assignments = size, max(size // 20, 1)
+        student_rows = [(pk, f'student{pk}', '', '') for pk in range(1, students + 1)]
+        assignment_rows = [(pk, f'Assignment {pk}', 100) for pk in range(1, assignments + 1)]
+
+        def grades():
+            for student in range(1, students + 1):
+                for assignment in range(1, assignments + 1):
+                    yield student, assignment, (student * assignment) % 101
+
+        backends = [('python', gradebook._fill_python)]
+        if gradebook.np is not None:
+            backends.append(('numpy', gradebook._fill_numpy))
+        for label, fill in backends:
+            start = time.perf_counter()
+            fill(grades(), student_rows, assignment_rows)
+            self.stdout.write(
+                f'fill {label:<7} {students} x {assignments} {(time.perf_counter() - start) * 1000:10.1f} ms'
+            )
+
+        students, assignments = max(students // 10, 1), max(assignments // 10, 1)
+        with transaction.atomic():
+            manager = self.seed_gradebook(students, assignments)
+            start = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                book = gradebook.Gradebook.build(Assignment.objects.filter(created_by=manager))
+                sum(1 for _ in book.rows())
+            self.stdout.write(
+                f'build {book.backend:<6} {students} x {assignments} {len(queries):4} queries '
+                f'{(time.perf_counter() - start) * 1000:10.1f} ms'
+            )
+            transaction.set_rollback(True)
+
+    def seed_gradebook(self, students, assignments):
+        """A manager's ``assignments``, each submitted and graded by all ``students``"""
+        manager = User.objects.create(username='bench-manager', role='manager')
+        learners = User.objects.bulk_create(
+            User(username=f'bench-student{i}', role='student') for i in range(students)
+        )
+        now = timezone.now()
+        tasks = Assignment.objects.bulk_create(
+            Assignment(title=f'Assignment {i}', description='Benchmark', created_by=manager, due_date=now)
+            for i in range(assignments)
+        )
+        submissions = Submission.objects.bulk_create(
+            (Submission(assignment=task, student=learner, status='graded', submitted_at=now)
+             for task in tasks for learner in learners),
+            batch_size=2000,
+        )
+        Grade.objects.bulk_create(
+            (Grade(submission=submission, score=i % 101, graded_by=manager)
+             for i, submission in enumerate(submissions)),
+            batch_size=2000,
+        )
+        return manager
+
+    def bench_grading(self, size):
+        """Grade ``size`` submissions one save at a time vs with ``grade_many()``"""
+        with transaction.atomic():
+            manager = User.objects.create(username='bench-manager', role='manager')
+            students = User.objects.bulk_create(
+                User(username=f'bench-student{i}', role='student', email=f's{i}@example.com') for i in range(size)
+            )
+            batches = []
+            for title in ['One by one', 'Bulk']:
+                assignment = Assignment.objects.create(
+                    title=title, description='Benchmark', created_by=manager, due_date=timezone.now(),
+                )
+                batches.append(Submission.objects.bulk_create(
+                    Submission(assignment=assignment, student=student, status='submitted', submitted_at=timezone.now())
+                    for student in students
+                ))
+            one_by_one, bulk = batches
+
+            # What grade_submission does per submission, including the
+            # notifications it writes on commit
+            start = time.perf_counter()
+            with TestCase.captureOnCommitCallbacks(execute=True):
+                for i, submission in enumerate(one_by_one):
+                    Grade.objects.create(submission=submission, score=i % 101, graded_by=manager)
+                    submission.status = 'graded'
+                    submission.save()
+            self.report('save per submission', time.perf_counter() - start, size)
+
+            rows = [{'submission': submission.pk, 'score': i % 101, 'feedback': 'Good'} for i, submission in enumerate(bulk)]
+            with mock.patch('assignments.grading.run_after_commit') as fan_out:
+                start = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries, TestCase.captureOnCommitCallbacks(execute=True):
+                    grading.grade_many(manager, rows)
+                self.report(f'grade_many ({len(queries)} queries)', time.perf_counter() - start, size)
+
+            # The notifications grade_many leaves to the background pool
+            start = time.perf_counter()
+            with TestCase.captureOnCommitCallbacks(execute=True):
+                notifications.fan_out_grades_posted(*fan_out.call_args.args[1:])
+            self.report('  + background notify', time.perf_counter() - start, size)
+            transaction.set_rollback(True)
+
+    def bench_roster(self, size):
+        """Render the creator's assignment detail page for a class of ``size`` students"""
+        with transaction.atomic():
+            manager = User.objects.create(username='bench-manager', role='manager')
+            students = User.objects.bulk_create(
+                User(username=f'bench-student{i}', role='student', last_name=f'Student {i:06d}')
+                for i in range(size)
+            )
+            now = timezone.now()
+            assignment = Assignment.objects.create(
+                title='Essay', description='Benchmark', created_by=manager, due_date=now,
+            )
+            Assignment.assigned_to.through.objects.bulk_create(
+                Assignment.assigned_to.through(assignment_id=assignment.pk, user_id=student.pk)
+                for student in students
+            )
+            # Three in four students submitted, half of those late; every other submission is graded
+            submissions = Submission.objects.bulk_create(
+                Submission(
+                    assignment=assignment, student=student, status='submitted',
+                    submitted_at=now + timezone.timedelta(hours=1 if i % 2 else -1),
+                )
+                for i, student in enumerate(students) if i % 4
+            )
+            Grade.objects.bulk_create(
+                Grade(submission=submission, score=i % 101, graded_by=manager)
+                for i, submission in enumerate(submissions) if i % 2
+            )
+
+            request = RequestFactory().get(f'/assignments/{assignment.pk}/')
+            request.user = manager
+            tracemalloc.start()
+            start = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                response = AssignmentDetailView.as_view()(request, pk=assignment.pk)
+                response.render()
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            transaction.set_rollback(True)
+        self.stdout.write(
+            f'{size:>8} students {len(queries):6} queries {peak / 1024:10.1f} KiB peak '
+            f'{len(response.content) / 1024:8.1f} KiB page {elapsed * 1000:10.1f} ms'
+        )
+
+    def bench_search(self, size):
+        """Latency of ranked, prefix-matched searches over ``size`` indexed documents"""
+        if not search.available():
+            raise CommandError('The FTS5 search index is not available on this database')
+        rng = random.Random(0)
+        vocabulary = [f'{rng.choice("bcdfghklmnprst")}{rng.choice("aeiou")}{i:x}word' for i in range(20000)]
+        with transaction.atomic():
+            manager = User.objects.create(username='bench-manager', role='manager')
+            student = User.objects.create(username='bench-student', role='student')
+            assignment = Assignment.objects.create(
+                title='Benchmark', description='Benchmark', created_by=manager, due_date=timezone.now(),
+            )
+            assignment.assigned_to.add(student)
+            start = time.perf_counter()
+            with connection.cursor() as cursor:
+                batch = 10000
+                for offset in range(0, size, batch):
+                    cursor.executemany(
+                        f'INSERT INTO {search.TABLE} (rowid, kind, object_id, assignment_id, student_id, title, body) '
+                        'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                        [
+                            ((i + 1000) * 4 + 2, 'submission', i + 1000, assignment.pk if i % 100 == 0 else 0,
+                             student.pk if i % 1000 == 0 else 0, '',
+                             ' '.join(rng.choices(vocabulary, k=30)))
+                            for i in range(offset, min(offset + batch, size))
+                        ],
+                    )
+            self.stdout.write(f'indexed {size} documents in {time.perf_counter() - start:.1f} s')
+
+            admin = User(pk=0, role='admin')
+            for label, user in [('admin', admin), ('manager', manager), ('student', student)]:
+                for query in [vocabulary[1][:3], vocabulary[2], f'{vocabulary[3]} {vocabulary[4][:4]}']:
+                    timings = []
+                    for _ in range(20):
+                        started = time.perf_counter()
+                        search.search(user, query)
+                        timings.append(time.perf_counter() - started)
+                    self.stdout.write(
+                        f'{label:<8} {query!r:<24} median {statistics.median(timings) * 1000:7.2f} ms '
+                        f'max {max(timings) * 1000:7.2f} ms'
+                    )
+            transaction.set_rollback(True)
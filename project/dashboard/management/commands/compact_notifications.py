@@ -0,0 +1,120 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+
+from dashboard.models import ArchivedNotification, Notification
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete or archive old read notifications and collapse runs of similar '
+        'unread notifications into a single digest row'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 180),
+            help='Keep read notifications for this many days (default: NOTIFICATION_RETENTION_DAYS)'
+        )
+        parser.add_argument(
+            '--archive',
+            action='store_true',
+            help='Move expired notifications to the archive table instead of deleting them'
+        )
+        parser.add_argument(
+            '--digest-threshold',
+            type=int,
+            default=getattr(settings, 'NOTIFICATION_DIGEST_THRESHOLD', 5),
+            help='Collapse this many or more identical unread notifications (0 disables)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Rows per transaction (default: 1000)'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help='Seconds to sleep between chunks so writers can take the lock'
+        )
+
+    def handle(self, *args, **options):
+        self.chunk_size = options['chunk_size']
+        self.pause = options['pause']
+
+        expired = self.expire(options['days'], options['archive'])
+        verb = 'Archived' if options['archive'] else 'Deleted'
+        self.stdout.write(f"{verb} {expired} read notifications older than {options['days']} days")
+
+        if options['digest_threshold'] > 1:
+            groups, collapsed = self.digest(options['digest_threshold'])
+            self.stdout.write(f'Collapsed {collapsed} unread notifications into {groups} digests')
+
+        self.stdout.write(self.style.SUCCESS('Notification compaction complete'))
+
+    def sleep(self):
+        if self.pause:
+            time.sleep(self.pause)
+
+    def expire(self, days, archive):
+        """Remove read notifications older than ``days`` in short transactions"""
+        cutoff = timezone.now() - timedelta(days=days)
+        expired = Notification.objects.read().filter(created_at__lt=cutoff).order_by('id')
+        total = 0
+
+        while True:
+            with transaction.atomic():
+                ids = list(expired.values_list('id', flat=True)[:self.chunk_size])
+                if not ids:
+                    break
+                if archive:
+                    ArchivedNotification.objects.bulk_create([
+                        ArchivedNotification(**row)
+                        for row in Notification.objects.filter(id__in=ids).values(
+                            'recipient_id', 'title', 'message', 'notification_type',
+                            'digest_count', 'created_at',
+                        )
+                    ])
+                Notification.objects.filter(id__in=ids).delete()
+            total += len(ids)
+            self.sleep()
+
+        return total
+
+    def digest(self, threshold):
+        """Keep the newest of each run of identical unread notifications"""
+        groups = (
+            Notification.objects.unread().order_by()
+            .values('recipient_id', 'notification_type', 'title')
+            .annotate(rows=Count('id'), latest=Max('id'))
+            .filter(rows__gte=threshold)
+        )
+        digested = collapsed = 0
+
+        for group in list(groups):
+            with transaction.atomic():
+                older = Notification.objects.unread().filter(
+                    recipient_id=group['recipient_id'],
+                    notification_type=group['notification_type'],
+                    title=group['title'],
+                    id__lt=group['latest'],
+                )
+                absorbed = older.aggregate(total=Sum('digest_count'))['total'] or 0
+                deleted, _ = older.delete()
+                Notification.objects.filter(pk=group['latest']).update(
+                    digest_count=F('digest_count') + absorbed
+                )
+            digested += 1
+            collapsed += deleted
+            self.sleep()
+
+        return digested, collapsed
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from dashboard import stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed dashboard statistics from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report rows that have drifted from the data'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per INSERT (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            drifted = stats.drifted()
+            for user_id, stored, actual in drifted:
+                changed = ', '.join(
+                    f'{name} {stored[name]} -> {actual[name]}'
+                    for name in actual if stored[name] != actual[name]
+                )
+                self.stdout.write(f"{'site' if user_id is None else f'user {user_id}'}: {changed}")
+            self.stdout.write(f'{len(drifted)} dashboard stats rows have drifted')
+            return
+
+        rows = stats.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} dashboard stats rows'))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from assignments.models import Assignment
+from dashboard import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily submission/grade rollups from the raw tables, a chunk of assignments at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--assignment',
+            type=int,
+            action='append',
+            dest='assignments',
+            help='Only rebuild this assignment (repeatable)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='Assignments per transaction (default: 200)'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help='Seconds to sleep between chunks so writers can take the lock'
+        )
+
+    def handle(self, *args, **options):
+        assignment_ids = options['assignments']
+        if not assignment_ids:
+            assignment_ids = list(Assignment.objects.order_by('pk').values_list('pk', flat=True))
+
+        chunk_size = options['chunk_size']
+        written = 0
+        for start in range(0, len(assignment_ids), chunk_size):
+            written += rollups.rebuild(assignment_ids[start:start + chunk_size])
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {written} rollup rows for {len(assignment_ids)} assignments'
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from accounts.models import User
+from dashboard.models import Notification
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized unread-notification counter for every user'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report users whose counter has drifted'
+        )
+
+    def handle(self, *args, **options):
+        unread = (
+            Notification.objects.filter(recipient=OuterRef('pk'), is_read=False)
+            .order_by().values('recipient').annotate(n=Count('id')).values('n')
+        )
+        drifted = User.objects.annotate(
+            actual=Coalesce(Subquery(unread), 0)
+        ).exclude(unread_notification_count=F('actual'))
+
+        if options['dry_run']:
+            for user in drifted.only('username', 'unread_notification_count'):
+                self.stdout.write(f'{user.username}: {user.unread_notification_count} -> {user.actual}')
+            self.stdout.write(f'{drifted.count()} users have drifted counters')
+            return
+
+        fixed = User.objects.filter(pk__in=drifted.values('pk')).update(
+            unread_notification_count=Coalesce(Subquery(unread), 0)
+        )
+        self.stdout.write(self.style.SUCCESS(f'Repaired unread counters for {fixed} users'))
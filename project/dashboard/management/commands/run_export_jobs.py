@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard import export_jobs
+from dashboard.outbox import default_worker_id
+
+
+class Command(BaseCommand):
+    help = 'Generate queued data exports and purge expired export files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds to sleep when the queue is empty (default: 5)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the currently queued jobs and exit instead of polling forever'
+        )
+
+    def handle(self, *args, **options):
+        worker_id = default_worker_id()
+        done = failed = 0
+        self.stdout.write(f'Export worker {worker_id} started')
+
+        try:
+            while True:
+                released = export_jobs.release_stale_claims()
+                if released:
+                    self.stdout.write(f'Requeued {released} stale jobs')
+                purged = export_jobs.purge_expired()
+                if purged:
+                    self.stdout.write(f'Purged {purged} expired jobs')
+
+                job = export_jobs.run(worker_id=worker_id)
+                if job is not None:
+                    if job.status == 'done':
+                        done += 1
+                    else:
+                        failed += 1
+                    self.stdout.write(f'{job}: {job.rows_total} rows')
+                    continue
+
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping export worker')
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {done} exported, {failed} failed'))
@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard import outbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued emails from the email outbox (retries failures with backoff)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of emails to claim per batch (default: 100)'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds to sleep when the queue is empty (default: 5)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the currently due emails and exit instead of polling forever'
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Print queue depth and throughput and exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.print_stats()
+            return
+
+        worker_id = outbox.default_worker_id()
+        total_sent = total_failed = 0
+        started = time.monotonic()
+        self.stdout.write(f'Outbox worker {worker_id} started')
+
+        try:
+            while True:
+                sent, failed = outbox.process_batch(options['batch_size'], worker_id)
+                total_sent += sent
+                total_failed += failed
+
+                if sent or failed:
+                    elapsed = max(time.monotonic() - started, 1e-6)
+                    self.stdout.write(
+                        f'Sent {sent}, failed {failed} '
+                        f'(total {total_sent} sent, {total_sent / elapsed:.1f} msg/s)'
+                    )
+                    continue
+
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping outbox worker')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Done: {total_sent} sent, {total_failed} failed')
+        )
+
+    def print_stats(self):
+        stats = outbox.outbox_stats()
+        self.stdout.write(f"Queue depth: {stats['queue_depth']} ({stats['due']} due)")
+        for status, count in stats['by_status'].items():
+            self.stdout.write(f'  {status}: {count}')
+        self.stdout.write(f"Oldest pending: {stats['oldest_pending_age']:.0f}s")
+        self.stdout.write(
+            f"Throughput: {stats['sent_in_window']} sent in the last 5 minutes "
+            f"({stats['throughput_per_second']:.2f} msg/s)"
+        )
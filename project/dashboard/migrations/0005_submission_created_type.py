@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_notification_compaction'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivednotification',
+            name='notification_type',
+            field=models.CharField(choices=[('assignment_created', 'Assignment Created'), ('assignment_due', 'Assignment Due Soon'), ('submission_created', 'New Submission'), ('submission_graded', 'Submission Graded'), ('comment_added', 'Comment Added'), ('general', 'General')], default='general', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('assignment_created', 'Assignment Created'), ('assignment_due', 'Assignment Due Soon'), ('submission_created', 'New Submission'), ('submission_graded', 'Submission Graded'), ('comment_added', 'Comment Added'), ('general', 'General')], default='general', max_length=20),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:34
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_submission_created_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('users', models.IntegerField(default=0)),
+                ('managers', models.IntegerField(default=0)),
+                ('submissions', models.IntegerField(default=0)),
+                ('students', models.IntegerField(default=0)),
+                ('assignments', models.IntegerField(default=0)),
+                ('active_assignments', models.IntegerField(default=0)),
+                ('pending_submissions', models.IntegerField(default=0)),
+                ('assigned_assignments', models.IntegerField(default=0)),
+                ('pending_assignments', models.IntegerField(default=0)),
+                ('completed_submissions', models.IntegerField(default=0)),
+                ('grade_total', models.IntegerField(default=0)),
+                ('grade_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Dashboard stats',
+                'constraints': [models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('user', models.Value(0)), name='dashboard_stats_unique_scope')],
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    Submission = apps.get_model('assignments', 'Submission')
+    Grade = apps.get_model('assignments', 'Grade')
+    DailySubmissionRollup = apps.get_model('dashboard', 'DailySubmissionRollup')
+    rows = {}
+
+    def row(day, assignment_id, manager_id):
+        key = (day, assignment_id)
+        if key not in rows:
+            rows[key] = DailySubmissionRollup(date=day, assignment_id=assignment_id, manager_id=manager_id)
+        return rows[key]
+
+    for r in (
+        Submission.objects.filter(submitted_at__isnull=False)
+        .annotate(day=TruncDate('submitted_at')).order_by()
+        .values('day', 'assignment_id', 'assignment__created_by_id')
+        .annotate(n=Count('id'), late=Count('id', filter=Q(submitted_at__gt=F('assignment__due_date'))))
+    ):
+        rollup = row(r['day'], r['assignment_id'], r['assignment__created_by_id'])
+        rollup.submitted, rollup.late = r['n'], r['late']
+
+    for r in (
+        Grade.objects.annotate(day=TruncDate('graded_at')).order_by()
+        .values('day', 'submission__assignment_id', 'submission__assignment__created_by_id')
+        .annotate(n=Count('id'), score_sum=Sum('score'))
+    ):
+        rollup = row(r['day'], r['submission__assignment_id'], r['submission__assignment__created_by_id'])
+        rollup.graded, rollup.score_sum = r['n'], r['score_sum']
+
+    DailySubmissionRollup.objects.bulk_create(rows.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0002_submission_time_indexes'),
+        ('dashboard', '0006_dashboard_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySubmissionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('submitted', models.IntegerField(default=0)),
+                ('late', models.IntegerField(default=0)),
+                ('graded', models.IntegerField(default=0)),
+                ('score_sum', models.BigIntegerField(default=0)),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='assignments.assignment')),
+                ('manager', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['manager', 'date'], name='daily_rollup_manager_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'assignment'), name='daily_rollup_unique_day')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_export_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='kind',
+            field=models.CharField(choices=[('students', 'Students (XLSX)'), ('assignments', 'Assignments (CSV)'), ('gradebook', 'Gradebook (CSV)')], max_length=20),
+        ),
+    ]
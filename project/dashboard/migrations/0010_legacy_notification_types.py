@@ -0,0 +1,27 @@
+from django.db import migrations
+
+# Types the views wrote before notifications went through the dispatcher,
+# mapped to the choices the dispatcher uses for the same events
+LEGACY_TYPES = {
+    'assignment': 'submission_created',
+    'grade': 'submission_graded',
+    'comment': 'comment_added',
+}
+
+
+def normalize_notification_types(apps, schema_editor):
+    for model_name in ['Notification', 'ArchivedNotification']:
+        model = apps.get_model('dashboard', model_name)
+        for legacy, current in LEGACY_TYPES.items():
+            model.objects.filter(notification_type=legacy).update(notification_type=current)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_export_job_gradebook'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_notification_types, migrations.RunPython.noop),
+    ]
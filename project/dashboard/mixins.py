@@ -0,0 +1,28 @@
+"""
+Class-based view helpers.
+
+``CachedObjectMixin`` fetches a single-object view's object once per request.
+Django builds a new view instance for every request, so the object is kept
+on the instance: ``dispatch`` checks, ``get``/``post`` and
+``get_context_data`` all share one lookup, which loads the relations named in
+``select_related`` and ``prefetch_related`` with it.
+"""
+
+
+class CachedObjectMixin:
+    """Memoize ``get_object()`` and load the view's relations with it"""
+
+    select_related = ()
+    prefetch_related = ()
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_object'):
+            queryset = self.get_queryset()
+            if self.select_related:
+                queryset = queryset.select_related(*self.select_related)
+            if self.prefetch_related:
+                queryset = queryset.prefetch_related(*self.prefetch_related)
+            self._object = super().get_object(queryset)
+        return self._object
@@ -1,15 +1,65 @@
-from django.db import models
+from collections import Counter
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import models, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
 
-class NotificationManager(models.Manager):
+def adjust_unread_counts(deltas):
+    """Apply ``{recipient_id: delta}`` to the denormalized unread counters"""
+    by_delta = {}
+    for recipient_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(recipient_id)
+    
+    for delta, recipient_ids in by_delta.items():
+        User.objects.filter(pk__in=recipient_ids).update(
+            unread_notification_count=Greatest(F('unread_notification_count') + delta, 0)
+        )
+
+
+class NotificationQuerySet(models.QuerySet):
     def unread(self):
         return self.filter(is_read=False)
     
     def read(self):
         return self.filter(is_read=True)
+    
+    def mark_read(self):
+        """Mark the unread rows in this queryset read and keep counters in step"""
+        total = 0
+        recipient_ids = self.unread().order_by().values_list('recipient_id', flat=True).distinct()
+        with transaction.atomic():
+            for recipient_id in list(recipient_ids):
+                # The UPDATE's row count is exactly how many this call flipped
+                updated = self.unread().filter(recipient_id=recipient_id).update(is_read=True)
+                adjust_unread_counts({recipient_id: -updated})
+                total += updated
+        return total
+    
+    def delete(self):
+        with transaction.atomic():
+            unread = Counter(dict(
+                self.unread().order_by().values('recipient_id')
+                .annotate(n=Count('id')).values_list('recipient_id', 'n')
+            ))
+            result = super().delete()
+            adjust_unread_counts({recipient_id: -n for recipient_id, n in unread.items()})
+        return result
+
+
+class NotificationManager(models.Manager.from_queryset(NotificationQuerySet)):
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            adjust_unread_counts(Counter(obj.recipient_id for obj in objs if not obj.is_read))
+        return objs
 
 
 class Notification(models.Model):
@@ -18,6 +68,7 @@ class Notification(models.Model):
     TYPE_CHOICES = [
         ('assignment_created', 'Assignment Created'),
         ('assignment_due', 'Assignment Due Soon'),
+        ('submission_created', 'New Submission'),
         ('submission_graded', 'Submission Graded'),
         ('comment_added', 'Comment Added'),
         ('general', 'General'),
@@ -28,6 +79,8 @@ class Notification(models.Model):
     message = models.TextField()
     notification_type = models.CharField(max_length=20, choices=TYPE_CHOICES, default='general')
     is_read = models.BooleanField(default=False)
+    # Number of similar notifications collapsed into this one by compact_notifications
+    digest_count = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
     
     objects = NotificationManager()
@@ -35,8 +88,248 @@ class Notification(models.Model):
     def __str__(self):
         return f"{self.title} - {self.recipient.username}"
     
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        tracked = update_fields is None or bool({'is_read', 'recipient', 'recipient_id'} & set(update_fields))
+        with transaction.atomic():
+            if adding:
+                super().save(*args, **kwargs)
+                if not self.is_read:
+                    adjust_unread_counts({self.recipient_id: 1})
+                return
+            if not tracked:
+                super().save(*args, **kwargs)
+                return
+            # An update (e.g. from the admin) may flip is_read or move the
+            # row to another recipient; compare the stored row before and after
+            stored = Notification.objects.filter(pk=self.pk).values_list('recipient_id', 'is_read')
+            before = stored.first()
+            super().save(*args, **kwargs)
+            after = stored.first()
+            deltas = Counter()
+            for row, sign in ((before, -1), (after, 1)):
+                if row is not None and not row[1]:
+                    deltas[row[0]] += sign
+            adjust_unread_counts(deltas)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            if not self.is_read:
+                adjust_unread_counts({self.recipient_id: -1})
+        return result
+    
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Keyset pagination of a user's inbox
+            models.Index(fields=['recipient', '-created_at', '-id'], name='notification_inbox_idx'),
+        ]
+
+
+class ArchivedNotification(models.Model):
+    """Read notifications moved out of the live table by compact_notifications"""
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=20, choices=Notification.TYPE_CHOICES, default='general')
+    digest_count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.title} - {self.recipient.username}"
+    
+    class Meta:
+        ordering = ['-created_at']
+
+
+class EmailOutboxQuerySet(models.QuerySet):
+    def pending(self):
+        return self.filter(status='pending')
+    
+    def due(self, now=None):
+        return self.pending().filter(next_attempt_at__lte=now or timezone.now())
+
+
+class EmailOutbox(models.Model):
+    """Durable queue of outgoing emails, drained by ``manage.py run_outbox``"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=254, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=64, blank=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    
+    objects = EmailOutboxQuerySet.as_manager()
+    
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email} ({self.status})"
+    
+    class Meta:
+        ordering = ['created_at']
+        verbose_name_plural = "Email outbox"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+
+class DashboardStats(models.Model):
+    """
+    Precomputed dashboard counters, kept current by ``dashboard.stats``.
+
+    The row without a user holds the site-wide numbers; each user's row holds
+    the counters for the assignments they own (managers, admins) and for their
+    own work (students).
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, null=True, blank=True, related_name='dashboard_stats'
+    )
+    # Site-wide
+    users = models.IntegerField(default=0)
+    managers = models.IntegerField(default=0)
+    submissions = models.IntegerField(default=0)
+    # Site-wide, or per owner of the assignments
+    students = models.IntegerField(default=0)
+    assignments = models.IntegerField(default=0)
+    active_assignments = models.IntegerField(default=0)
+    pending_submissions = models.IntegerField(default=0)
+    # Per student
+    assigned_assignments = models.IntegerField(default=0)
+    pending_assignments = models.IntegerField(default=0)
+    completed_submissions = models.IntegerField(default=0)
+    grade_total = models.IntegerField(default=0)
+    grade_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Dashboard stats for {self.user.username if self.user_id else 'everyone'}"
+    
+    @property
+    def average_grade(self):
+        return self.grade_total / self.grade_count if self.grade_count else 0
+    
+    class Meta:
+        verbose_name_plural = "Dashboard stats"
+        constraints = [
+            # At most one site-wide row
+            models.UniqueConstraint(
+                Coalesce('user', models.Value(0)), name='dashboard_stats_unique_scope'
+            ),
+        ]
+
+
+class DailySubmissionRollup(models.Model):
+    """
+    Per-day, per-assignment submission and grade totals, kept current by
+    ``dashboard.rollups`` so charts sum a few rows instead of raw submissions.
+
+    Submissions count on the day they were submitted, grades on the day they
+    were given.
+    """
+    date = models.DateField()
+    assignment = models.ForeignKey(
+        'assignments.Assignment', on_delete=models.CASCADE, related_name='daily_rollups'
+    )
+    manager = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    submitted = models.IntegerField(default=0)
+    late = models.IntegerField(default=0)
+    graded = models.IntegerField(default=0)
+    score_sum = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.assignment_id} on {self.date}"
+    
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'assignment'], name='daily_rollup_unique_day'),
+        ]
+        indexes = [
+            models.Index(fields=['manager', 'date'], name='daily_rollup_manager_idx'),
+        ]
+
+
+def export_storage():
+    """Export files live outside MEDIA_ROOT and are only served by the download view"""
+    return FileSystemStorage(location=settings.EXPORT_ROOT)
+
+
+class ExportJob(models.Model):
+    """
+    A data export generated in the background by ``dashboard.export_jobs``.
+
+    ``scope`` names whose data the export covers and ``fingerprint`` also
+    includes the data's generations, so a finished job is reused until the
+    data changes and identical requests share one pending job.
+    """
+    
+    KIND_CHOICES = [
+        ('students', 'Students (XLSX)'),
+        ('assignments', 'Assignments (CSV)'),
+        ('gradebook', 'Gradebook (CSV)'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    scope = models.CharField(max_length=40)
+    fingerprint = models.CharField(max_length=40)
+    requested_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='export_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    rows_total = models.PositiveIntegerField(default=0)
+    rows_done = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports/', storage=export_storage, blank=True)
+    claimed_by = models.CharField(max_length=64, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} export for {self.scope} ({self.status})"
+    
+    @property
+    def progress(self):
+        if self.status == 'done':
+            return 100
+        return int(self.rows_done * 100 / self.rows_total) if self.rows_total else 0
+    
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            # One job in flight per export and data version
+            models.UniqueConstraint(
+                fields=['fingerprint'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='export_job_unique_in_flight',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['fingerprint', 'status'], name='export_job_lookup_idx'),
+            models.Index(fields=['status', 'created_at'], name='export_job_queue_idx'),
+        ]
 
 
 class SystemSettings(models.Model):
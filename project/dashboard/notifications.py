@@ -0,0 +1,229 @@
+"""
+Notification dispatcher.
+
+Everything that notifies a user goes through ``notify()``. Calls are
+collected per transaction, deduplicated on ``(event, recipient)`` and written
+after commit with one ``bulk_create`` for the in-app notifications and one
+for the outbox emails, each email template being rendered once per event.
+
+Large fan-outs (assigning a whole class, grading a batch of submissions) are
+handed to the background pool and go through the same dispatcher chunk by
+chunk.
+"""
+import logging
+import threading
+import weakref
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from . import outbox
+from .emails import compile_email
+from .models import Notification
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class PendingNotification:
+    """One recipient's notification (and optional email) for one event"""
+
+    def __init__(self, event, recipient, title, message, notification_type, email):
+        self.event = event
+        self.recipient = recipient
+        self.title = title
+        self.message = message
+        self.notification_type = notification_type
+        self.email = email
+
+
+class NotificationBatch:
+    """Notifications collected during one transaction, flushed on commit"""
+
+    def __init__(self):
+        self.pending = {}
+        self.hook = None
+        self.using = None
+
+    def add(self, notification):
+        # First call for an (event, recipient) pair wins
+        self.pending.setdefault((notification.event, notification.recipient.pk), notification)
+
+    def flush(self):
+        pending, self.pending = list(self.pending.values()), {}
+        if _current_batch() is self:
+            _local.batch = None
+        deliver(pending)
+
+
+def _current_batch():
+    return getattr(_local, 'batch', None)
+
+
+class _FlushHook:
+    """A batch's on_commit callback; only the transaction's commit hooks hold it"""
+
+    def __init__(self, batch):
+        self.batch = batch
+
+    def __call__(self):
+        self.batch.flush()
+
+
+def _register(batch, using):
+    hook = _FlushHook(batch)
+    # The batch sees its hook through a weak reference only: when the
+    # transaction (or the savepoint the hook was registered in) rolls back,
+    # Django discards the hook, the reference dies and the batch is known
+    # to be abandoned without looking at Django's commit hook list
+    batch.hook, batch.using = weakref.ref(hook), using
+    transaction.on_commit(hook, using=using)
+
+
+def _batch_is_pending(batch, using):
+    # A rolled-back batch must not leak into the next transaction
+    return batch.using == using and batch.hook is not None and batch.hook() is not None
+
+
+def notify(event, recipients, title, message, notification_type='general',
+           email_template=None, email_context=None, recipient_var='recipient', using=None):
+    """
+    Notify ``recipients`` (users) about ``event``.
+
+    ``event`` is any hashable identifying the business event, e.g.
+    ``('grade_posted', grade.pk)``; a recipient is notified at most once per
+    event per transaction however many code paths report it. When
+    ``email_template`` is given each recipient with an address also gets an
+    email rendered from it, with the recipient bound to ``recipient_var``.
+    """
+    email = (email_template, email_context or {}, recipient_var) if email_template else None
+    connection = transaction.get_connection(using)
+
+    batch = _current_batch()
+    if batch is None or not connection.in_atomic_block or not _batch_is_pending(batch, using):
+        batch = NotificationBatch()
+        if connection.in_atomic_block:
+            _local.batch = batch
+            _register(batch, using)
+
+    for recipient in recipients:
+        if recipient is None:
+            continue
+        batch.add(PendingNotification(event, recipient, title, message, notification_type, email))
+
+    if not connection.in_atomic_block:
+        # Autocommit: nothing to wait for
+        batch.flush()
+
+
+def deliver(pending):
+    """Write notifications and queue their emails in one short transaction"""
+    if not pending:
+        return
+
+    compiled = {}
+    emails = []
+    for notification in pending:
+        if notification.email is None or not notification.recipient.email:
+            continue
+        template_name, context, recipient_var = notification.email
+        key = (notification.event, template_name, recipient_var)
+        try:
+            if key not in compiled:
+                # Rendered once per event; each recipient is a cheap substitution
+                compiled[key] = compile_email(template_name, context, recipient_var)
+            plain_message, html_message = compiled[key].render(notification.recipient)
+        except Exception:
+            logger.exception("Failed to render email to %s", notification.recipient.email)
+            continue
+        emails.append(outbox.build_email(
+            to_email=notification.recipient.email,
+            subject=notification.title,
+            body=plain_message,
+            html_body=html_message,
+        ))
+
+    with transaction.atomic():
+        Notification.objects.bulk_create([
+            Notification(
+                recipient=notification.recipient,
+                title=notification.title,
+                message=notification.message,
+                notification_type=notification.notification_type,
+            )
+            for notification in pending
+        ])
+        if emails:
+            outbox.enqueue_many(emails)
+
+
+def chunked(items, size):
+    """Yield successive ``size``-long slices of ``items``"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def fan_out_assignment_created(assignment_id, student_ids):
+    """Notify ``student_ids`` that ``assignment_id`` was assigned to them (background)"""
+    from assignments.models import Assignment
+
+    assignment = Assignment.objects.filter(pk=assignment_id).first()
+    if assignment is None:
+        return
+
+    chunk_size = getattr(settings, 'NOTIFICATION_FANOUT_CHUNK_SIZE', 500)
+    for chunk in chunked(sorted(student_ids), chunk_size):
+        students = (
+            User.objects.filter(pk__in=chunk, role='student')
+            .only('id', 'username', 'first_name', 'last_name', 'email')
+        )
+        # One short write transaction per chunk keeps the SQLite lock brief
+        with transaction.atomic():
+            notify_assignment_created(assignment, students)
+
+
+def notify_assignment_created(assignment, students):
+    notify(
+        ('assignment_created', assignment.pk),
+        students,
+        title=f'New Assignment: {assignment.title}',
+        message=f'A new assignment "{assignment.title}" has been created. Due date: {assignment.due_date.strftime("%B %d, %Y at %I:%M %p")}',
+        notification_type='assignment_created',
+        email_template='emails/assignment_created.html',
+        email_context={'assignment': assignment},
+        recipient_var='student',
+    )
+
+
+def fan_out_grades_posted(grade_ids):
+    """Tell the students behind ``grade_ids`` that they were graded (background)"""
+    from assignments.models import Grade
+
+    chunk_size = getattr(settings, 'NOTIFICATION_FANOUT_CHUNK_SIZE', 500)
+    for chunk in chunked(sorted(grade_ids), chunk_size):
+        grades = Grade.objects.filter(pk__in=chunk).select_related('submission__assignment', 'submission__student')
+        with transaction.atomic():
+            for grade in grades:
+                notify_grade_posted(grade)
+
+
+def notify_grade_posted(grade):
+    submission = grade.submission
+    assignment = submission.assignment
+    notify(
+        ('grade_posted', grade.pk),
+        [submission.student],
+        title=f'Grade Posted: {assignment.title}',
+        message=f'Your submission for "{assignment.title}" has been graded. Score: {grade.score}/{assignment.max_score} ({grade.letter_grade})',
+        notification_type='submission_graded',
+        email_template='emails/grade_posted.html',
+        email_context={
+            'grade': grade,
+            'submission': submission,
+            'assignment': assignment,
+        },
+        recipient_var='student',
+    )
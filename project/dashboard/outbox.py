@@ -0,0 +1,191 @@
+"""
+Transactional email outbox.
+
+Callers enqueue ``EmailOutbox`` rows in the same transaction as the change
+that triggered the email; ``manage.py run_outbox`` claims due rows in
+batches, sends them over one reused connection and reschedules failures with
+exponential backoff.
+"""
+import logging
+import os
+import socket
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def build_email(to_email, subject, body, html_body='', from_email=None):
+    """Return an unsaved outbox row (for ``bulk_create``)"""
+    return EmailOutbox(
+        to_email=to_email,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        subject=subject[:255],
+        body=body,
+        html_body=html_body,
+    )
+
+
+def enqueue(to_email, subject, body, html_body='', from_email=None):
+    """Queue a single email for delivery by the outbox worker"""
+    if not to_email:
+        return None
+    email = build_email(to_email, subject, body, html_body, from_email)
+    email.save()
+    return email
+
+
+def enqueue_many(emails, batch_size=500):
+    """Queue many unsaved outbox rows with chunked inserts"""
+    emails = [email for email in emails if email.to_email]
+    return EmailOutbox.objects.bulk_create(emails, batch_size=batch_size)
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"[:40]
+
+
+def backoff_delay(attempts):
+    """Delay before retry number ``attempts`` (1-based), doubling up to the cap"""
+    base = getattr(settings, 'EMAIL_OUTBOX_BACKOFF_BASE', 30)
+    cap = getattr(settings, 'EMAIL_OUTBOX_BACKOFF_MAX', 3600)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), cap))
+
+
+def release_stale_claims(now=None):
+    """Return rows claimed by a worker that died mid-batch to the queue"""
+    now = now or timezone.now()
+    lease = getattr(settings, 'EMAIL_OUTBOX_LEASE_SECONDS', 300)
+    return EmailOutbox.objects.filter(
+        status='sending',
+        claimed_at__lt=now - timedelta(seconds=lease),
+    ).update(status='pending', claimed_by='', claimed_at=None)
+
+
+def claim_batch(batch_size=100, worker_id=None, now=None):
+    """
+    Atomically claim up to ``batch_size`` due rows for this worker.
+
+    The claim is a conditional UPDATE on ``status='pending'`` so two workers
+    racing for the same ids can never both win a row.
+    """
+    now = now or timezone.now()
+    token = f"{worker_id or default_worker_id()}:{uuid.uuid4().hex[:16]}"
+    with transaction.atomic():
+        ids = list(
+            EmailOutbox.objects.due(now)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        EmailOutbox.objects.filter(id__in=ids, status='pending').update(
+            status='sending', claimed_by=token, claimed_at=now
+        )
+    return list(EmailOutbox.objects.filter(claimed_by=token, status='sending').order_by('id'))
+
+
+def _as_message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=[email.to_email],
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def deliver_batch(emails, connection=None):
+    """
+    Send claimed rows over one connection and record the outcome of each.
+
+    Returns ``(sent, failed)`` counts. Rows that fail are rescheduled with
+    exponential backoff until ``EMAIL_OUTBOX_MAX_ATTEMPTS`` is reached.
+    """
+    if not emails:
+        return 0, 0
+    connection = connection or get_connection()
+    max_attempts = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 6)
+    sent_ids = []
+    failures = []
+
+    try:
+        connection.open()
+    except Exception as e:
+        failures = [(email, e) for email in emails]
+        emails = []
+
+    try:
+        for email in emails:
+            try:
+                if connection.send_messages([_as_message(email, connection)]):
+                    sent_ids.append(email.pk)
+                else:
+                    failures.append((email, 'backend reported no message sent'))
+            except Exception as e:
+                failures.append((email, e))
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    now = timezone.now()
+    if sent_ids:
+        EmailOutbox.objects.filter(id__in=sent_ids).update(
+            status='sent', sent_at=now, attempts=F('attempts') + 1, last_error=''
+        )
+    for email, error in failures:
+        attempts = email.attempts + 1
+        if attempts >= max_attempts:
+            status, next_attempt_at = 'failed', now
+        else:
+            status, next_attempt_at = 'pending', now + backoff_delay(attempts)
+        EmailOutbox.objects.filter(pk=email.pk).update(
+            status=status,
+            attempts=attempts,
+            next_attempt_at=next_attempt_at,
+            claimed_by='',
+            claimed_at=None,
+            last_error=str(error)[:1000],
+        )
+        logger.warning('Email %s to %s failed (attempt %d): %s', email.pk, email.to_email, attempts, error)
+
+    return len(sent_ids), len(failures)
+
+
+def process_batch(batch_size=100, worker_id=None, connection=None):
+    """Claim and deliver one batch; returns ``(sent, failed)``"""
+    release_stale_claims()
+    return deliver_batch(claim_batch(batch_size, worker_id), connection)
+
+
+def outbox_stats(window_seconds=300):
+    """Queue depth and recent send throughput (messages/second over ``window_seconds``)"""
+    now = timezone.now()
+    counts = dict.fromkeys(dict(EmailOutbox.STATUS_CHOICES), 0)
+    for row in EmailOutbox.objects.order_by().values('status').annotate(n=Count('id')):
+        counts[row['status']] = row['n']
+    recent = EmailOutbox.objects.filter(
+        status='sent', sent_at__gte=now - timedelta(seconds=window_seconds)
+    ).count()
+    oldest = EmailOutbox.objects.pending().aggregate(oldest=Min('created_at'))['oldest']
+    return {
+        'queue_depth': counts['pending'] + counts['sending'],
+        'due': EmailOutbox.objects.due(now).count(),
+        'by_status': counts,
+        'oldest_pending_age': (now - oldest).total_seconds() if oldest else 0,
+        'sent_in_window': recent,
+        'throughput_per_second': recent / window_seconds if window_seconds else 0,
+    }
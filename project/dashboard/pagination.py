@@ -0,0 +1,147 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of ``OFFSET`` the next page is selected with a row-value comparison
+on the ordering columns, e.g. ``(created_at, id) < (last_created_at, last_id)``,
+which an index on those columns answers directly no matter how deep the page.
+Nullable ordering columns sort their NULLs last in either direction.
+
+There is no page count; ``KeysetPaginator.count`` gives the total on demand,
+read from the cache when the caller supplies a ``count_key`` that changes
+with the data (typically built from generation stamps).
+"""
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """One page of results plus the cursor for the page after it"""
+
+    def __init__(self, object_list, next_cursor, cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def is_first(self):
+        return self.cursor is None
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by ``ordering`` (field names, ``-`` for descending).
+
+    The last field must be unique (normally ``id``) so every row has a
+    distinct position. ``count_key`` caches ``count`` for
+    ``KEYSET_COUNT_TIMEOUT`` seconds.
+    """
+
+    def __init__(self, queryset, ordering=('-created_at', '-id'), per_page=20, count_key=None):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.count_key = count_key
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = [name.startswith('-') for name in self.ordering]
+        self.nullable = [queryset.model._meta.get_field(name).null for name in self.fields]
+
+    @cached_property
+    def count(self):
+        """Total number of rows, possibly cached"""
+        if self.count_key is None:
+            return self.queryset.count()
+        digest = hashlib.sha1(repr(self.count_key).encode()).hexdigest()
+        return cache.get_or_set(
+            f'keyset_count:{digest}',
+            self.queryset.count,
+            timeout=getattr(settings, 'KEYSET_COUNT_TIMEOUT', 300),
+        )
+
+    def _order_by(self):
+        order = []
+        for name, descending, nullable in zip(self.fields, self.descending, self.nullable):
+            if nullable:
+                field = F(name)
+                order.append(field.desc(nulls_last=True) if descending else field.asc(nulls_last=True))
+            else:
+                order.append(f'-{name}' if descending else name)
+        return order
+
+    def encode_cursor(self, obj):
+        values = []
+        for name in self.fields:
+            value = getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values = json.loads(raw)
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            model = self.queryset.model
+            return [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except Exception as e:
+            raise InvalidCursor(cursor) from e
+
+    def _after(self, values):
+        """``Q`` selecting rows strictly after ``values`` in the ordering"""
+        condition = Q()
+        same = Q()
+        for name, value, descending, nullable in zip(self.fields, values, self.descending, self.nullable):
+            if value is not None:
+                # NULLs come after every value
+                step = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+                if nullable:
+                    step |= Q(**{f'{name}__isnull': True})
+                condition |= same & step
+                same &= Q(**{name: value})
+            else:
+                same &= Q(**{f'{name}__isnull': True})
+        if values[0] is not None and not self.nullable[0]:
+            # Redundant bound on the leading column so the index is entered
+            # at the cursor instead of scanned from the start
+            condition &= Q(**{f"{self.fields[0]}__{'lte' if self.descending[0] else 'gte'}": values[0]})
+        return condition
+
+    def get_page(self, cursor=None):
+        """Return the page after ``cursor``; an invalid cursor yields the first page"""
+        queryset = self.queryset.order_by(*self._order_by())
+        if cursor:
+            try:
+                queryset = queryset.filter(self._after(self.decode_cursor(cursor)))
+            except InvalidCursor:
+                cursor = None
+
+        rows = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = self.encode_cursor(rows[-1])
+        return KeysetPage(rows, next_cursor, cursor)
@@ -0,0 +1,104 @@
+"""
+Daily submission and grade rollups.
+
+``DailySubmissionRollup`` holds one row per assignment per day. Receivers in
+``dashboard.signals`` adjust the affected row as submissions and grades are
+written; ``manage.py rebuild_rollups`` recomputes rows from the raw tables.
+Chart queries then sum a handful of rollup rows for any date range.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from assignments.models import Grade, Submission
+from .models import DailySubmissionRollup
+
+COUNTERS = ['submitted', 'late', 'graded', 'score_sum']
+
+
+def local_day(moment):
+    return timezone.localdate(moment)
+
+
+def is_late(submitted_at, due_date):
+    return int(submitted_at > due_date)
+
+
+def apply(day, assignment_id, manager_id, **deltas):
+    """Add ``deltas`` to the ``(day, assignment)`` row, creating it if needed"""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    rows = DailySubmissionRollup.objects.filter(date=day, assignment_id=assignment_id)
+    updates = {name: F(name) + delta for name, delta in deltas.items()}
+    if rows.update(**updates):
+        return
+    if all(delta < 0 for delta in deltas.values()):
+        # Nothing to take away from: the row went with its assignment or
+        # manager in a cascade, or was never built
+        return
+    try:
+        with transaction.atomic():
+            DailySubmissionRollup.objects.create(
+                date=day, assignment_id=assignment_id, manager_id=manager_id, **deltas
+            )
+    except IntegrityError:
+        # Created concurrently
+        rows.update(**updates)
+
+
+def compute(assignment_ids):
+    """Rollup rows for ``assignment_ids`` computed from submissions and grades"""
+    rows = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    managers = {}
+
+    submitted = (
+        Submission.objects.filter(assignment_id__in=assignment_ids, submitted_at__isnull=False)
+        .annotate(day=TruncDate('submitted_at'))
+        .order_by()
+        .values('day', 'assignment_id', 'assignment__created_by_id')
+        .annotate(
+            submitted=Count('id'),
+            late=Count('id', filter=Q(submitted_at__gt=F('assignment__due_date'))),
+        )
+    )
+    for row in submitted:
+        key = (row['day'], row['assignment_id'])
+        managers[key] = row['assignment__created_by_id']
+        rows[key].update(submitted=row['submitted'], late=row['late'])
+
+    graded = (
+        Grade.objects.filter(submission__assignment_id__in=assignment_ids)
+        .annotate(day=TruncDate('graded_at'))
+        .order_by()
+        .values('day', 'submission__assignment_id', 'submission__assignment__created_by_id')
+        .annotate(graded=Count('id'), score_sum=Sum('score'))
+    )
+    for row in graded:
+        key = (row['day'], row['submission__assignment_id'])
+        managers[key] = row['submission__assignment__created_by_id']
+        rows[key].update(graded=row['graded'], score_sum=row['score_sum'])
+
+    return [
+        DailySubmissionRollup(date=day, assignment_id=assignment_id, manager_id=managers[day, assignment_id], **counters)
+        for (day, assignment_id), counters in sorted(rows.items())
+    ]
+
+
+def rebuild(assignment_ids):
+    """Replace the rollup rows of ``assignment_ids``; returns the rows written"""
+    with transaction.atomic():
+        DailySubmissionRollup.objects.filter(assignment_id__in=assignment_ids).delete()
+        return len(DailySubmissionRollup.objects.bulk_create(compute(assignment_ids)))
+
+
+def totals(rollups):
+    """Sum ``rollups`` into ``{'submitted', 'late', 'graded', 'average_score'}``"""
+    sums = rollups.aggregate(**{name: Sum(name) for name in COUNTERS})
+    sums = {name: value or 0 for name, value in sums.items()}
+    score_sum = sums.pop('score_sum')
+    sums['average_score'] = round(score_sum / sums['graded'], 1) if sums['graded'] else None
+    return sums
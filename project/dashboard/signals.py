@@ -0,0 +1,419 @@
+"""
+Keep ``DashboardStats`` and the daily rollups in step with users,
+assignments, submissions and grades, and bump the generations
+(``dashboard.generations``) of the data that changed.
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from accounts.models import StudentProfile, User
+from assignments.models import Assignment, Grade, Submission
+from . import generations, rollups
+from .stats import ROLE_COUNTERS, StatsDelta, membership_changed, unsubmitted_students
+
+
+def _old_values(sender, instance, *fields):
+    """Field values currently stored for ``instance`` (``None`` when adding)"""
+    if instance._state.adding or instance.pk is None:
+        return None
+    return sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+
+def _deleted_with(origin, model):
+    """Whether a delete cascading from ``origin`` started at a ``model`` row"""
+    return isinstance(origin, model) or getattr(origin, 'model', None) is model
+
+
+@receiver(pre_save, sender=User)
+def remember_user_role(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'role' not in update_fields:
+        # e.g. the last_login update on every login
+        instance._stats_old = None
+        return
+    instance._stats_old = _old_values(sender, instance, 'role')
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    old = getattr(instance, '_stats_old', None)
+    old_role = None if created or old is None else old['role']
+    if not created and old_role in (None, instance.role):
+        return
+    delta = StatsDelta()
+    delta.add(None, users=int(created))
+    if old_role in ROLE_COUNTERS:
+        delta.add(None, **{ROLE_COUNTERS[old_role]: -1})
+    if instance.role in ROLE_COUNTERS:
+        delta.add(None, **{ROLE_COUNTERS[instance.role]: 1})
+    delta.apply()
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    delta = StatsDelta()
+    delta.add(None, users=-1)
+    if instance.role in ROLE_COUNTERS:
+        delta.add(None, **{ROLE_COUNTERS[instance.role]: -1})
+    delta.apply()
+
+
+@receiver(pre_save, sender=StudentProfile)
+def remember_profile_manager(sender, instance, **kwargs):
+    instance._stats_old = _old_values(sender, instance, 'manager_id')
+
+
+@receiver(post_save, sender=StudentProfile)
+def profile_saved(sender, instance, created, **kwargs):
+    old = getattr(instance, '_stats_old', None)
+    old_manager_id = None if created or old is None else old['manager_id']
+    if old_manager_id == instance.manager_id:
+        return
+    delta = StatsDelta()
+    if old_manager_id:
+        delta.add(old_manager_id, students=-1)
+    if instance.manager_id:
+        delta.add(instance.manager_id, students=1)
+    delta.apply()
+
+
+@receiver(post_delete, sender=StudentProfile)
+def profile_deleted(sender, instance, **kwargs):
+    if instance.manager_id:
+        delta = StatsDelta()
+        delta.add(instance.manager_id, students=-1)
+        delta.apply()
+
+
+@receiver(pre_save, sender=Assignment)
+def remember_assignment_state(sender, instance, **kwargs):
+    instance._stats_old = _old_values(sender, instance, 'created_by_id', 'is_active', 'due_date')
+
+
+@receiver(post_save, sender=Assignment)
+def assignment_saved(sender, instance, created, **kwargs):
+    delta = StatsDelta()
+    active = int(instance.is_active)
+    old = getattr(instance, '_stats_old', None)
+
+    if created or old is None:
+        delta.add(None, assignments=1, active_assignments=active)
+        delta.add(instance.created_by_id, assignments=1, active_assignments=active)
+        delta.apply()
+        return
+
+    was_active = int(old['is_active'])
+    if active != was_active:
+        delta.add(None, active_assignments=active - was_active)
+        for student_id in unsubmitted_students(instance.pk):
+            delta.add(student_id, pending_assignments=active - was_active)
+
+    if old['created_by_id'] == instance.created_by_id:
+        delta.add(instance.created_by_id, active_assignments=active - was_active)
+    else:
+        pending = instance.submissions.filter(status='submitted').count()
+        delta.add(old['created_by_id'], assignments=-1, active_assignments=-was_active, pending_submissions=-pending)
+        delta.add(instance.created_by_id, assignments=1, active_assignments=active, pending_submissions=pending)
+    delta.apply()
+
+
+@receiver(pre_delete, sender=Assignment)
+def assignment_deleted(sender, instance, **kwargs):
+    # Runs before any row of the cascade is deleted, while the assigned
+    # students are still visible; the submissions' own receivers account for
+    # the submissions deleted with it
+    delta = StatsDelta()
+    active = int(instance.is_active)
+    delta.add(None, assignments=-1, active_assignments=-active)
+    delta.add(instance.created_by_id, assignments=-1, active_assignments=-active)
+    for student_id in instance.assigned_to.values_list('pk', flat=True):
+        delta.add(student_id, assigned_assignments=-1)
+    if active:
+        for student_id in unsubmitted_students(instance.pk):
+            delta.add(student_id, pending_assignments=-1)
+    delta.apply()
+
+
+@receiver(m2m_changed, sender=Assignment.assigned_to.through)
+def assignment_membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('pre_remove', 'pre_clear'):
+        # Only pairs that actually exist; remove() accepts strangers and
+        # clear() reports no pk_set at all
+        through = sender.objects.filter(**{'user_id' if reverse else 'assignment_id': instance.pk})
+        if pk_set is not None:
+            through = through.filter(**{'assignment_id__in' if reverse else 'user_id__in': pk_set})
+        instance._stats_removed = list(through.values_list('assignment_id', 'user_id'))
+        return
+
+    if action == 'post_add' and pk_set:
+        if reverse:
+            pairs = [(assignment_id, instance.pk) for assignment_id in pk_set]
+        else:
+            pairs = [(instance.pk, student_id) for student_id in pk_set]
+        membership_changed(pairs, 1).apply()
+    elif action in ('post_remove', 'post_clear'):
+        pairs = getattr(instance, '_stats_removed', [])
+        instance._stats_removed = []
+        membership_changed(pairs, -1).apply()
+
+
+def _assignment_state(submission):
+    if Submission.assignment.is_cached(submission):
+        assignment = submission.assignment
+        return {'created_by_id': assignment.created_by_id, 'is_active': assignment.is_active}
+    return Assignment.objects.filter(pk=submission.assignment_id).values('created_by_id', 'is_active').first()
+
+
+def _is_assigned(submission):
+    return Assignment.assigned_to.through.objects.filter(
+        assignment_id=submission.assignment_id, user_id=submission.student_id
+    ).exists()
+
+
+@receiver(pre_save, sender=Submission)
+def remember_submission_state(sender, instance, **kwargs):
+    instance._stats_old = _old_values(sender, instance, 'status', 'submitted_at')
+
+
+@receiver(post_save, sender=Submission)
+def submission_saved(sender, instance, created, **kwargs):
+    old = getattr(instance, '_stats_old', None)
+    old_status = None if created or old is None else old['status']
+    if not created and old_status == instance.status:
+        return
+
+    delta = StatsDelta()
+    assignment = _assignment_state(instance)
+    pending = int(instance.status == 'submitted') - int(old_status == 'submitted')
+    completed = int(instance.status == 'graded') - int(old_status == 'graded')
+    delta.add(None, submissions=int(created), pending_submissions=pending)
+    delta.add(assignment['created_by_id'], pending_submissions=pending)
+    delta.add(instance.student_id, completed_submissions=completed)
+    if created and assignment['is_active'] and _is_assigned(instance):
+        delta.add(instance.student_id, pending_assignments=-1)
+    delta.apply()
+
+
+@receiver(post_delete, sender=Submission)
+def submission_deleted(sender, instance, origin=None, **kwargs):
+    delta = StatsDelta()
+    pending = int(instance.status == 'submitted')
+    delta.add(None, submissions=-1, pending_submissions=-pending)
+    delta.add(instance.student_id, completed_submissions=-int(instance.status == 'graded'))
+
+    # The assignment outlives its submissions within a cascade
+    assignment = _assignment_state(instance)
+    if assignment is not None:
+        delta.add(assignment['created_by_id'], pending_submissions=-pending)
+        # Deleting the assignment itself already took it off the student's
+        # pending count
+        if (assignment['is_active'] and not _deleted_with(origin, Assignment)
+                and _is_assigned(instance)):
+            delta.add(instance.student_id, pending_assignments=1)
+    delta.apply()
+
+
+def _grade_student_id(grade):
+    if Grade.submission.is_cached(grade):
+        return grade.submission.student_id
+    return Submission.objects.filter(pk=grade.submission_id).values_list('student_id', flat=True).first()
+
+
+@receiver(pre_save, sender=Grade)
+def remember_grade_score(sender, instance, **kwargs):
+    instance._stats_old = _old_values(sender, instance, 'score')
+
+
+@receiver(post_save, sender=Grade)
+def grade_saved(sender, instance, created, **kwargs):
+    old = getattr(instance, '_stats_old', None)
+    old_score = None if created or old is None else old['score']
+    if old_score == instance.score:
+        return
+    delta = StatsDelta()
+    delta.add(
+        _grade_student_id(instance),
+        grade_total=instance.score - (old_score or 0),
+        grade_count=int(old_score is None),
+    )
+    delta.apply()
+
+
+@receiver(post_delete, sender=Grade)
+def grade_deleted(sender, instance, **kwargs):
+    student_id = _grade_student_id(instance)
+    if student_id is not None:
+        delta = StatsDelta()
+        delta.add(student_id, grade_total=-instance.score, grade_count=-1)
+        delta.apply()
+
+
+def _assignment_scopes(assignment, owner_ids):
+    scopes = [generations.site_assignments(), generations.site_submissions()]
+    for owner_id in owner_ids:
+        if owner_id:
+            scopes += [generations.owner_assignments(owner_id), generations.owner_submissions(owner_id)]
+    scopes += [
+        generations.student_assignments(student_id)
+        for student_id in assignment.assigned_to.values_list('pk', flat=True)
+    ]
+    # Submission lists show the assignment's title
+    scopes += [
+        generations.student_submissions(student_id)
+        for student_id in assignment.submissions.values_list('student_id', flat=True)
+    ]
+    return scopes
+
+
+@receiver(post_save, sender=Assignment)
+def assignment_saved_generations(sender, instance, created, **kwargs):
+    if created:
+        # Nobody is assigned yet; membership changes bump the students
+        generations.bump_on_commit(
+            generations.site_assignments(), generations.owner_assignments(instance.created_by_id)
+        )
+        return
+    old = getattr(instance, '_stats_old', None) or {}
+    generations.bump_on_commit(*_assignment_scopes(
+        instance, {instance.created_by_id, old.get('created_by_id')}
+    ))
+
+
+@receiver(pre_delete, sender=Assignment)
+def assignment_deleted_generations(sender, instance, **kwargs):
+    generations.bump_on_commit(*_assignment_scopes(instance, {instance.created_by_id}))
+
+
+@receiver(m2m_changed, sender=Assignment.assigned_to.through)
+def assignment_membership_generations(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove') and pk_set:
+        ids = pk_set
+    elif action == 'pre_clear':
+        ids = list((instance.assignments if reverse else instance.assigned_to).values_list('pk', flat=True))
+    else:
+        return
+    if reverse:
+        student_ids = [instance.pk]
+        owner_ids = set(Assignment.objects.filter(pk__in=ids).values_list('created_by_id', flat=True))
+    else:
+        student_ids = ids
+        owner_ids = {instance.created_by_id}
+    generations.bump_on_commit(
+        generations.site_assignments(),
+        *[generations.owner_assignments(owner_id) for owner_id in owner_ids],
+        *[generations.student_assignments(student_id) for student_id in student_ids],
+    )
+
+
+@receiver(post_save, sender=Submission)
+@receiver(post_delete, sender=Submission)
+def submission_changed_generations(sender, instance, **kwargs):
+    scopes = [generations.site_submissions(), generations.student_submissions(instance.student_id)]
+    assignment = _assignment_state(instance)
+    if assignment is not None:
+        scopes.append(generations.owner_submissions(assignment['created_by_id']))
+    generations.bump_on_commit(*scopes)
+
+
+@receiver(post_save, sender=Grade)
+@receiver(post_delete, sender=Grade)
+def grade_changed_generations(sender, instance, **kwargs):
+    scopes = [generations.site_grades()]
+    student_id = _grade_student_id(instance)
+    if student_id is not None:
+        scopes.append(generations.student_grades(student_id))
+    assignment = _grade_assignment(instance)
+    if assignment is not None:
+        scopes.append(generations.owner_grades(assignment[1]))
+    generations.bump_on_commit(*scopes)
+
+
+@receiver(post_save, sender=User)
+def user_saved_generations(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    generations.bump_on_commit(generations.site_users())
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_delete, sender=StudentProfile)
+def user_data_changed_generations(sender, instance, **kwargs):
+    generations.bump_on_commit(generations.site_users())
+
+
+@receiver(post_save, sender=Assignment)
+def assignment_saved_rollups(sender, instance, created, **kwargs):
+    old = getattr(instance, '_stats_old', None)
+    if created or old is None:
+        return
+    if old['due_date'] != instance.due_date:
+        # Lateness of every submission may have changed
+        rollups.rebuild([instance.pk])
+    elif old['created_by_id'] != instance.created_by_id:
+        instance.daily_rollups.update(manager_id=instance.created_by_id)
+
+
+def _submission_assignment(submission):
+    if Submission.assignment.is_cached(submission):
+        assignment = submission.assignment
+        return {'created_by_id': assignment.created_by_id, 'due_date': assignment.due_date}
+    return Assignment.objects.filter(pk=submission.assignment_id).values('created_by_id', 'due_date').first()
+
+
+@receiver(post_save, sender=Submission)
+def submission_saved_rollups(sender, instance, created, **kwargs):
+    old = getattr(instance, '_stats_old', None)
+    old_submitted_at = None if created or old is None else old['submitted_at']
+    if old_submitted_at == instance.submitted_at:
+        return
+    assignment = _submission_assignment(instance)
+    for submitted_at, sign in ((old_submitted_at, -1), (instance.submitted_at, 1)):
+        if submitted_at is not None:
+            rollups.apply(
+                rollups.local_day(submitted_at), instance.assignment_id, assignment['created_by_id'],
+                submitted=sign, late=sign * rollups.is_late(submitted_at, assignment['due_date']),
+            )
+
+
+@receiver(post_delete, sender=Submission)
+def submission_deleted_rollups(sender, instance, **kwargs):
+    if instance.submitted_at is None:
+        return
+    assignment = _submission_assignment(instance)
+    if assignment is not None:
+        rollups.apply(
+            rollups.local_day(instance.submitted_at), instance.assignment_id, assignment['created_by_id'],
+            submitted=-1, late=-rollups.is_late(instance.submitted_at, assignment['due_date']),
+        )
+
+
+def _grade_assignment(grade):
+    if Grade.submission.is_cached(grade) and Submission.assignment.is_cached(grade.submission):
+        assignment = grade.submission.assignment
+        return assignment.pk, assignment.created_by_id
+    return Submission.objects.filter(pk=grade.submission_id).values_list(
+        'assignment_id', 'assignment__created_by_id'
+    ).first()
+
+
+@receiver(post_save, sender=Grade)
+def grade_saved_rollups(sender, instance, created, **kwargs):
+    old = getattr(instance, '_stats_old', None)
+    old_score = None if created or old is None else old['score']
+    if old_score == instance.score:
+        return
+    assignment_id, manager_id = _grade_assignment(instance)
+    rollups.apply(
+        rollups.local_day(instance.graded_at), assignment_id, manager_id,
+        graded=int(old_score is None), score_sum=instance.score - (old_score or 0),
+    )
+
+
+@receiver(post_delete, sender=Grade)
+def grade_deleted_rollups(sender, instance, **kwargs):
+    assignment = _grade_assignment(instance)
+    if assignment is not None:
+        rollups.apply(
+            rollups.local_day(instance.graded_at), *assignment,
+            graded=-1, score_sum=-instance.score,
+        )
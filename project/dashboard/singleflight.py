@@ -0,0 +1,139 @@
+"""
+Single-flight coalescing of expensive computations.
+
+``run(name, key, compute)`` makes concurrent callers with the same ``key``
+share one call of ``compute``: within a process, followers wait on the
+leader's thread; across processes, the leader holds a lock in the cache
+backend and followers poll for the result it publishes. The result stays in
+the cache for a short TTL so requests arriving just after it was computed
+reuse it too. Keys should include the generations (``dashboard.generations``)
+of the data the result is built from, so a shared result is never stale.
+"""
+import hashlib
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+PREFIX = 'dashboard:flight:'
+METRICS_PREFIX = 'dashboard:flight-metrics:'
+
+FLIGHTS = ['dashboard_stats', 'stats_row']
+
+_MISSING = object()
+
+_flights_lock = threading.Lock()
+_flights = {}
+
+
+class _Flight:
+    """An in-process computation followers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = _MISSING
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _keys(name, key):
+    digest = hashlib.sha1(f'{name}:{key}'.encode()).hexdigest()
+    return f'{PREFIX}{digest}:result', f'{PREFIX}{digest}:lock'
+
+
+def run(name, key, compute, ttl=None):
+    """Result of ``compute()``, shared by concurrent callers of the same ``key``"""
+    result_key, lock_key = _keys(name, key)
+    result = cache.get(result_key, _MISSING)
+    if result is not _MISSING:
+        record(name, shared=True)
+        return result
+
+    with _flights_lock:
+        flight = _flights.get(result_key)
+        leader = flight is None
+        if leader:
+            flight = _flights[result_key] = _Flight()
+
+    if not leader:
+        flight.done.wait(_setting('SINGLE_FLIGHT_WAIT', 10))
+        if flight.result is not _MISSING:
+            record(name, shared=True)
+            return flight.result
+        # The leader failed or is taking too long
+        return _compute(name, result_key, compute, ttl)
+
+    try:
+        flight.result = _lead(name, result_key, lock_key, compute, ttl)
+        return flight.result
+    finally:
+        with _flights_lock:
+            del _flights[result_key]
+        flight.done.set()
+
+
+def _lead(name, result_key, lock_key, compute, ttl):
+    token = uuid.uuid4().hex
+    wait = _setting('SINGLE_FLIGHT_WAIT', 10)
+    if cache.add(lock_key, token, wait):
+        try:
+            return _compute(name, result_key, compute, ttl)
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    # Another process is computing: wait for what it publishes
+    deadline = time.monotonic() + wait
+    poll = _setting('SINGLE_FLIGHT_POLL_INTERVAL', 0.05)
+    while time.monotonic() < deadline:
+        time.sleep(poll)
+        result = cache.get(result_key, _MISSING)
+        if result is not _MISSING:
+            record(name, shared=True)
+            return result
+        if cache.get(lock_key) is None:
+            # Released without a result: that process failed
+            break
+    return _compute(name, result_key, compute, ttl)
+
+
+def _compute(name, result_key, compute, ttl):
+    result = compute()
+    ttl = _setting('SINGLE_FLIGHT_TTL', 5) if ttl is None else ttl
+    if ttl:
+        cache.set(result_key, result, ttl)
+    record(name, shared=False)
+    return result
+
+
+def record(name, shared):
+    key = f"{METRICS_PREFIX}{name}:{'shared' if shared else 'computed'}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def metrics():
+    """``{flight: {'computed', 'shared', 'collapse_ratio'}}`` since the cache was last cleared"""
+    keys = [
+        f'{METRICS_PREFIX}{name}:{kind}'
+        for name in FLIGHTS for kind in ('computed', 'shared')
+    ]
+    counts = cache.get_many(keys)
+    result = {}
+    for name in FLIGHTS:
+        computed = counts.get(f'{METRICS_PREFIX}{name}:computed', 0)
+        shared = counts.get(f'{METRICS_PREFIX}{name}:shared', 0)
+        total = computed + shared
+        result[name] = {
+            'computed': computed,
+            'shared': shared,
+            'collapse_ratio': round(shared / total, 3) if total else None,
+        }
+    return result
@@ -0,0 +1,222 @@
+"""
+Precomputed dashboard statistics.
+
+``home()`` reads one ``DashboardStats`` row instead of running a handful of
+``COUNT``/``AVG`` queries over users, assignments and submissions. The rows
+are adjusted in place with ``F()`` deltas by the receivers in
+``dashboard.signals`` in the same transaction as the change that caused
+them. A row that does not exist yet is computed from scratch the first time
+it is read, and ``manage.py rebuild_dashboard_stats`` recomputes them all.
+"""
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
+from django.utils import timezone
+
+from accounts.models import StudentProfile, User
+from assignments.models import Assignment, Submission
+from . import singleflight
+from .models import DashboardStats
+
+COUNTERS = [
+    field.name for field in DashboardStats._meta.concrete_fields
+    if field.name not in ('id', 'user', 'updated_at')
+]
+
+ROLE_COUNTERS = {
+    'student': 'students',
+    'manager': 'managers',
+}
+
+
+class StatsDelta:
+    """Counter changes for several rows, applied with one UPDATE per row"""
+
+    def __init__(self):
+        self.changes = defaultdict(Counter)
+
+    def add(self, user_id, **deltas):
+        """``user_id=None`` targets the site-wide row"""
+        self.changes[user_id].update(deltas)
+
+    def apply(self):
+        now = timezone.now()
+        # Rows with identical changes (e.g. every student of an assignment)
+        # share one UPDATE
+        grouped = defaultdict(list)
+        for user_id, deltas in self.changes.items():
+            deltas = tuple(sorted((name, delta) for name, delta in deltas.items() if delta))
+            if deltas:
+                grouped[deltas].append(user_id)
+
+        for deltas, user_ids in grouped.items():
+            updates = {name: F(name) + delta for name, delta in deltas}
+            if None in user_ids:
+                DashboardStats.objects.filter(user__isnull=True).update(updated_at=now, **updates)
+            user_ids = [user_id for user_id in user_ids if user_id is not None]
+            if user_ids:
+                # Users whose row has not been built yet are simply skipped;
+                # it will be computed from the current data when first read
+                DashboardStats.objects.filter(user_id__in=user_ids).update(updated_at=now, **updates)
+        self.changes.clear()
+
+
+def compute_global():
+    """Site-wide counters computed from scratch"""
+    values = User.objects.aggregate(
+        users=Count('id'),
+        students=Count('id', filter=Q(role='student')),
+        managers=Count('id', filter=Q(role='manager')),
+    )
+    values.update(Assignment.objects.aggregate(
+        assignments=Count('id'),
+        active_assignments=Count('id', filter=Q(is_active=True)),
+    ))
+    values.update(Submission.objects.aggregate(
+        submissions=Count('id'),
+        pending_submissions=Count('id', filter=Q(status='submitted')),
+    ))
+    return values
+
+
+def compute_users(user_ids=None):
+    """``{user_id: counters}`` computed from scratch, for ``user_ids`` or every user"""
+    users = User.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    stats = {pk: dict.fromkeys(COUNTERS, 0) for pk in users.values_list('pk', flat=True)}
+    if not stats:
+        return stats
+
+    def scoped(queryset, field):
+        if user_ids is not None:
+            queryset = queryset.filter(**{f'{field}__in': user_ids})
+        return queryset.order_by().values(field)
+
+    def merge(rows, field):
+        for row in rows:
+            user_id = row.pop(field)
+            if user_id in stats:
+                stats[user_id].update({name: value or 0 for name, value in row.items()})
+
+    merge(scoped(Assignment.objects, 'created_by').annotate(
+        assignments=Count('id'),
+        active_assignments=Count('id', filter=Q(is_active=True)),
+    ), 'created_by')
+    merge(scoped(Submission.objects.filter(status='submitted'), 'assignment__created_by').annotate(
+        pending_submissions=Count('id'),
+    ), 'assignment__created_by')
+    merge(scoped(StudentProfile.objects, 'manager').annotate(
+        students=Count('id'),
+    ), 'manager')
+
+    membership = Assignment.assigned_to.through.objects
+    submitted = Submission.objects.filter(
+        assignment_id=OuterRef('assignment_id'), student_id=OuterRef('user_id')
+    )
+    merge(scoped(membership, 'user').annotate(
+        assigned_assignments=Count('id'),
+    ), 'user')
+    merge(scoped(membership.filter(assignment__is_active=True).exclude(Exists(submitted)), 'user').annotate(
+        pending_assignments=Count('id'),
+    ), 'user')
+    merge(scoped(Submission.objects, 'student').annotate(
+        completed_submissions=Count('id', filter=Q(status='graded')),
+        grade_total=Sum('grade__score'),
+        grade_count=Count('grade'),
+    ), 'student')
+    return stats
+
+
+def _get_or_build(user, compute):
+    queryset = DashboardStats.objects.filter(user=user) if user else DashboardStats.objects.filter(user__isnull=True)
+    stats = queryset.first()
+    if stats is not None:
+        return stats
+
+    def build():
+        # A follower whose leader ran in another process finds the row built
+        stats = queryset.first()
+        if stats is not None:
+            return stats
+        try:
+            with transaction.atomic():
+                return DashboardStats.objects.create(user=user, **compute())
+        except IntegrityError:
+            # Built concurrently by another request
+            return queryset.get()
+
+    # Concurrent first visits wait for one computation; the row itself is
+    # the shared result, so nothing needs to outlive the flight
+    return singleflight.run('stats_row', user.pk if user else 'site', build, ttl=0)
+
+
+def global_stats():
+    """The site-wide ``DashboardStats`` row"""
+    return _get_or_build(None, compute_global)
+
+
+def user_stats(user):
+    """``user``'s ``DashboardStats`` row"""
+    return _get_or_build(user, lambda: compute_users([user.pk])[user.pk])
+
+
+def rebuild(batch_size=1000):
+    """Recompute every row; returns the number of rows written"""
+    rows = [DashboardStats(user=None, **compute_global())]
+    rows.extend(
+        DashboardStats(user_id=user_id, **counters)
+        for user_id, counters in compute_users().items()
+    )
+    with transaction.atomic():
+        DashboardStats.objects.all().delete()
+        DashboardStats.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def drifted():
+    """``[(user_id, stored, actual)]`` for rows that disagree with the data"""
+    actual = {None: compute_global()}
+    actual.update(compute_users())
+    result = []
+    for stats in DashboardStats.objects.all():
+        expected = actual.get(stats.user_id)
+        if expected is None:
+            continue
+        stored = {name: getattr(stats, name) for name in expected}
+        if stored != expected:
+            result.append((stats.user_id, stored, expected))
+    return result
+
+
+def membership_changed(pairs, sign):
+    """
+    Deltas for ``(assignment_id, student_id)`` pairs added (``sign=1``) to or
+    removed (``sign=-1``) from ``Assignment.assigned_to``.
+    """
+    delta = StatsDelta()
+    if not pairs:
+        return delta
+    assignment_ids = {assignment_id for assignment_id, _ in pairs}
+    student_ids = {student_id for _, student_id in pairs}
+    active = set(
+        Assignment.objects.filter(pk__in=assignment_ids, is_active=True).values_list('pk', flat=True)
+    )
+    submitted = set(
+        Submission.objects.filter(assignment_id__in=assignment_ids, student_id__in=student_ids)
+        .values_list('assignment_id', 'student_id')
+    )
+    for assignment_id, student_id in pairs:
+        pending = assignment_id in active and (assignment_id, student_id) not in submitted
+        delta.add(student_id, assigned_assignments=sign, pending_assignments=sign if pending else 0)
+    return delta
+
+
+def unsubmitted_students(assignment_id):
+    """Ids of students assigned ``assignment_id`` who have not submitted it"""
+    return list(
+        Assignment.assigned_to.through.objects.filter(assignment_id=assignment_id)
+        .exclude(user_id__in=Submission.objects.filter(assignment_id=assignment_id).values('student_id'))
+        .values_list('user_id', flat=True)
+    )
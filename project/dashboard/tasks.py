@@ -0,0 +1,55 @@
+"""
+Minimal in-process background execution for work that must not run inside
+the HTTP request (notification fan-out, bulk email).
+
+Jobs are queued on a small thread pool and always run after the current
+transaction has committed, so they see the rows the request just wrote.
+Set ``BACKGROUND_TASKS_EAGER = True`` to run jobs inline (used by tests).
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BACKGROUND_TASKS_WORKERS', 1),
+                thread_name_prefix='background-task',
+            )
+    return _executor
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', getattr(func, '__name__', func))
+    finally:
+        # Worker threads own their connections; don't leave them open between jobs
+        connections.close_all()
+
+
+def run_in_background(func, *args, **kwargs):
+    """Run ``func(*args, **kwargs)`` on the background pool (or inline when eager)"""
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        func(*args, **kwargs)
+        return
+    _get_executor().submit(_run, func, args, kwargs)
+
+
+def run_after_commit(func, *args, using=None, **kwargs):
+    """Schedule ``func`` to run in the background once the current transaction commits"""
+    transaction.on_commit(partial(run_in_background, func, *args, **kwargs), using=using)
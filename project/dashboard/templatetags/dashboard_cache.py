@@ -0,0 +1,48 @@
+from django import template
+from django.core.cache import cache
+
+from dashboard import fragments
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, name, key):
+        self.nodelist = nodelist
+        self.name = name
+        self.key = key
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        key = self.key.resolve(context)
+        if not key:
+            return self.nodelist.render(context)
+
+        content = cache.get(key)
+        if content is not None:
+            fragments.record(name, hit=True)
+            return content
+
+        content = self.nodelist.render(context)
+        cache.set(key, content, fragments.fragment_timeout())
+        fragments.record(name, hit=False)
+        return content
+
+
+@register.tag
+def fragment(parser, token):
+    """
+    Cache the enclosed template under a key from ``dashboard.fragments``::
+
+        {% fragment "recent_activity" fragment_keys.recent_activity %}
+            ...
+        {% endfragment %}
+
+    The querysets used inside should be lazy so a hit runs no queries.
+    """
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes a fragment name and a cache key")
+    nodelist = parser.parse(('endfragment',))
+    parser.delete_first_token()
+    return FragmentNode(nodelist, parser.compile_filter(bits[1]), parser.compile_filter(bits[2]))
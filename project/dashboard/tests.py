@@ -1,3 +1,1044 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import openpyxl
+
+from asgiref.sync import sync_to_async
+
+from django.apps import apps as django_apps
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.db import connection
+from django.db.models import Sum
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from accounts.models import StudentProfile, User
+from assignments.models import Assignment, Grade, Submission
+from . import export_jobs, fragments, generations, gradebook, live, outbox, singleflight, stats, timeseries
+from .emails import compile_email
+from .models import (
+    ArchivedNotification, DailySubmissionRollup, DashboardStats, EmailOutbox, ExportJob, Notification,
+)
+from .pagination import KeysetPaginator
+
+
+class FailingEmailBackend(LocmemBackend):
+    """Locmem backend that rejects one address, for exercising retries"""
+
+    def send_messages(self, messages):
+        if any('bounce@example.com' in message.to for message in messages):
+            raise ConnectionError('mailbox unavailable')
+        return super().send_messages(messages)
+
+
+class EmailOutboxTests(TestCase):
+
+    def test_worker_delivers_queued_emails(self):
+        for i in range(3):
+            outbox.enqueue(f'user{i}@example.com', 'Hello', 'Body', '<p>Body</p>')
+
+        call_command('run_outbox', '--once', '--batch-size', '2', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].alternatives[0][0], '<p>Body</p>')
+        self.assertEqual(EmailOutbox.objects.filter(status='sent').count(), 3)
+
+    @override_settings(
+        EMAIL_BACKEND='dashboard.tests.FailingEmailBackend',
+        EMAIL_OUTBOX_BACKOFF_BASE=10,
+        EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+    )
+    def test_failures_back_off_then_give_up(self):
+        outbox.enqueue('ok@example.com', 'Hello', 'Body')
+        bad = outbox.enqueue('bounce@example.com', 'Hello', 'Body')
+
+        with self.assertLogs('dashboard.outbox', 'WARNING'):
+            self.assertEqual(outbox.process_batch(), (1, 1))
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, 'pending')
+        self.assertEqual(bad.attempts, 1)
+        self.assertIn('mailbox unavailable', bad.last_error)
+        self.assertGreater(bad.next_attempt_at, timezone.now() + timedelta(seconds=5))
+
+        # Not due yet
+        self.assertEqual(outbox.process_batch(), (0, 0))
+
+        EmailOutbox.objects.filter(pk=bad.pk).update(next_attempt_at=timezone.now())
+        with self.assertLogs('dashboard.outbox', 'WARNING'):
+            self.assertEqual(outbox.process_batch(), (0, 1))
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, 'failed')
+
+    def test_claims_are_exclusive_and_stale_claims_are_released(self):
+        for i in range(4):
+            outbox.enqueue(f'user{i}@example.com', 'Hello', 'Body')
+
+        first = outbox.claim_batch(3, worker_id='a')
+        second = outbox.claim_batch(3, worker_id='b')
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 1)
+        self.assertEqual(outbox.claim_batch(3, worker_id='c'), [])
+
+        EmailOutbox.objects.update(claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(outbox.release_stale_claims(), 4)
+
+    def test_backoff_is_exponential_and_capped(self):
+        with self.settings(EMAIL_OUTBOX_BACKOFF_BASE=30, EMAIL_OUTBOX_BACKOFF_MAX=100):
+            self.assertEqual(
+                [outbox.backoff_delay(n).total_seconds() for n in (1, 2, 3, 4)],
+                [30, 60, 100, 100],
+            )
+
+    def test_stats_report_depth_and_throughput(self):
+        outbox.enqueue('a@example.com', 'Hello', 'Body')
+        outbox.enqueue('b@example.com', 'Hello', 'Body')
+        outbox.process_batch(batch_size=1)
+
+        stats = outbox.outbox_stats(window_seconds=60)
+        self.assertEqual(stats['queue_depth'], 1)
+        self.assertEqual(stats['sent_in_window'], 1)
+        self.assertAlmostEqual(stats['throughput_per_second'], 1 / 60)
+
+
+class CompiledEmailTests(TestCase):
+
+    def test_matches_a_full_render_for_every_recipient(self):
+        assignment = Assignment(
+            title='Essays & <Poems>',
+            description='Describe',
+            instructions='Line one\nLine two',
+            due_date=timezone.now(),
+        )
+        template = compile_email(
+            'emails/assignment_created.html', {'assignment': assignment}, recipient_var='student'
+        )
+        recipients = [
+            User(username='plain', email='plain@example.com'),
+            User(username='named', first_name="O'Brien", last_name='<Smith>'),
+        ]
+        for recipient in recipients:
+            html = render_to_string('emails/assignment_created.html', {
+                'student': recipient,
+                'assignment': assignment,
+            })
+            self.assertEqual(template.render(recipient), (strip_tags(html), html))
+
+
+class UnreadCounterTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('student', 'student@example.com', None, role='student')
+        self.other = User.objects.create_user('other', 'other@example.com', None, role='student')
+
+    def notify(self, recipient, **kwargs):
+        return Notification.objects.create(recipient=recipient, title='Hi', message='Hello', **kwargs)
+
+    def unread_count(self, user):
+        return User.objects.values_list('unread_notification_count', flat=True).get(pk=user.pk)
+
+    def test_create_and_bulk_create_increment(self):
+        self.notify(self.user)
+        self.notify(self.user, is_read=True)
+        Notification.objects.bulk_create([
+            Notification(recipient=self.user, title='A', message='A'),
+            Notification(recipient=self.other, title='B', message='B'),
+            Notification(recipient=self.other, title='C', message='C'),
+        ])
+        self.assertEqual(self.unread_count(self.user), 2)
+        self.assertEqual(self.unread_count(self.other), 2)
+
+    def test_mark_read_and_delete_decrement(self):
+        first = self.notify(self.user)
+        self.notify(self.user)
+        self.notify(self.user)
+
+        self.assertEqual(Notification.objects.filter(pk=first.pk).mark_read(), 1)
+        # Marking an already read row twice must not decrement again
+        self.assertEqual(Notification.objects.filter(pk=first.pk).mark_read(), 0)
+        self.assertEqual(self.unread_count(self.user), 2)
+
+        self.user.notifications.unread()[:1].get().delete()
+        self.assertEqual(self.unread_count(self.user), 1)
+        self.user.notifications.all().delete()
+        self.assertEqual(self.unread_count(self.user), 0)
+
+    def test_user_save_does_not_clobber_counter(self):
+        stale = User.objects.get(pk=self.user.pk)
+        self.notify(self.user)
+        stale.bio = 'Updated'
+        stale.save()
+        self.assertEqual(self.unread_count(self.user), 1)
+
+    def test_views_keep_counter_in_step(self):
+        notification = self.notify(self.user)
+        self.notify(self.user)
+        self.client.force_login(self.user)
+
+        self.client.get(reverse('dashboard:mark_notification_read', args=[notification.pk]))
+        self.assertEqual(self.unread_count(self.user), 1)
+
+        self.client.get(reverse('dashboard:notifications'))
+        self.assertEqual(self.unread_count(self.user), 0)
+
+    def test_badge_costs_no_queries(self):
+        self.notify(self.user)
+        self.user.refresh_from_db()
+        request = RequestFactory().get('/')
+        request.user = self.user
+        with self.assertNumQueries(0):
+            html = render_to_string('base.html', {'user': self.user}, request)
+        self.assertIn('notification', html)
+
+    def test_admin_update_keeps_counter_in_step(self):
+        notification = self.notify(self.user)
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'x', role='admin')
+        self.client.force_login(admin)
+        url = reverse('admin:dashboard_notification_change', args=[notification.pk])
+        data = {'title': 'Hi', 'message': 'Hello', 'notification_type': 'general', 'digest_count': 1}
+
+        # Move it to another recipient, then mark it read, then unread again
+        self.client.post(url, {**data, 'recipient': self.other.pk})
+        self.assertEqual((self.unread_count(self.user), self.unread_count(self.other)), (0, 1))
+        self.client.post(url, {**data, 'recipient': self.other.pk, 'is_read': 'on'})
+        self.assertEqual(self.unread_count(self.other), 0)
+        self.client.post(url, {**data, 'recipient': self.user.pk})
+        self.assertEqual((self.unread_count(self.user), self.unread_count(self.other)), (1, 0))
+
+        # Saving unrelated fields leaves the counter alone
+        notification.refresh_from_db()
+        notification.title = 'Renamed'
+        notification.save(update_fields=['title'])
+        self.assertEqual(self.unread_count(self.user), 1)
+
+    def test_repair_command_recomputes_drift(self):
+        self.notify(self.user)
+        User.objects.filter(pk=self.user.pk).update(unread_notification_count=7)
+        User.objects.filter(pk=self.other.pk).update(unread_notification_count=3)
+
+        call_command('repair_unread_counts', stdout=StringIO())
+
+        self.assertEqual(self.unread_count(self.user), 1)
+        self.assertEqual(self.unread_count(self.other), 0)
+
+
+class NotificationInboxTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('student', 'student@example.com', None, role='student')
+        Notification.objects.bulk_create([
+            Notification(recipient=self.user, title=f'N{i}', message='Hello')
+            for i in range(45)
+        ])
+        # Identical timestamps force the id tiebreaker to do its job
+        Notification.objects.update(created_at=timezone.now())
+        self.client.force_login(self.user)
+
+    def test_keyset_pages_cover_every_row_once(self):
+        paginator = KeysetPaginator(self.user.notifications.all(), per_page=20)
+        seen = []
+        page = paginator.get_page()
+        while True:
+            seen.extend(n.pk for n in page)
+            if not page.has_next():
+                break
+            page = paginator.get_page(page.next_cursor)
+        self.assertEqual(seen, list(self.user.notifications.order_by('-created_at', '-id').values_list('pk', flat=True)))
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        page = KeysetPaginator(self.user.notifications.all(), per_page=5).get_page('not-a-cursor')
+        self.assertTrue(page.is_first())
+        self.assertEqual(len(page), 5)
+
+    def test_only_shown_notifications_are_marked_read(self):
+        response = self.client.get(reverse('dashboard:notifications'))
+        self.assertEqual(len(response.context['notifications']), 20)
+        self.assertEqual(self.user.notifications.unread().count(), 25)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notification_count, 25)
+
+    def test_json_feed_follows_cursor(self):
+        first = self.client.get(reverse('dashboard:notifications_feed')).json()
+        second = self.client.get(reverse('dashboard:notifications_feed'), {'cursor': first['next_cursor']}).json()
+        third = self.client.get(reverse('dashboard:notifications_feed'), {'cursor': second['next_cursor']}).json()
+
+        self.assertEqual([len(first['results']), len(second['results']), len(third['results'])], [20, 20, 5])
+        self.assertIsNone(third['next_cursor'])
+        self.assertEqual(third['unread_count'], 0)
+
+
+class CompactNotificationsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+
+    def add(self, count, title='New Submission: Essay', days_old=0, is_read=False):
+        Notification.objects.bulk_create([
+            Notification(recipient=self.user, title=title, message='Submitted', is_read=is_read)
+            for _ in range(count)
+        ])
+        if days_old:
+            Notification.objects.filter(created_at__gte=timezone.now() - timedelta(minutes=1)).update(
+                created_at=timezone.now() - timedelta(days=days_old)
+            )
+
+    def compact(self, *args):
+        call_command('compact_notifications', '--chunk-size', '3', *args, stdout=StringIO())
+
+    def test_expired_read_notifications_are_deleted_in_chunks(self):
+        self.add(7, title='Old', days_old=400, is_read=True)
+        self.add(2, title='Old unread', days_old=400)
+        self.add(2, title='Recent', is_read=True)
+
+        self.compact('--days', '30')
+
+        self.assertEqual(
+            sorted(Notification.objects.values_list('title', flat=True)),
+            ['Old unread', 'Old unread', 'Recent', 'Recent'],
+        )
+        self.assertFalse(ArchivedNotification.objects.exists())
+
+    def test_archive_moves_rows(self):
+        self.add(4, title='Old', days_old=400, is_read=True)
+
+        self.compact('--days', '30', '--archive')
+
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(ArchivedNotification.objects.filter(recipient=self.user).count(), 4)
+
+    def test_similar_unread_notifications_collapse_into_digest(self):
+        self.add(40)
+        self.add(2, title='New Submission: Quiz')
+
+        self.compact('--digest-threshold', '5')
+
+        digest = Notification.objects.get(title='New Submission: Essay')
+        self.assertEqual(digest.digest_count, 40)
+        self.assertEqual(Notification.objects.filter(title='New Submission: Quiz').count(), 2)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notification_count, 3)
+
+        # Later notifications fold into the existing digest
+        self.add(5)
+        self.compact('--digest-threshold', '5')
+        self.assertEqual(Notification.objects.get(title='New Submission: Essay').digest_count, 45)
+
+    def test_legacy_types_are_migrated(self):
+        migration = importlib.import_module('dashboard.migrations.0010_legacy_notification_types')
+        for notification_type in ['assignment', 'grade', 'comment', 'general']:
+            Notification.objects.create(recipient=self.user, title=notification_type, message='x', notification_type=notification_type)
+        ArchivedNotification.objects.create(
+            recipient=self.user, title='grade', message='x', notification_type='grade', created_at=timezone.now(),
+        )
+
+        migration.normalize_notification_types(django_apps, None)
+
+        self.assertEqual(dict(Notification.objects.values_list('title', 'notification_type')), {
+            'assignment': 'submission_created', 'grade': 'submission_graded',
+            'comment': 'comment_added', 'general': 'general',
+        })
+        self.assertEqual(ArchivedNotification.objects.get().notification_type, 'submission_graded')
+
+
+class NotificationStreamTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('student', 'student@example.com', None, role='student')
+        self.other = User.objects.create_user('other', 'other@example.com', None, role='student')
+
+    async def test_stream_pushes_new_notifications_and_count(self):
+        feed = live.NotificationFeed(interval=0.01)
+        with mock.patch.object(live, 'feed', feed):
+            stream = live.event_stream(self.user.pk, 0, keepalive=5)
+            self.assertEqual(await anext(stream), 'retry: 5000\n\n')
+            self.assertEqual(await anext(stream), 'event: unread\ndata: {"count":0}\n\n')
+
+            # Let the first poll record the high-water mark
+            await asyncio.sleep(0.05)
+            await sync_to_async(Notification.objects.create)(recipient=self.other, title='Other', message='x')
+            await sync_to_async(Notification.objects.create)(recipient=self.user, title='Graded', message='x')
+
+            event = await asyncio.wait_for(anext(stream), 2)
+            self.assertTrue(event.startswith('event: notification\n'))
+            self.assertIn('"title":"Graded"', event)
+            self.assertEqual(
+                await asyncio.wait_for(anext(stream), 2),
+                'event: unread\ndata: {"count":1}\n\n',
+            )
+            await stream.aclose()
+
+        self.assertFalse(feed.subscribers)
+
+    def test_stream_endpoint_requires_login(self):
+        response = self.client.get(reverse('dashboard:notification_stream'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_stream_is_not_served_under_wsgi(self):
+        self.client.force_login(self.user)
+        # The test client goes through the WSGI handler
+        with override_settings(LIVE_NOTIFICATIONS_ENABLED=True):
+            response = self.client.get(reverse('dashboard:notification_stream'))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+    def test_pages_open_the_stream_only_when_enabled(self):
+        self.client.force_login(self.user)
+        url = reverse('dashboard:notifications')
+        self.assertNotContains(self.client.get(url), 'EventSource(')
+        with override_settings(LIVE_NOTIFICATIONS_ENABLED=True):
+            self.assertContains(self.client.get(url), 'EventSource(')
+
+
+class DashboardStatsTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', 'admin@example.com', None, role='admin')
+        self.manager = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+        self.students = [
+            User.objects.create_user(f'student{i}', f'student{i}@example.com', None, role='student')
+            for i in range(3)
+        ]
+        for i, student in enumerate(self.students):
+            StudentProfile.objects.create(
+                user=student, student_id=f'S{i}', enrollment_date=timezone.now().date(), manager=self.manager
+            )
+        # Build every row up front so the receivers have something to adjust
+        stats.global_stats()
+        for user in [self.admin, self.manager, *self.students]:
+            stats.user_stats(user)
+
+    def assertInSync(self):
+        self.assertEqual(stats.drifted(), [])
+
+    def create_assignment(self, **kwargs):
+        kwargs.setdefault('created_by', self.manager)
+        return Assignment.objects.create(
+            title='Essay', description='Write', due_date=timezone.now() + timedelta(days=7), **kwargs
+        )
+
+    def test_counters_follow_every_kind_of_change(self):
+        essay = self.create_assignment()
+        quiz = self.create_assignment(is_active=False)
+        essay.assigned_to.set(self.students)
+        self.students[0].assignments.add(quiz)
+        self.assertInSync()
+
+        submission = Submission.objects.create(assignment=essay, student=self.students[0], status='submitted')
+        Submission.objects.create(assignment=essay, student=self.students[1], status='draft')
+        self.assertInSync()
+        self.assertEqual(stats.user_stats(self.students[2]).pending_assignments, 1)
+
+        grade = Grade.objects.create(submission=submission, score=80, graded_by=self.manager)
+        submission.status = 'graded'
+        submission.save()
+        grade.score = 90
+        grade.save()
+        self.assertInSync()
+        self.assertEqual(stats.user_stats(self.students[0]).average_grade, 90)
+
+        quiz.is_active = True
+        quiz.save()
+        quiz.created_by = self.admin
+        quiz.save()
+        essay.assigned_to.remove(self.students[2], self.admin)
+        self.students[1].student_profile.manager = None
+        self.students[1].student_profile.save()
+        self.assertInSync()
+
+        submission.delete()
+        self.assertInSync()
+        essay.delete()
+        self.students[0].assignments.clear()
+        self.students[2].delete()
+        self.assertInSync()
+
+    def test_home_reads_the_snapshot(self):
+        essay = self.create_assignment()
+        essay.assigned_to.set(self.students)
+        Submission.objects.create(assignment=essay, student=self.students[0], status='submitted')
+
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('dashboard:home'))
+        self.assertEqual(response.context['my_students_count'], 3)
+        self.assertEqual(response.context['pending_submissions'], 1)
+
+        self.client.force_login(self.students[1])
+        response = self.client.get(reverse('dashboard:home'))
+        self.assertEqual(response.context['total_assignments'], 1)
+        self.assertEqual(response.context['pending_assignments'], 1)
+
+    def test_missing_rows_are_built_on_read_and_rebuild_fixes_drift(self):
+        essay = self.create_assignment()
+        essay.assigned_to.set(self.students)
+        DashboardStats.objects.all().delete()
+        self.assertEqual(stats.global_stats().assignments, 1)
+        self.assertEqual(stats.user_stats(self.students[0]).pending_assignments, 1)
+
+        DashboardStats.objects.filter(user__isnull=True).update(assignments=42)
+        out = StringIO()
+        call_command('rebuild_dashboard_stats', '--dry-run', stdout=out)
+        self.assertIn('assignments 42 -> 1', out.getvalue())
+        call_command('rebuild_dashboard_stats', stdout=StringIO())
+        self.assertInSync()
+        self.assertEqual(DashboardStats.objects.count(), User.objects.count() + 1)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class FragmentCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user('admin', 'admin@example.com', None, role='admin')
+        self.manager = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+        self.student = User.objects.create_user('student', 'student@example.com', None, role='student')
+        self.other = User.objects.create_user('other', 'other@example.com', None, role='student')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.essay = Assignment.objects.create(
+                title='Essay', description='Write', created_by=self.manager,
+                due_date=timezone.now() + timedelta(days=7),
+            )
+            self.essay.assigned_to.add(self.student)
+
+    def upcoming_key(self, user):
+        return fragments.fragment_key(
+            'upcoming_assignments', user, [generations.student_assignments(user.pk)]
+        )
+
+    def test_second_visit_is_served_from_cache(self):
+        stats.user_stats(self.student)
+        self.client.force_login(self.student)
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get(reverse('dashboard:home'))
+        self.assertContains(response, 'Essay')
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(reverse('dashboard:home'))
+        self.assertContains(response, 'Essay')
+
+        # Both panels' querysets are skipped
+        self.assertEqual(len(first) - len(second), 2)
+        metrics = fragments.metrics()
+        self.assertEqual(metrics['upcoming_assignments'], {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_only_affected_students_are_invalidated(self):
+        student_key, other_key = self.upcoming_key(self.student), self.upcoming_key(self.other)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.essay.title = 'Long essay'
+            self.essay.save()
+        self.assertNotEqual(self.upcoming_key(self.student), student_key)
+        self.assertEqual(self.upcoming_key(self.other), other_key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.assignments.add(self.essay)
+        self.assertNotEqual(self.upcoming_key(self.other), other_key)
+
+    def test_new_submission_refreshes_the_managers_activity(self):
+        self.client.force_login(self.manager)
+        self.client.get(reverse('dashboard:home'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Submission.objects.create(assignment=self.essay, student=self.student, status='submitted')
+        response = self.client.get(reverse('dashboard:home'))
+        self.assertContains(response, 'submitted')
+        self.assertEqual(fragments.metrics()['recent_activity']['misses'], 2)
+
+    def test_metrics_endpoint_is_admin_only(self):
+        self.client.force_login(self.manager)
+        self.assertEqual(self.client.get(reverse('dashboard:fragment_cache_metrics')).status_code, 403)
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('dashboard:fragment_cache_metrics'))
+        self.assertIn('recent_activity', response.json()['fragments'])
+
+
+class TimeSeriesTests(TestCase):
+
+    def setUp(self):
+        self.manager = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+        self.student = User.objects.create_user('student', 'student@example.com', None, role='student')
+        self.scores = [95, 85, 72, 64, 10, 90]
+        for i, score in enumerate(self.scores):
+            assignment = Assignment.objects.create(
+                title=f'Task {i}', description='x', created_by=self.manager,
+                due_date=timezone.now() + timedelta(days=i), max_score=100,
+            )
+            submission = Submission.objects.create(assignment=assignment, student=self.student, status='submitted')
+            Submission.objects.filter(pk=submission.pk).update(
+                submitted_at=timezone.make_aware(datetime(2026, 1 + i % 3, 10 + i))
+            )
+            Grade.objects.create(submission=submission, score=score, graded_by=self.manager)
+
+    def test_month_and_day_buckets_within_a_range(self):
+        by_month = timeseries.bucket_counts(
+            Submission.objects.all(), 'submitted_at', timeseries.TimeRange('month')
+        )
+        self.assertEqual(by_month, [
+            {'period': '2026-01-01', 'count': 2},
+            {'period': '2026-02-01', 'count': 2},
+            {'period': '2026-03-01', 'count': 2},
+        ])
+
+        january = timeseries.TimeRange.from_query({'bucket': 'day', 'start': '2026-01-01', 'end': '2026-02-01'})
+        self.assertEqual(
+            timeseries.bucket_counts(Submission.objects.all(), 'submitted_at', january),
+            [{'period': '2026-01-10', 'count': 1}, {'period': '2026-01-13', 'count': 1}],
+        )
+
+    def test_invalid_ranges_are_rejected(self):
+        with self.assertRaises(timeseries.InvalidRange):
+            timeseries.TimeRange.from_query({'bucket': 'fortnight'})
+        with self.assertRaises(timeseries.InvalidRange):
+            timeseries.TimeRange.from_query({'start': '2026-02-01', 'end': '2026-01-01'})
+
+    def test_letter_grades_match_the_model(self):
+        distribution = {row['letter_grade']: row['count'] for row in timeseries.grade_distribution()}
+        expected = Counter(grade.letter_grade for grade in Grade.objects.select_related('submission__assignment'))
+        self.assertEqual(distribution, {letter: expected.get(letter, 0) for letter in 'ABCDF'})
+
+    def test_student_chart_data(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('dashboard:stats'), {'bucket': 'quarter', 'start': '2025-01-01'})
+        data = response.json()
+        self.assertEqual([grade['letter_grade'] for grade in data['my_grades']], ['A', 'B', 'C', 'D', 'F', 'A'])
+        self.assertEqual(data['submission_timeline'], [{'period': '2026-01-01', 'count': 6}])
+        self.assertEqual(data['range']['bucket'], 'quarter')
+
+        response = self.client.get(reverse('dashboard:stats'), {'bucket': 'hour'})
+        self.assertEqual(response.status_code, 400)
+
+
+class DailyRollupTests(TestCase):
+
+    def setUp(self):
+        self.manager = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+        self.students = [
+            User.objects.create_user(f'student{i}', f'student{i}@example.com', None, role='student')
+            for i in range(3)
+        ]
+        self.due = timezone.make_aware(datetime(2026, 3, 10, 12))
+        self.essay = Assignment.objects.create(
+            title='Essay', description='x', created_by=self.manager, due_date=self.due,
+        )
+
+    def submit(self, student, day):
+        return Submission.objects.create(
+            assignment=self.essay, student=student, status='submitted',
+            submitted_at=timezone.make_aware(datetime(2026, 3, day, 9)),
+        )
+
+    def snapshot(self):
+        return list(DailySubmissionRollup.objects.order_by('date', 'assignment_id').values(
+            'date', 'assignment_id', 'manager_id', 'submitted', 'late', 'graded', 'score_sum'
+        ))
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        call_command('rebuild_rollups', '--chunk-size', '1', stdout=StringIO())
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_writes_keep_rollups_equal_to_a_rebuild(self):
+        first = self.submit(self.students[0], 9)
+        late = self.submit(self.students[1], 11)
+        self.submit(self.students[2], 11)
+        grade = Grade.objects.create(submission=first, score=70, graded_by=self.manager)
+        Grade.objects.create(submission=late, score=90, graded_by=self.manager)
+        grade.score = 80
+        grade.save()
+        self.assertMatchesRebuild()
+
+        row = DailySubmissionRollup.objects.get(date=datetime(2026, 3, 11).date())
+        self.assertEqual((row.submitted, row.late), (2, 2))
+
+        late.delete()
+        self.assertMatchesRebuild()
+
+        # Moving the due date changes which submissions are late
+        self.essay.due_date = self.due + timedelta(days=5)
+        self.essay.save()
+        self.assertEqual(DailySubmissionRollup.objects.aggregate(late=Sum('late'))['late'], 0)
+        self.assertMatchesRebuild()
+
+        self.essay.delete()
+        self.assertFalse(DailySubmissionRollup.objects.exists())
+
+    def test_manager_stats_sum_rollups(self):
+        first = self.submit(self.students[0], 9)
+        self.submit(self.students[1], 11)
+        Grade.objects.create(submission=first, score=70, graded_by=self.manager)
+
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('dashboard:stats'), {
+            'bucket': 'day', 'start': '2026-03-01', 'end': '2026-03-31',
+        })
+        data = response.json()
+        self.assertEqual(data['my_assignments_submissions'], [
+            {'period': '2026-03-09', 'count': 1},
+            {'period': '2026-03-11', 'count': 1},
+        ])
+        self.assertEqual(data['my_assignments_summary'], {
+            'submitted': 2, 'late': 1, 'graded': 0, 'average_score': None,
+        })
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class ConditionalRequestTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.manager = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+        self.student = User.objects.create_user('student', 'student@example.com', None, role='student')
+        self.essay = Assignment.objects.create(
+            title='Essay', description='x', created_by=self.manager,
+            due_date=timezone.now() + timedelta(days=7),
+        )
+        self.essay.assigned_to.add(self.student)
+        self.client.force_login(self.manager)
+
+    def test_unchanged_stats_are_not_modified(self):
+        url = reverse('dashboard:stats')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('Last-Modified', response)
+
+        # Session and user only; the view itself does not run
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        # A different range is a different resource
+        self.assertEqual(self.client.get(url, {'bucket': 'day'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Submission.objects.create(assignment=self.essay, student=self.student, status='submitted')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_exports_revalidate_per_user(self):
+        url = reverse('dashboard:export_assignments')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        other = User.objects.create_user('other', 'other@example.com', None, role='manager')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_other_managers_changes_do_not_invalidate(self):
+        url = reverse('dashboard:stats')
+        etag = self.client.get(url)['ETag']
+        other = User.objects.create_user('other', 'other@example.com', None, role='manager')
+        with self.captureOnCommitCallbacks(execute=True):
+            Assignment.objects.create(
+                title='Quiz', description='x', created_by=other, due_date=timezone.now(),
+            )
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.manager = User.objects.create_user(
+            'manager', 'manager@example.com', None, role='manager', first_name='Mia', last_name='Lee',
+        )
+        self.students = [
+            User.objects.create_user(f'student{i}', f'student{i}@example.com', None, role='student')
+            for i in range(3)
+        ]
+        self.client.force_login(self.manager)
+
+    def add_assignment(self, title, graded_scores=()):
+        assignment = Assignment.objects.create(
+            title=title, description='x', created_by=self.manager, due_date=timezone.now(),
+        )
+        assignment.assigned_to.add(*self.students)
+        for student, score in zip(self.students, graded_scores):
+            submission = Submission.objects.create(assignment=assignment, student=student, status='submitted')
+            Grade.objects.create(submission=submission, score=score, graded_by=self.manager)
+        return assignment
+
+    def export(self):
+        response = self.client.get(reverse('dashboard:export_assignments'))
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_assignments_csv_has_totals(self):
+        self.add_assignment('Essay', graded_scores=[80, 91])
+        self.add_assignment('Quiz')
+        lines = self.export()
+        self.assertEqual(lines[0], 'Title,Created By,Due Date,Priority,Status,Assigned Students,Submissions,Average Grade')
+        rows = {line.split(',')[0]: line.split(',')[1:] for line in lines[1:]}
+        self.assertEqual(rows['Essay'][0], 'Mia Lee')
+        self.assertEqual(rows['Essay'][4:], ['3', '2', '85.50'])
+        self.assertEqual(rows['Quiz'][4:], ['3', '0', 'N/A'])
+
+    def export_students(self):
+        response = self.client.get(reverse('dashboard:export_students'))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="students.xlsx"')
+        workbook = openpyxl.load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True)
+        return list(workbook['Students'].values)
+
+    def test_students_xlsx_joins_the_manager(self):
+        for i, student in enumerate(self.students):
+            StudentProfile.objects.create(
+                user=student, student_id=f'S{i}', enrollment_date=timezone.localdate(), manager=self.manager,
+            )
+        # Session, user and the single export query
+        with self.assertNumQueries(3):
+            rows = self.export_students()
+        self.assertEqual(rows[0][0], 'Username')
+        self.assertEqual(len(rows), 4)
+        self.assertIn(('S0', 'Mia Lee'), [row[4:6] for row in rows[1:]])
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.add_assignment('Essay', graded_scores=[70])
+        with CaptureQueriesContext(connection) as one:
+            self.export()
+        for i in range(5):
+            self.add_assignment(f'Quiz {i}', graded_scores=[60, 90])
+        with CaptureQueriesContext(connection) as six:
+            self.assertEqual(len(self.export()), 7)
+        self.assertEqual(len(one), len(six))
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class ExportJobTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        field = ExportJob._meta.get_field('file')
+        patcher = mock.patch.object(field, 'storage', FileSystemStorage(location=directory.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.manager = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+        with self.captureOnCommitCallbacks(execute=True):
+            Assignment.objects.create(title='Essay', description='x', created_by=self.manager, due_date=timezone.now())
+        self.client.force_login(self.manager)
+
+    def start(self, execute=True):
+        with self.captureOnCommitCallbacks(execute=execute):
+            return self.client.post(reverse('dashboard:start_export', args=['assignments']))
+
+    def test_job_runs_and_file_downloads(self):
+        response = self.start()
+        self.assertEqual(response.status_code, 202)
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual((status['status'], status['progress'], status['rows_total']), ('done', 100, 1))
+
+        response = self.client.get(status['download_url'])
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('Essay', content)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="assignments.csv"')
+
+    def test_identical_requests_share_a_job_until_the_data_changes(self):
+        first = self.start(execute=False).json()
+        second = self.start(execute=False).json()
+        self.assertEqual(second['id'], first['id'])
+        self.assertFalse(second['created'])
+
+        export_jobs.run()
+        response = self.start()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], first['id'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Assignment.objects.create(title='Quiz', description='x', created_by=self.manager, due_date=timezone.now())
+        self.assertNotEqual(self.start().json()['id'], first['id'])
+
+    def test_jobs_are_private_to_their_scope(self):
+        job_id = self.start().json()['id']
+        other = User.objects.create_user('other', 'other@example.com', None, role='manager')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('dashboard:export_job_status', args=[job_id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('dashboard:download_export', args=[job_id])).status_code, 404)
+
+    def test_worker_command_runs_queued_jobs(self):
+        job, created = export_jobs.start('students', self.manager)
+        self.assertTrue(created)
+        call_command('run_export_jobs', '--once', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertTrue(job.file.name.endswith('.xlsx'))
+
+    def test_expired_jobs_are_purged_with_their_files(self):
+        job, _ = export_jobs.start('assignments', self.manager)
+        export_jobs.run(job.pk)
+        job.refresh_from_db()
+        storage, name = job.file.storage, job.file.name
+        self.assertTrue(storage.exists(name))
+
+        self.assertEqual(export_jobs.purge_expired(timezone.now() + timedelta(days=2)), 1)
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(ExportJob.objects.exists())
+
+
+class GradebookTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.manager = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+        self.ann = User.objects.create_user('ann', 'ann@example.com', None, role='student', last_name='Adams')
+        self.bob = User.objects.create_user('bob', 'bob@example.com', None, role='student', last_name='Brown')
+        self.essay = self.add_assignment('Essay', 1, max_score=50)
+        self.quiz = self.add_assignment('Quiz', 2)
+        self.grade(self.essay, self.ann, 45)
+        self.grade(self.quiz, self.ann, 70)
+        self.grade(self.essay, self.bob, 30)
+        self.client.force_login(self.manager)
+
+    def add_assignment(self, title, days, max_score=100):
+        assignment = Assignment.objects.create(
+            title=title, description='x', created_by=self.manager, max_score=max_score,
+            due_date=timezone.now() + timedelta(days=days),
+        )
+        assignment.assigned_to.add(self.ann, self.bob)
+        return assignment
+
+    def grade(self, assignment, student, score):
+        submission = Submission.objects.create(assignment=assignment, student=student, status='submitted')
+        Grade.objects.create(submission=submission, score=score, graded_by=self.manager)
+
+    def build(self):
+        return gradebook.Gradebook.build(Assignment.objects.filter(created_by=self.manager))
+
+    def check(self, book):
+        self.assertEqual([row[1] for row in book.students], ['ann', 'bob'])
+        self.assertEqual(book.score_row(0), [45.0, 70.0])
+        self.assertEqual(book.score_row(1), [30.0, None])
+        # (45 + 70) / (50 + 100) and 30 / 50
+        self.assertEqual(book.student_percentages, [76.7, 60.0])
+        self.assertEqual(book.student_letters, ['C', 'D'])
+        self.assertEqual(book.assignment_averages, [37.5, 70.0])
+        self.assertEqual(list(book.rows())[-1], ['Average', '', '37.50', '70.00', '', '', '', ''])
+
+    def test_python_backend(self):
+        with mock.patch.object(gradebook, 'np', None):
+            book = self.build()
+        self.assertEqual(book.backend, 'python')
+        self.check(book)
+
+    @skipUnless(gradebook.np is not None, 'NumPy is not installed')
+    def test_numpy_backend(self):
+        book = self.build()
+        self.assertEqual(book.backend, 'numpy')
+        self.check(book)
+
+    def test_built_in_a_fixed_number_of_queries(self):
+        with self.assertNumQueries(3):
+            self.build()
+
+    def test_json_endpoint_pages_students(self):
+        response = self.client.get(reverse('dashboard:gradebook'), {'limit': 1, 'offset': 1})
+        data = response.json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual([a['title'] for a in data['assignments']], ['Essay', 'Quiz'])
+        self.assertEqual(data['students'][0]['username'], 'bob')
+        self.assertEqual(data['students'][0]['scores'], [30.0, None])
+
+        self.client.force_login(self.ann)
+        self.assertEqual(self.client.get(reverse('dashboard:gradebook')).status_code, 403)
+
+    def test_csv_export(self):
+        response = self.client.get(reverse('dashboard:export_gradebook'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'Username,Name,Essay (/50),Quiz (/100),Graded,Total,Percentage,Letter Grade')
+        self.assertEqual(lines[1], 'ann,Adams,45,70,2,115,76.7,C')
+        self.assertEqual(lines[2], 'bob,Brown,30,,1,30,60.0,D')
+
+
+class SingleFlightTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_callers_share_one_computation(self):
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {'total': 42}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(singleflight.run('dashboard_stats', 'k', compute)))
+            for _ in range(5)
+        ]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'total': 42}] * 5)
+        self.assertEqual(
+            singleflight.metrics()['dashboard_stats'],
+            {'computed': 1, 'shared': 4, 'collapse_ratio': 0.8},
+        )
+
+    @override_settings(SINGLE_FLIGHT_POLL_INTERVAL=0.01)
+    def test_waits_for_a_computation_in_another_process(self):
+        result_key, lock_key = singleflight._keys('dashboard_stats', 'k')
+        cache.add(lock_key, 'other-process', 10)
+        publish = threading.Timer(0.05, lambda: cache.set(result_key, 'theirs', 5))
+        publish.start()
+        self.addCleanup(publish.cancel)
+
+        self.assertEqual(singleflight.run('dashboard_stats', 'k', lambda: 'ours'), 'theirs')
+
+    @override_settings(SINGLE_FLIGHT_POLL_INTERVAL=0.01)
+    def test_computes_when_the_other_process_gives_up(self):
+        _, lock_key = singleflight._keys('dashboard_stats', 'k')
+        cache.add(lock_key, 'other-process', 10)
+        release = threading.Timer(0.05, lambda: cache.delete(lock_key))
+        release.start()
+        self.addCleanup(release.cancel)
+
+        self.assertEqual(singleflight.run('dashboard_stats', 'k', lambda: 'ours'), 'ours')
+
+    def test_admins_share_the_stats_payload(self):
+        first = User.objects.create_user('admin', 'admin@example.com', None, role='admin')
+        second = User.objects.create_user('admin2', 'admin2@example.com', None, role='admin')
+        self.client.force_login(first)
+        expected = self.client.get(reverse('dashboard:stats')).json()
+
+        self.client.force_login(second)
+        # Session and user only
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('dashboard:stats'))
+        self.assertEqual({**response.json(), 'range': None}, {**expected, 'range': None})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user('student', 'student@example.com', None, role='student')
+        response = self.client.get(reverse('dashboard:stats'))
+        self.assertEqual(response.json()['user_registrations'][-1]['count'], 3)
+
+    def test_metrics_endpoint_is_admin_only(self):
+        manager = User.objects.create_user('manager', 'manager@example.com', None, role='manager')
+        self.client.force_login(manager)
+        self.assertEqual(self.client.get(reverse('dashboard:single_flight_metrics')).status_code, 403)
+        admin = User.objects.create_user('admin', 'admin@example.com', None, role='admin')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('dashboard:single_flight_metrics'))
+        self.assertIn('stats_row', response.json()['flights'])
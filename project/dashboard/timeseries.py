@@ -0,0 +1,125 @@
+"""
+Time-bucketed aggregates for the dashboard charts.
+
+Buckets are computed with Django's ``Trunc*`` functions, so the SQL is
+portable across backends, and every query is bounded by a date range on an
+indexed column (``Submission.submitted_at``, ``User.date_joined``,
+``DailySubmissionRollup.date``) instead of scanning the whole table.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncMonth, TruncQuarter, TruncWeek, TruncYear
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from assignments.models import Grade, LETTER_GRADE_THRESHOLDS
+
+BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+    'year': TruncYear,
+}
+
+# Range used when the caller gives no start date, per bucket size
+DEFAULT_WINDOWS = {
+    'day': timedelta(days=90),
+    'week': timedelta(weeks=52),
+    'month': timedelta(days=2 * 365),
+    'quarter': timedelta(days=5 * 365),
+    'year': None,
+}
+
+LETTER_GRADES = [letter for _, letter in LETTER_GRADE_THRESHOLDS] + ['F']
+
+
+class InvalidRange(ValueError):
+    pass
+
+
+class TimeRange:
+    """A bucket size plus an optional ``[start, end)`` window"""
+
+    def __init__(self, bucket='month', start=None, end=None):
+        if bucket not in BUCKETS:
+            raise InvalidRange(f"Unknown bucket {bucket!r}; choose from {', '.join(BUCKETS)}")
+        if start and end and start >= end:
+            raise InvalidRange('start must be before end')
+        self.bucket = bucket
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_query(cls, params, default_bucket='month'):
+        """Build from ``?bucket=&start=&end=`` (ISO dates or datetimes)"""
+        bucket = params.get('bucket') or default_bucket
+        start = _parse_moment(params.get('start'), 'start')
+        end = _parse_moment(params.get('end'), 'end')
+        if start is None and bucket in DEFAULT_WINDOWS and DEFAULT_WINDOWS[bucket]:
+            start = (end or timezone.now()) - DEFAULT_WINDOWS[bucket]
+        return cls(bucket, start, end)
+
+    def filter(self, queryset, field):
+        if self.start:
+            queryset = queryset.filter(**{f'{field}__gte': self.start})
+        if self.end:
+            queryset = queryset.filter(**{f'{field}__lt': self.end})
+        return queryset.filter(**{f'{field}__isnull': False})
+
+    def as_dict(self):
+        return {
+            'bucket': self.bucket,
+            'start': self.start.isoformat() if self.start else None,
+            'end': self.end.isoformat() if self.end else None,
+        }
+
+
+def _parse_moment(value, name):
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise InvalidRange(f'{name} must be an ISO date or datetime')
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def bucket_counts(queryset, field, time_range, total=None):
+    """
+    ``[{'period': 'YYYY-MM-DD', 'count': n}]`` for rows of ``queryset`` by
+    ``field``; ``total`` replaces the default ``Count('id')``, e.g.
+    ``Sum('submitted')`` over rollup rows.
+    """
+    trunc = BUCKETS[time_range.bucket]
+    rows = (
+        time_range.filter(queryset, field)
+        .order_by()
+        .annotate(period=trunc(field))
+        .values('period')
+        .annotate(count=total if total is not None else Count('id'))
+        .order_by('period')
+    )
+    return [
+        {'period': _as_date(row['period']).isoformat(), 'count': row['count'] or 0}
+        for row in rows
+    ]
+
+
+def _as_date(period):
+    return period.date() if isinstance(period, datetime) else period
+
+
+def grade_distribution(grades=None):
+    """``[{'letter_grade': 'A', 'count': n}, ...]`` computed in SQL, every letter present"""
+    grades = Grade.objects.all() if grades is None else grades
+    counts = dict(
+        grades.with_letter_grade().order_by().values('grade_letter')
+        .annotate(count=Count('id')).values_list('grade_letter', 'count')
+    )
+    return [{'letter_grade': letter, 'count': counts.get(letter, 0)} for letter in LETTER_GRADES]
@@ -6,8 +6,17 @@ app_name = 'dashboard'
 urlpatterns = [
     path('', views.home, name='home'),
     path('notifications/', views.notifications, name='notifications'),
+    path('notifications/feed/', views.notifications_feed, name='notifications_feed'),
+    path('notifications/stream/', views.notification_stream, name='notification_stream'),
     path('notifications/mark-read/<int:notification_id>/', views.mark_notification_read, name='mark_notification_read'),
     path('export/students/', views.export_students, name='export_students'),
     path('export/assignments/', views.export_assignments, name='export_assignments'),
+    path('export/gradebook/', views.export_gradebook, name='export_gradebook'),
+    path('export/<str:kind>/jobs/', views.start_export, name='start_export'),
+    path('export/jobs/<int:job_id>/', views.export_job_status, name='export_job_status'),
+    path('export/jobs/<int:job_id>/download/', views.download_export, name='download_export'),
     path('stats/', views.dashboard_stats, name='stats'),
+    path('gradebook/', views.gradebook, name='gradebook'),
+    path('stats/fragment-cache/', views.fragment_cache_metrics, name='fragment_cache_metrics'),
+    path('stats/single-flight/', views.single_flight_metrics, name='single_flight_metrics'),
 ]
\ No newline at end of file
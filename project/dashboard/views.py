@@ -1,19 +1,28 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
-from django.db.models import Count, Q, Avg
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.db.models import Q, Avg, Sum
 from django.utils import timezone
 from datetime import timedelta
 import json
-import openpyxl
-from openpyxl.styles import Font, PatternFill
-import csv
+import tempfile
 from io import StringIO
 
 from accounts.models import User, StudentProfile
 from assignments.models import Assignment, Submission, Grade
-from .models import Notification
+from . import export_jobs, exports, fragments, generations, live, rollups, singleflight, timeseries
+from .conditional import versioned
+from .gradebook import Gradebook
+from .models import DailySubmissionRollup, Notification
+from .pagination import KeysetPaginator
+from .stats import global_stats, user_stats
+
+NOTIFICATIONS_PER_PAGE = 20
+GRADEBOOK_PAGE_SIZE = 200
 
 
 @login_required
@@ -25,16 +34,21 @@ def home(request):
         'notifications': user.notifications.filter(is_read=False)[:5],
     }
     
+    # The panel querysets below stay lazy: a cached fragment never runs them
     if user.is_admin:
         # Admin dashboard
+        site = global_stats()
+        context['fragment_keys'] = {
+            'recent_activity': fragments.fragment_key('recent_activity', user, [generations.site_submissions()]),
+        }
         context.update({
-            'total_users': User.objects.count(),
-            'total_students': User.objects.filter(role='student').count(),
-            'total_managers': User.objects.filter(role='manager').count(),
-            'total_assignments': Assignment.objects.count(),
-            'active_assignments': Assignment.objects.filter(is_active=True).count(),
-            'total_submissions': Submission.objects.count(),
-            'pending_submissions': Submission.objects.filter(status='submitted').count(),
+            'total_users': site.users,
+            'total_students': site.students,
+            'total_managers': site.managers,
+            'total_assignments': site.assignments,
+            'active_assignments': site.active_assignments,
+            'total_submissions': site.submissions,
+            'pending_submissions': site.pending_submissions,
             'recent_submissions': Submission.objects.select_related(
                 'assignment', 'student'
             ).order_by('-submitted_at')[:10],
@@ -43,16 +57,16 @@ def home(request):
     elif user.is_manager:
         # Manager dashboard
         my_students = User.objects.filter(student_profile__manager=user)
-        my_assignments = Assignment.objects.filter(created_by=user)
+        mine = user_stats(user)
+        context['fragment_keys'] = {
+            'recent_activity': fragments.fragment_key('recent_activity', user, [generations.owner_submissions(user.pk)]),
+        }
         
         context.update({
-            'my_students_count': my_students.count(),
-            'my_assignments_count': my_assignments.count(),
-            'active_assignments_count': my_assignments.filter(is_active=True).count(),
-            'pending_submissions': Submission.objects.filter(
-                assignment__created_by=user,
-                status='submitted'
-            ).count(),
+            'my_students_count': mine.students,
+            'my_assignments_count': mine.assignments,
+            'active_assignments_count': mine.active_assignments,
+            'pending_submissions': mine.pending_submissions,
             'recent_submissions': Submission.objects.filter(
                 assignment__created_by=user
             ).select_related('assignment', 'student').order_by('-submitted_at')[:10],
@@ -62,20 +76,22 @@ def home(request):
     elif user.is_student:
         # Student dashboard
         my_submissions = Submission.objects.filter(student=user)
-        pending_assignments = Assignment.objects.filter(
-            assigned_to=user,
-            is_active=True
-        ).exclude(
-            submissions__student=user
-        )
+        mine = user_stats(user)
+        context['fragment_keys'] = {
+            # Titles of the assignments appear in both panels
+            'recent_activity': fragments.fragment_key('recent_activity', user, [
+                generations.student_submissions(user.pk), generations.student_assignments(user.pk),
+            ]),
+            'upcoming_assignments': fragments.fragment_key('upcoming_assignments', user, [
+                generations.student_assignments(user.pk),
+            ]),
+        }
         
         context.update({
-            'total_assignments': Assignment.objects.filter(assigned_to=user).count(),
-            'completed_assignments': my_submissions.filter(status='graded').count(),
-            'pending_assignments': pending_assignments.count(),
-            'average_grade': my_submissions.filter(
-                grade__isnull=False
-            ).aggregate(avg=Avg('grade__score'))['avg'] or 0,
+            'total_assignments': mine.assigned_assignments,
+            'completed_assignments': mine.completed_submissions,
+            'pending_assignments': mine.pending_assignments,
+            'average_grade': mine.average_grade,
             'recent_submissions': my_submissions.select_related(
                 'assignment'
             ).order_by('-submitted_at')[:5],
@@ -89,19 +105,74 @@ def home(request):
     return render(request, 'dashboard/home.html', context)
 
 
+def _notifications_page(request):
+    """Current inbox page; only the unread rows actually shown are marked read"""
+    paginator = KeysetPaginator(
+        request.user.notifications.all(),
+        ordering=('-created_at', '-id'),
+        per_page=NOTIFICATIONS_PER_PAGE,
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    
+    shown_unread = [notification.pk for notification in page if not notification.is_read]
+    if shown_unread:
+        marked = Notification.objects.filter(pk__in=shown_unread).mark_read()
+        request.user.unread_notification_count = max(request.user.unread_notification_count - marked, 0)
+    return page
+
+
 @login_required
 def notifications(request):
-    """View all notifications"""
-    user_notifications = request.user.notifications.all()
-    
-    # Mark all as read when viewing
-    user_notifications.filter(is_read=False).update(is_read=True)
+    """View notifications, newest first, one page at a time"""
+    page = _notifications_page(request)
     
     return render(request, 'dashboard/notifications.html', {
-        'notifications': user_notifications
+        'notifications': page,
+        'page': page,
     })
 
 
+@login_required
+def notifications_feed(request):
+    """JSON variant of the inbox for infinite scroll"""
+    page = _notifications_page(request)
+    
+    return JsonResponse({
+        'results': [
+            {
+                'id': notification.id,
+                'title': notification.title,
+                'message': notification.message,
+                'notification_type': notification.notification_type,
+                'is_read': notification.is_read,
+                'digest_count': notification.digest_count,
+                'created_at': notification.created_at.isoformat(),
+            }
+            for notification in page
+        ],
+        'next_cursor': page.next_cursor,
+        'unread_count': request.user.unread_notification_count,
+    })
+
+
+@login_required
+async def notification_stream(request):
+    """Server-Sent Events stream of new notifications and the unread count (ASGI only)"""
+    if not settings.LIVE_NOTIFICATIONS_ENABLED or not isinstance(request, ASGIRequest):
+        # Under WSGI the stream would hold a worker thread for as long as the
+        # tab is open; 204 tells EventSource to stop reconnecting
+        return HttpResponse(status=204)
+    user = await request.auser()
+    response = StreamingHttpResponse(
+        live.event_stream(user.pk, user.unread_notification_count),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx and similar proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 def mark_notification_read(request, notification_id):
     """Mark a specific notification as read"""
@@ -110,8 +181,7 @@ def mark_notification_read(request, notification_id):
         id=notification_id, 
         recipient=request.user
     )
-    notification.is_read = True
-    notification.save()
+    Notification.objects.filter(pk=notification.pk).mark_read()
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({'status': 'success'})
@@ -119,36 +189,69 @@ def mark_notification_read(request, notification_id):
     return redirect('dashboard:notifications')
 
 
+def _stats_scopes(request):
+    user = request.user
+    if user.is_admin:
+        return [generations.site_users(), generations.site_submissions(), generations.site_grades()]
+    if user.is_manager:
+        return [generations.owner_submissions(user.pk), generations.owner_grades(user.pk)]
+    if user.is_student:
+        return [
+            generations.student_submissions(user.pk),
+            generations.student_grades(user.pk),
+            generations.student_assignments(user.pk),
+        ]
+    return None
+
+
+def _stats_window(request):
+    # The default date window moves with the calendar
+    return [timezone.localdate().isoformat()]
+
+
 @login_required
+@versioned(_stats_scopes, extra=_stats_window)
 def dashboard_stats(request):
-    """API endpoint for dashboard statistics (for charts)"""
+    """API endpoint for dashboard statistics (for charts)
+    
+    Time series honour ``?bucket=day|week|month|quarter|year`` and optional
+    ``start``/``end`` ISO dates.
+    """
     user = request.user
+    try:
+        time_range = timeseries.TimeRange.from_query(request.GET)
+    except timeseries.InvalidRange as e:
+        return JsonResponse({'error': str(e)}, status=400)
     
+    # Identical requests (all admins, or one user's open tabs) share a single
+    # computation; the generations in the key keep the shared result current
+    scope = 'site' if user.is_admin else user.pk
+    key = (user.role, scope, request.GET.urlencode(), *_stats_window(request),
+           *generations.generations(_stats_scopes(request) or []))
+    stats = singleflight.run('dashboard_stats', key, lambda: _stats_payload(user, time_range))
+    return JsonResponse({**stats, 'range': time_range.as_dict()})
+
+
+def _stats_payload(user, time_range):
+    """Chart data for ``user``'s role over ``time_range``"""
     if user.is_admin:
         # Admin stats
         stats = {
-            'user_registrations': list(
-                User.objects.extra(
-                    select={'month': "strftime('%Y-%m', date_joined)"}
-                ).values('month').annotate(count=Count('id')).order_by('month')
-            ),
-            'assignment_submissions': list(
-                Submission.objects.extra(
-                    select={'month': "strftime('%Y-%m', submitted_at)"}
-                ).values('month').annotate(count=Count('id')).order_by('month')
+            'user_registrations': timeseries.bucket_counts(User.objects.all(), 'date_joined', time_range),
+            'assignment_submissions': timeseries.bucket_counts(
+                DailySubmissionRollup.objects.all(), 'date', time_range, total=Sum('submitted')
             ),
-            'grade_distribution': [],  # Will be calculated in template or with raw SQL
+            'grade_distribution': timeseries.grade_distribution(),
         }
         
     elif user.is_manager:
         # Manager stats
         stats = {
-            'my_assignments_submissions': list(
-                Submission.objects.filter(
-                    assignment__created_by=user
-                ).extra(
-                    select={'month': "strftime('%Y-%m', submitted_at)"}
-                ).values('month').annotate(count=Count('id')).order_by('month')
+            'my_assignments_submissions': timeseries.bucket_counts(
+                DailySubmissionRollup.objects.filter(manager=user), 'date', time_range, total=Sum('submitted')
+            ),
+            'my_assignments_summary': rollups.totals(
+                time_range.filter(DailySubmissionRollup.objects.filter(manager=user), 'date')
             ),
             'student_performance': list(
                 Grade.objects.filter(
@@ -162,113 +265,216 @@ def dashboard_stats(request):
     elif user.is_student:
         # Student stats
         stats = {
-            'my_grades': list(
-                Grade.objects.filter(
+            'my_grades': [
+                {
+                    'submission__assignment__title': grade['submission__assignment__title'],
+                    'score': grade['score'],
+                    'letter_grade': grade['grade_letter'],
+                }
+                for grade in Grade.objects.filter(
                     submission__student=user
-                ).values('submission__assignment__title', 'score', 'letter_grade')
-                .order_by('submission__assignment__due_date')
-            ),
-            'submission_timeline': list(
-                Submission.objects.filter(
-                    student=user
-                ).extra(
-                    select={'month': "strftime('%Y-%m', submitted_at)"}
-                ).values('month').annotate(count=Count('id')).order_by('month')
+                ).with_letter_grade().values(
+                    'submission__assignment__title', 'score', 'grade_letter'
+                ).order_by('submission__assignment__due_date')
+            ],
+            'submission_timeline': timeseries.bucket_counts(
+                Submission.objects.filter(student=user), 'submitted_at', time_range
             ),
         }
     
-    return JsonResponse(stats)
+    return stats
+
+
+@login_required
+def fragment_cache_metrics(request):
+    """Hit/miss counts of the dashboard fragment cache (admin only)"""
+    if not request.user.is_admin:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    return JsonResponse({'fragments': fragments.metrics()})
+
+
+@login_required
+def single_flight_metrics(request):
+    """Computed/shared counts of the single-flight layer (admin only)"""
+    if not request.user.is_admin:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    return JsonResponse({'flights': singleflight.metrics()})
+
+
+def _export_students_scopes(request):
+    if exports.can_export(request.user):
+        return exports.generation_scopes('students', request.user)
+    return None
+
+
+def _export_assignments_scopes(request):
+    if exports.can_export(request.user):
+        return exports.generation_scopes('assignments', request.user)
+    return None
 
 
 @login_required
+@versioned(_export_students_scopes)
 def export_students(request):
     """Export students data to Excel (admin/manager only)"""
     if not (request.user.is_admin or request.user.is_manager):
         messages.error(request, 'You do not have permission to export this data.')
         return redirect('dashboard:home')
     
-    # Create workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Students"
-    
-    # Headers
-    headers = ['Username', 'First Name', 'Last Name', 'Email', 'Student ID', 
-               'Manager', 'Enrollment Date', 'Status']
-    ws.append(headers)
-    
-    # Style headers
-    for cell in ws[1]:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-    
-    # Get students based on user role
-    if request.user.is_admin:
-        students = User.objects.filter(role='student').select_related('student_profile')
-    else:  # manager
-        students = User.objects.filter(
-            role='student',
-            student_profile__manager=request.user
-        ).select_related('student_profile')
-    
-    # Add data
-    for student in students:
-        profile = getattr(student, 'student_profile', None)
-        ws.append([
-            student.username,
-            student.first_name,
-            student.last_name,
-            student.email,
-            profile.student_id if profile else '',
-            profile.manager.get_full_name() if profile and profile.manager else '',
-            profile.enrollment_date.strftime('%Y-%m-%d') if profile and profile.enrollment_date else '',
-            'Active' if profile and profile.is_active else 'Inactive'
-        ])
-    
-    # Create response
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    # Rows are spooled to a temporary file rather than held in memory
+    rows = exports.student_rows(exports.students_for(request.user))
+    output = tempfile.TemporaryFile()
+    try:
+        exports.write_xlsx(output, 'Students', exports.STUDENT_HEADERS, rows)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    # FileResponse closes (and so deletes) the file once it has been sent
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename='students.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
     )
-    response['Content-Disposition'] = 'attachment; filename=students.xlsx'
-    wb.save(response)
-    
-    return response
 
 
 @login_required
+@versioned(_export_assignments_scopes)
 def export_assignments(request):
     """Export assignments data to CSV (admin/manager only)"""
     if not (request.user.is_admin or request.user.is_manager):
         messages.error(request, 'You do not have permission to export this data.')
         return redirect('dashboard:home')
     
-    response = HttpResponse(content_type='text/csv')
+    # Streamed straight from the database cursor, one CSV line at a time
+    rows = exports.assignment_rows(exports.assignments_for(request.user))
+    response = StreamingHttpResponse(
+        exports.csv_lines(exports.ASSIGNMENT_HEADERS, rows), content_type='text/csv'
+    )
     response['Content-Disposition'] = 'attachment; filename=assignments.csv'
+    return response
+
+
+def _gradebook_scopes(request):
+    if exports.can_export(request.user):
+        return exports.generation_scopes('gradebook', request.user)
+    return None
+
+
+@login_required
+@versioned(_gradebook_scopes)
+def gradebook(request):
+    """Students x assignments scores with totals (JSON, admin/manager only)
     
-    writer = csv.writer(response)
-    writer.writerow(['Title', 'Created By', 'Due Date', 'Priority', 'Status', 
-                    'Assigned Students', 'Submissions', 'Average Grade'])
-    
-    # Get assignments based on user role
-    if request.user.is_admin:
-        assignments = Assignment.objects.all()
-    else:  # manager
-        assignments = Assignment.objects.filter(created_by=request.user)
+    Students are paged with ``?offset=`` and ``?limit=``; the CSV export
+    has every row.
+    """
+    if not exports.can_export(request.user):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    try:
+        offset = max(int(request.GET.get('offset', 0)), 0)
+        limit = min(max(int(request.GET.get('limit', GRADEBOOK_PAGE_SIZE)), 1), GRADEBOOK_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'offset and limit must be integers'}, status=400)
     
-    for assignment in assignments:
-        avg_grade = assignment.submissions.filter(
-            grade__isnull=False
-        ).aggregate(avg=Avg('grade__score'))['avg']
-        
-        writer.writerow([
-            assignment.title,
-            assignment.created_by.get_full_name(),
-            assignment.due_date.strftime('%Y-%m-%d %H:%M') if assignment.due_date else '',
-            assignment.get_priority_display(),
-            'Active' if assignment.is_active else 'Inactive',
-            assignment.assigned_to.count(),
-            assignment.submissions.count(),
-            f"{avg_grade:.2f}" if avg_grade else 'N/A'
-        ])
+    book = Gradebook.build(exports.assignments_for(request.user))
+    students = [
+        {
+            'id': pk,
+            'username': username,
+            'name': f'{first_name} {last_name}'.strip(),
+            'scores': book.score_row(index),
+            'graded': book.student_graded[index],
+            'total': book.student_totals[index],
+            'percentage': book.student_percentages[index],
+            'letter_grade': book.student_letters[index],
+        }
+        for index, (pk, username, first_name, last_name)
+        in enumerate(book.students[offset:offset + limit], start=offset)
+    ]
+    return JsonResponse({
+        'assignments': [
+            {'id': pk, 'title': title, 'max_score': max_score, 'average': average, 'graded': graded}
+            for (pk, title, max_score), average, graded
+            in zip(book.assignments, book.assignment_averages, book.assignment_graded)
+        ],
+        'students': students,
+        'count': len(book.students),
+        'offset': offset,
+        'limit': limit,
+        'backend': book.backend,
+    })
+
+
+@login_required
+@versioned(_gradebook_scopes)
+def export_gradebook(request):
+    """Export the gradebook to CSV (admin/manager only)"""
+    if not exports.can_export(request.user):
+        messages.error(request, 'You do not have permission to export this data.')
+        return redirect('dashboard:home')
     
+    book = Gradebook.build(exports.assignments_for(request.user))
+    response = StreamingHttpResponse(exports.csv_lines(book.headers(), book.rows()), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename=gradebook.csv'
     return response
+
+
+def _export_job_json(job):
+    data = {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'rows_done': job.rows_done,
+        'rows_total': job.rows_total,
+        'created_at': job.created_at.isoformat(),
+        'status_url': reverse('dashboard:export_job_status', args=[job.pk]),
+    }
+    if job.status == 'done':
+        data['download_url'] = reverse('dashboard:download_export', args=[job.pk])
+    elif job.status == 'failed':
+        data['error'] = job.error
+    return data
+
+
+@login_required
+def start_export(request, kind):
+    """Start a background export, or join an identical one (POST)
+    
+    Responds ``202`` with the job to poll, or ``200`` when a finished export
+    of unchanged data can be downloaded straight away.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    if not exports.can_export(request.user):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    if kind not in export_jobs.KINDS:
+        return JsonResponse({'error': f'Unknown export {kind!r}'}, status=404)
+    
+    job, created = export_jobs.start(kind, request.user)
+    data = dict(_export_job_json(job), created=created)
+    return JsonResponse(data, status=200 if job.status == 'done' else 202)
+
+
+@login_required
+def export_job_status(request, job_id):
+    """Progress of an export job"""
+    job = get_object_or_404(export_jobs.visible_to(request.user), pk=job_id)
+    return JsonResponse(_export_job_json(job))
+
+
+@login_required
+def download_export(request, job_id):
+    """File of a finished export job"""
+    job = get_object_or_404(export_jobs.visible_to(request.user), pk=job_id, status='done')
+    kind = export_jobs.KINDS[job.kind]
+    return FileResponse(
+        job.file.open('rb'),
+        as_attachment=True,
+        filename=f"{job.kind}.{kind['extension']}",
+        content_type=kind['content_type'],
+    )
@@ -3,6 +3,10 @@ ASGI config for student_dashboard project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the project through this module (e.g. ``uvicorn student_dashboard.asgi:application``)
+to enable the live notification stream at ``/dashboard/notifications/stream/``;
+under WSGI that endpoint cannot hold connections open.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -68,6 +68,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'dashboard.context_processors.live_notifications',
             ],
         },
     },
@@ -141,9 +142,62 @@ LOGOUT_REDIRECT_URL = 'accounts:login'
 CRISPY_ALLOWED_TEMPLATE_PACKS = "tailwind"
 CRISPY_TEMPLATE_PACK = "tailwind"
 
+# Cache (the dashboard fragment cache needs a backend shared by all workers,
+# e.g. django.core.cache.backends.redis.RedisCache, in production)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+# Dashboard fragment cache; entries are invalidated by generation counters,
+# the timeout only bounds how stale "5 minutes ago" style text can get
+DASHBOARD_FRAGMENT_TIMEOUT = config('DASHBOARD_FRAGMENT_TIMEOUT', default=300, cast=int)
+
+# Single-flight coalescing of dashboard aggregations: how long a computed
+# result is shared, and how long (seconds) followers wait on its leader
+SINGLE_FLIGHT_TTL = config('SINGLE_FLIGHT_TTL', default=5, cast=int)
+SINGLE_FLIGHT_WAIT = config('SINGLE_FLIGHT_WAIT', default=10, cast=float)
+SINGLE_FLIGHT_POLL_INTERVAL = config('SINGLE_FLIGHT_POLL_INTERVAL', default=0.05, cast=float)
+
+# Totals shown next to cursor-paginated lists are cached per filter and data
+# generation; the timeout only bounds how long an unused entry is kept
+KEYSET_COUNT_TIMEOUT = config('KEYSET_COUNT_TIMEOUT', default=300, cast=int)
+
+# Exports are read from the database in chunks of this many rows
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Background export jobs (`manage.py run_export_jobs`); files are kept outside
+# MEDIA_ROOT and only served through the permission-checked download view
+EXPORT_ROOT = config('EXPORT_ROOT', default=str(BASE_DIR / 'exports'))
+EXPORT_JOB_RETENTION_HOURS = config('EXPORT_JOB_RETENTION_HOURS', default=24, cast=int)
+EXPORT_JOB_LEASE_SECONDS = config('EXPORT_JOB_LEASE_SECONDS', default=1800, cast=int)
+
 # Email settings
 EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
 
+# Background tasks (notification fan-out)
+BACKGROUND_TASKS_EAGER = config('BACKGROUND_TASKS_EAGER', default=False, cast=bool)
+BACKGROUND_TASKS_WORKERS = config('BACKGROUND_TASKS_WORKERS', default=1, cast=int)
+NOTIFICATION_FANOUT_CHUNK_SIZE = config('NOTIFICATION_FANOUT_CHUNK_SIZE', default=500, cast=int)
+
+# Notification compaction (`manage.py compact_notifications`)
+NOTIFICATION_RETENTION_DAYS = config('NOTIFICATION_RETENTION_DAYS', default=180, cast=int)
+NOTIFICATION_DIGEST_THRESHOLD = config('NOTIFICATION_DIGEST_THRESHOLD', default=5, cast=int)
+
+# Live notifications (SSE). Only for deployments served by the ASGI application
+# (see README); under WSGI every open stream would hold a worker thread
+LIVE_NOTIFICATIONS_ENABLED = config('LIVE_NOTIFICATIONS_ENABLED', default=False, cast=bool)
+NOTIFICATION_STREAM_POLL_INTERVAL = config('NOTIFICATION_STREAM_POLL_INTERVAL', default=2.0, cast=float)
+NOTIFICATION_STREAM_KEEPALIVE = config('NOTIFICATION_STREAM_KEEPALIVE', default=15, cast=int)
+
+# Email outbox (delivered by `manage.py run_outbox`)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config('EMAIL_OUTBOX_MAX_ATTEMPTS', default=6, cast=int)
+EMAIL_OUTBOX_BACKOFF_BASE = config('EMAIL_OUTBOX_BACKOFF_BASE', default=30, cast=int)
+EMAIL_OUTBOX_BACKOFF_MAX = config('EMAIL_OUTBOX_BACKOFF_MAX', default=3600, cast=int)
+EMAIL_OUTBOX_LEASE_SECONDS = config('EMAIL_OUTBOX_LEASE_SECONDS', default=300, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 